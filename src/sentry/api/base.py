@@ -210,6 +210,8 @@ class Endpoint(APIView):
             response['X-Hits'] = cursor_result.hits
         if cursor_result.max_hits is not None:
             response['X-Max-Hits'] = cursor_result.max_hits
+        if cursor_result.hits_strategy is not None:
+            response['X-Hits-Strategy'] = cursor_result.hits_strategy
         response['Link'] = ', '.join(
             [
                 self.build_cursor_link(
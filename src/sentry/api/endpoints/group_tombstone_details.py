@@ -31,13 +31,16 @@ class GroupTombstoneDetailsEndpoint(ProjectEndpoint):
         except GroupTombstone.DoesNotExist:
             raise ResourceDoesNotExist
 
-        GroupHash.objects.filter(
+        hashes = GroupHash.objects.filter(
             project_id=project.id,
             group_tombstone_id=tombstone_id,
-        ).update(
+        )
+        hash_list = list(hashes.values_list('hash', flat=True))
+        hashes.update(
             # will allow new events to be captured
             group_tombstone_id=None,
         )
+        GroupHash.uncache_many(project.id, hash_list)
 
         tombstone.delete()
 
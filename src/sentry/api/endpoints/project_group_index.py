@@ -535,6 +535,7 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
 
             group_list = list(queryset)
             groups_to_delete = []
+            tombstone_ids = []
 
             for group in group_list:
                 with transaction.atomic():
@@ -557,6 +558,10 @@ class ProjectGroupIndexEndpoint(ProjectEndpoint, EnvironmentMixin):
                             group=None,
                             group_tombstone_id=tombstone.id,
                         )
+                        tombstone_ids.append(tombstone.id)
+
+            if tombstone_ids:
+                GroupHash.invalidate_cache(group_tombstone_id__in=tombstone_ids)
 
             self._delete_groups(request, project, groups_to_delete, delete_type='discard')
 
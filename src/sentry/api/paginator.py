@@ -10,13 +10,19 @@ from __future__ import absolute_import
 import bisect
 import functools
 import math
+import six
 
 from datetime import datetime
 from django.db import connections
 from django.db.models.sql.datastructures import EmptyResultSet
 from django.utils import timezone
+from django.utils.encoding import force_text
 
+from sentry import options
+from sentry.cache import default_cache
+from sentry.utils import json
 from sentry.utils.cursors import build_cursor, Cursor, CursorResult
+from sentry.utils.hashlib import md5_text
 
 quote_name = connections['default'].ops.quote_name
 
@@ -25,8 +31,134 @@ MAX_LIMIT = 100
 MAX_HITS_LIMIT = 1000
 
 
+def get_hits_query(queryset, max_hits):
+    """
+    Returns the SQL and parameters of a query selecting the ids of at most
+    ``max_hits`` rows of ``queryset``. Raises ``EmptyResultSet`` if the
+    queryset can't match any rows.
+    """
+    hits_query = queryset.values()[:max_hits].query
+    # clear out any select fields (include select_related) and pull just the id
+    hits_query.clear_select_clause()
+    hits_query.add_fields(['id'])
+    hits_query.clear_ordering(force_empty=True)
+    return hits_query.sql_with_params()
+
+
+def get_hits_cache_key(db, sql, params):
+    """
+    Returns the cache key of a hits query. The query is normalized, so that
+    the same query yields the same key regardless of its whitespace and of
+    the (Python) types of its parameters.
+    """
+    return u'api.paginator.hits:{}'.format(
+        md5_text(
+            db,
+            u' '.join(sql.split()),
+            json.dumps([force_text(param) for param in params]),
+        ).hexdigest(),
+    )
+
+
+class HitCounter(object):
+    """
+    Counts the rows (up to ``max_hits``) matched by the queryset of a
+    paginator. Calling a counter returns a ``(hits, strategy)`` tuple, where
+    ``strategy`` names the counter that produced the number.
+    """
+    strategy = None
+
+    def __call__(self, queryset, max_hits):
+        raise NotImplementedError
+
+
+class ExactHitCounter(HitCounter):
+    strategy = 'exact'
+
+    def __call__(self, queryset, max_hits):
+        if not max_hits:
+            return 0, self.strategy
+        try:
+            h_sql, h_params = get_hits_query(queryset, max_hits)
+        except EmptyResultSet:
+            return 0, self.strategy
+        cursor = connections[queryset.db].cursor()
+        cursor.execute(u'SELECT COUNT(*) FROM ({}) as t'.format(
+            h_sql,
+        ), h_params)
+        return cursor.fetchone()[0], self.strategy
+
+
+class EstimatedHitCounter(HitCounter):
+    """
+    Uses the row estimate of the Postgres query planner rather than running
+    the query. The estimate is only as good as the table statistics, so this
+    is suited to large result sets where the exact number matters little.
+    Other databases fall back to an exact count.
+    """
+    strategy = 'estimate'
+
+    def __call__(self, queryset, max_hits):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return ExactHitCounter()(queryset, max_hits)
+        if not max_hits:
+            return 0, self.strategy
+        try:
+            h_sql, h_params = get_hits_query(queryset, max_hits)
+        except EmptyResultSet:
+            return 0, self.strategy
+        cursor = connection.cursor()
+        cursor.execute(u'EXPLAIN (FORMAT JSON) {}'.format(h_sql), h_params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, six.string_types):
+            plan = json.loads(plan)
+        return min(int(plan[0]['Plan']['Plan Rows']), max_hits), self.strategy
+
+
+class CachedHitCounter(HitCounter):
+    """
+    Caches the hits produced by another counter (an exact count by default)
+    for ``ttl`` seconds, keyed by the normalized hits query.
+    """
+    strategy = 'cached'
+
+    def __init__(self, ttl, counter=None):
+        self.ttl = ttl
+        self.counter = counter if counter is not None else ExactHitCounter()
+
+    def __call__(self, queryset, max_hits):
+        try:
+            h_sql, h_params = get_hits_query(queryset, max_hits)
+        except EmptyResultSet:
+            return self.counter(queryset, max_hits)
+
+        key = get_hits_cache_key(queryset.db, h_sql, h_params)
+        hits = default_cache.get(key)
+        if hits is not None:
+            return hits, self.strategy
+
+        hits, strategy = self.counter(queryset, max_hits)
+        default_cache.set(key, hits, self.ttl)
+        return hits, strategy
+
+
+def get_hit_counter():
+    """
+    Returns the hit counter configured with the ``api.paginator.hits-strategy``
+    option.
+    """
+    strategy = options.get('api.paginator.hits-strategy')
+    if strategy == EstimatedHitCounter.strategy:
+        return EstimatedHitCounter()
+    if strategy == CachedHitCounter.strategy:
+        return CachedHitCounter(options.get('api.paginator.hits-cache-ttl'))
+    return ExactHitCounter()
+
+
 class BasePaginator(object):
-    def __init__(self, queryset, order_by=None, max_limit=MAX_LIMIT, on_results=None):
+    def __init__(self, queryset, order_by=None, max_limit=MAX_LIMIT, on_results=None,
+                 hit_counter=None):
         if order_by:
             if order_by.startswith('-'):
                 self.key, self.desc = order_by[1:], True
@@ -38,6 +170,7 @@ class BasePaginator(object):
         self.queryset = queryset
         self.max_limit = max_limit
         self.on_results = on_results
+        self.hit_counter = hit_counter
 
     def _is_asc(self, is_prev):
         return (self.desc and is_prev) or not (self.desc or is_prev)
@@ -120,9 +253,10 @@ class BasePaginator(object):
         # TODO(dcramer): this does not yet work correctly for ``is_prev`` when
         # the key is not unique
         if count_hits:
-            hits = self.count_hits(MAX_HITS_LIMIT)
+            hit_counter = self.hit_counter if self.hit_counter is not None else get_hit_counter()
+            hits, hits_strategy = hit_counter(self.queryset, MAX_HITS_LIMIT)
         else:
-            hits = None
+            hits, hits_strategy = None, None
 
         offset = cursor.offset
         # The extra amount is needed so we can decide in the ResultCursor if there is
@@ -158,6 +292,7 @@ class BasePaginator(object):
             results=results,
             limit=limit,
             hits=hits,
+            hits_strategy=hits_strategy,
             max_hits=MAX_HITS_LIMIT if count_hits else None,
             cursor=cursor,
             is_desc=self.desc,
@@ -166,22 +301,7 @@ class BasePaginator(object):
         )
 
     def count_hits(self, max_hits):
-        if not max_hits:
-            return 0
-        hits_query = self.queryset.values()[:max_hits].query
-        # clear out any select fields (include select_related) and pull just the id
-        hits_query.clear_select_clause()
-        hits_query.add_fields(['id'])
-        hits_query.clear_ordering(force_empty=True)
-        try:
-            h_sql, h_params = hits_query.sql_with_params()
-        except EmptyResultSet:
-            return 0
-        cursor = connections[self.queryset.db].cursor()
-        cursor.execute(u'SELECT COUNT(*) FROM ({}) as t'.format(
-            h_sql,
-        ), h_params)
-        return cursor.fetchone()[0]
+        return ExactHitCounter()(self.queryset, max_hits)[0]
 
 
 class Paginator(BasePaginator):
@@ -344,6 +464,7 @@ class SequencePaginator(object):
             prev=prev_cursor,
             next=next_cursor,
             hits=min(len(self.scores), MAX_HITS_LIMIT) if count_hits else None,
+            hits_strategy=ExactHitCounter.strategy if count_hits else None,
             max_hits=MAX_HITS_LIMIT if count_hits else None,
         )
 
@@ -7,11 +7,17 @@ sentry.buffer.redis
 """
 from __future__ import absolute_import
 
+import atexit
 import six
+import threading
+import weakref
 
 from time import time
 from binascii import crc32
+from collections import defaultdict
+from uuid import uuid4
 
+from celery.signals import worker_process_shutdown
 from datetime import datetime
 from django.db import models
 from django.utils import timezone
@@ -24,7 +30,26 @@ from sentry.utils import json, metrics
 from sentry.utils.compat import pickle
 from sentry.utils.hashlib import md5_text
 from sentry.utils.imports import import_string
-from sentry.utils.redis import get_cluster_from_options
+from sentry.utils.redis import get_cluster_from_options, load_script
+
+delete_lock = load_script('utils/locking/delete_lock.lua')
+
+# Buffers that merge increments in process, which are flushed once when the
+# process exits. The set doesn't keep the buffers alive.
+_local_buffers = weakref.WeakSet()
+
+
+def _flush_local_buffers(**kwargs):
+    for buf in list(_local_buffers):
+        buf._safe_flush()
+
+
+atexit.register(_flush_local_buffers)
+worker_process_shutdown.connect(
+    _flush_local_buffers,
+    weak=False,
+    dispatch_uid='sentry.buffer.redis.flush_local_buffers',
+)
 
 
 class PendingBuffer(object):
@@ -54,17 +79,69 @@ class PendingBuffer(object):
         return rv
 
 
+class LocalIncr(object):
+    """
+    Increments for a single buffer key that have been merged in process
+    and not yet written to Redis.
+    """
+    __slots__ = ['model', 'filters', 'columns', 'extra', 'count']
+
+    def __init__(self, model, filters):
+        self.model = model
+        self.filters = filters
+        self.columns = defaultdict(int)
+        self.extra = {}
+        self.count = 0
+
+    def add(self, columns, extra=None):
+        for column, amount in six.iteritems(columns):
+            self.columns[column] += amount
+        if extra:
+            # last write wins, as it does in Redis
+            self.extra.update(extra)
+        self.count += 1
+
+
 class RedisBuffer(Buffer):
     key_expire = 60 * 60  # 1 hour
     pending_key = 'b:p'
-
-    def __init__(self, pending_partitions=1, incr_batch_size=2, **options):
+    # the number of partitions in use when autoscaling is enabled
+    pending_partitions_key = 'b:p:n'
+    # how long (in seconds) the partition count is cached by writers
+    pending_partitions_ttl = 10
+    # how long (in seconds) a partition is leased to the worker processing it
+    pending_lease_duration = 60
+
+    def __init__(self, pending_partitions=1, incr_batch_size=2,
+                 max_pending_partitions=None, partition_backlog=10000,
+                 local_flush_interval=0, local_max_keys=1000, **options):
         self.cluster, options = get_cluster_from_options('SENTRY_BUFFER_OPTIONS', options)
         self.pending_partitions = pending_partitions
         self.incr_batch_size = incr_batch_size
         assert self.pending_partitions > 0
         assert self.incr_batch_size > 0
 
+        # When ``max_pending_partitions`` is larger than ``pending_partitions``
+        # the number of partitions grows (and shrinks back) with the pending
+        # backlog, aiming for at most ``partition_backlog`` keys per partition.
+        self._max_pending_partitions = max_pending_partitions
+        self.partition_backlog = partition_backlog
+        assert self.partition_backlog > 0
+        self._active_partitions = (None, 0)
+
+        # When ``local_flush_interval`` (in milliseconds) is set, increments
+        # are merged in process and written to Redis once the interval has
+        # passed or ``local_max_keys`` distinct keys have been buffered.
+        self.local_flush_interval = local_flush_interval
+        self.local_max_keys = local_max_keys
+        assert self.local_flush_interval >= 0
+        assert self.local_max_keys > 0
+        self._local_lock = threading.Lock()
+        self._local_buffer = {}
+        self._local_timer = None
+        if self.local_flush_interval:
+            _local_buffers.add(self)
+
     def validate(self):
         try:
             with self.cluster.all() as client:
@@ -88,6 +165,27 @@ class RedisBuffer(Buffer):
             ).hexdigest(),
         )
 
+    @property
+    def max_pending_partitions(self):
+        return max(self._max_pending_partitions or 0, self.pending_partitions)
+
+    def get_active_partitions(self):
+        """
+        Returns the number of partitions new keys are routed into. Without
+        autoscaling this is always ``pending_partitions``.
+        """
+        if self.max_pending_partitions == self.pending_partitions:
+            return self.pending_partitions
+
+        count, expires = self._active_partitions
+        now = time()
+        if count is None or expires < now:
+            value = self.cluster.get_routing_client().get(self.pending_partitions_key)
+            count = int(value) if value else self.pending_partitions
+            count = min(max(count, self.pending_partitions), self.max_pending_partitions)
+            self._active_partitions = (count, now + self.pending_partitions_ttl)
+        return count
+
     def _make_pending_key(self, partition=None):
         """
         Returns the key to be used for the pending buffer.
@@ -96,7 +194,7 @@ class RedisBuffer(Buffer):
         """
         if partition is None:
             return self.pending_key
-        assert partition >= 0 and partition < self.pending_partitions
+        assert partition >= 0 and partition < self.max_pending_partitions
         return '%s:%d' % (self.pending_key, partition)
 
     def _make_pending_key_from_key(self, key):
@@ -105,9 +203,10 @@ class RedisBuffer(Buffer):
         to route a key into the correct pending buffer. If partitioning
         is disabled, route into the no partition buffer.
         """
-        if self.pending_partitions == 1:
+        partitions = self.get_active_partitions()
+        if partitions == 1:
             return self.pending_key
-        return self._make_pending_key(crc32(key) % self.pending_partitions)
+        return self._make_pending_key(crc32(key) % partitions)
 
     def _make_lock_key(self, key):
         return 'l:%s' % (key, )
@@ -162,15 +261,28 @@ class RedisBuffer(Buffer):
             - Perform a set (last write wins) on extra
         - Add hashmap key to pending flushes
         """
+        key = self._make_key(model, filters)
+
+        if self.local_flush_interval:
+            self._local_incr(key, model, columns, filters, extra)
+        else:
+            # We can't use conn.map() due to wanting to support multiple pending
+            # keys (one per Redis partition)
+            conn = self.cluster.get_local_client_for_key(key)
+            pipe = conn.pipeline()
+            self._add_incr(pipe, key, model, columns, filters, extra)
+            pipe.execute()
+
+        metrics.incr('buffer.incr', skip_internal=True, tags={
+            'module': model.__module__,
+            'model': model.__name__,
+        })
+
+    def _add_incr(self, pipe, key, model, columns, filters, extra=None):
         # TODO(dcramer): longer term we'd rather not have to serialize values
         # here (unless it's to JSON)
-        key = self._make_key(model, filters)
         pending_key = self._make_pending_key_from_key(key)
-        # We can't use conn.map() due to wanting to support multiple pending
-        # keys (one per Redis partition)
-        conn = self.cluster.get_local_client_for_key(key)
 
-        pipe = conn.pipeline()
         pipe.hsetnx(key, 'm', '%s.%s' % (model.__module__, model.__name__))
         # TODO(dcramer): once this goes live in production, we can kill the pickle path
         # (this is to ensure a zero downtime deploy where we can transition event processing)
@@ -190,28 +302,184 @@ class RedisBuffer(Buffer):
                 # pipe.hset(key, 'e+' + column, json.dumps(self._dump_value(value)))
         pipe.expire(key, self.key_expire)
         pipe.zadd(pending_key, time(), key)
-        pipe.execute()
 
-        metrics.incr('buffer.incr', skip_internal=True, tags={
-            'module': model.__module__,
-            'model': model.__name__,
-        })
+    def _local_incr(self, key, model, columns, filters, extra=None):
+        with self._local_lock:
+            pending = self._local_buffer.get(key)
+            if pending is None:
+                pending = self._local_buffer[key] = LocalIncr(model, filters)
+            pending.add(columns, extra)
+
+            full = len(self._local_buffer) >= self.local_max_keys
+            if not full and self._local_timer is None:
+                self._local_timer = threading.Timer(
+                    self.local_flush_interval / 1000.0,
+                    self._safe_flush,
+                )
+                self._local_timer.daemon = True
+                self._local_timer.start()
+
+        if full:
+            self._safe_flush()
+
+    def _safe_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            self.logger.exception('buffer.local.flush-failed')
+
+    def flush(self):
+        """
+        Write all increments that have been merged in process to Redis.
+        """
+        with self._local_lock:
+            pending, self._local_buffer = self._local_buffer, {}
+            if self._local_timer is not None:
+                self._local_timer.cancel()
+                self._local_timer = None
+
+        if not pending:
+            return
+
+        router = self.cluster.get_router()
+        hosts = defaultdict(list)
+        for key in pending:
+            hosts[router.get_host_for_key(key)].append(key)
+
+        failed = {}
+        with metrics.timer('buffer.local.flush'):
+            for host_id, keys in six.iteritems(hosts):
+                try:
+                    pipe = self.cluster.get_local_client(host_id).pipeline()
+                    for key in keys:
+                        incr = pending[key]
+                        self._add_incr(pipe, key, incr.model, incr.columns, incr.filters,
+                                       incr.extra)
+                    pipe.execute()
+                except Exception:
+                    self.logger.exception('buffer.local.flush-host-failed', extra={
+                        'host_id': host_id,
+                    })
+                    failed.update((key, pending[key]) for key in keys)
+
+        if failed:
+            # The increments of the failed hosts are kept for the next flush.
+            metrics.incr('buffer.local.flush-failed', amount=len(failed))
+            self._restore(failed)
+
+        incr_count = sum(incr.count for incr in six.itervalues(pending))
+        metrics.timing('buffer.local.flush-size', len(pending))
+        metrics.timing('buffer.local.coalesce-ratio', float(incr_count) / len(pending))
+
+    def _restore(self, pending):
+        with self._local_lock:
+            for key, incr in six.iteritems(pending):
+                current = self._local_buffer.get(key)
+                if current is not None:
+                    # Increments merged since the flush started are newer,
+                    # so their extra values win.
+                    for column, amount in six.iteritems(current.columns):
+                        incr.columns[column] += amount
+                    incr.extra.update(current.extra)
+                    incr.count += current.count
+                self._local_buffer[key] = incr
+
+    def get_pending_backlog(self):
+        """
+        Returns a mapping of partition (``None`` for the unpartitioned
+        buffer) to a 3-tuple of the number of pending keys, the timestamp
+        of the oldest pending key (or ``None``) and whether the partition
+        is currently leased by a worker.
+        """
+        partitions = [None]
+        if self.max_pending_partitions > 1:
+            partitions.extend(range(self.max_pending_partitions))
+
+        with self.cluster.all() as conn:
+            results = [
+                (
+                    partition,
+                    conn.zcard(self._make_pending_key(partition)),
+                    conn.zrange(self._make_pending_key(partition), 0, 0, withscores=True),
+                    conn.exists(self._make_lock_key(self._make_pending_key(partition))),
+                ) for partition in partitions
+            ]
+
+        backlog = {}
+        for partition, size, oldest, leased in results:
+            timestamps = [
+                values[0][1] for values in six.itervalues(oldest.value) if values
+            ]
+            backlog[partition] = (
+                sum(six.itervalues(size.value)),
+                min(timestamps) if timestamps else None,
+                any(six.itervalues(leased.value)),
+            )
+        return backlog
+
+    def _record_backlog(self, backlog):
+        now = time()
+        for partition, (size, oldest, _) in six.iteritems(backlog):
+            tags = {'partition': 'none' if partition is None else six.text_type(partition)}
+            metrics.timing('buffer.pending.backlog', size, tags=tags)
+            metrics.timing('buffer.pending.age', now - oldest if oldest else 0, tags=tags)
+
+    def _scale_partitions(self, backlog):
+        """
+        Adjusts the number of active partitions so that each partition has
+        at most ``partition_backlog`` pending keys.
+        """
+        active = self.get_active_partitions()
+        size = sum(size for size, _, _ in six.itervalues(backlog))
+
+        if size > active * self.partition_backlog:
+            target = min(active * 2, self.max_pending_partitions)
+        elif active > self.pending_partitions and size * 4 < active * self.partition_backlog:
+            target = max(active // 2, self.pending_partitions)
+        else:
+            return active
+
+        if target != active:
+            self.cluster.get_routing_client().set(self.pending_partitions_key, target)
+            self._active_partitions = (target, time() + self.pending_partitions_ttl)
+            metrics.incr('buffer.pending.partitions-scaled', tags={
+                'direction': 'up' if target > active else 'down',
+            })
+        metrics.timing('buffer.pending.partitions', target)
+        return target
 
     def process_pending(self, partition=None):
-        if partition is None and self.pending_partitions > 1:
+        if partition is None:
+            # The backlog is recorded for the unpartitioned buffer as well,
+            # since that's where a single hot pending key shows up.
+            backlog = self.get_pending_backlog()
+            self._record_backlog(backlog)
+
+        if partition is None and self.max_pending_partitions > 1:
+            if self.max_pending_partitions > self.pending_partitions:
+                self._scale_partitions(backlog)
+
             # If we're using partitions, this one task fans out into
-            # N subtasks instead.
-            for i in range(self.pending_partitions):
-                process_pending.apply_async(kwargs={'partition': i})
+            # one subtask per partition instead. Partitions that are empty,
+            # or still leased by the worker processing them, are skipped
+            # so slow partitions do not accumulate duplicate tasks.
+            for i in range(self.max_pending_partitions):
+                size, _, leased = backlog[i]
+                if size and not leased:
+                    process_pending.apply_async(kwargs={'partition': i})
             # Explicitly also run over the unpartitioned buffer as well
             # to ease in transition. In practice, this should just be
             # super fast and is fine to do redundantly.
 
         pending_key = self._make_pending_key(partition)
-        client = self.cluster.get_routing_client()
         lock_key = self._make_lock_key(pending_key)
-        # prevent a stampede due to celerybeat + periodic task
-        if not client.set(lock_key, '1', nx=True, ex=60):
+        client = self.cluster.get_local_client_for_key(lock_key)
+        # Lease the partition so that only one worker processes it at a time
+        # (this also prevents a stampede due to celerybeat + periodic task).
+        # The lease is only released by its owner, so a worker that outlived
+        # its lease can't release the lease of the worker that took over.
+        lease = uuid4().hex
+        if not client.set(lock_key, lease, nx=True, ex=self.pending_lease_duration):
             return
 
         pending_buffer = PendingBuffer(self.incr_batch_size)
@@ -244,7 +512,7 @@ class RedisBuffer(Buffer):
 
             metrics.timing('buffer.pending-size', keycount)
         finally:
-            client.delete(lock_key)
+            delete_lock(client, (lock_key, ), (lease, ))
 
     def process(self, key=None, batch_keys=None):
         assert not (key is None and batch_keys is None)
@@ -31,6 +31,10 @@ class BaseCache(local):
     def set(self, key, value, timeout, version=None, raw=False):
         raise NotImplementedError
 
+    def set_many(self, items, timeout, version=None, raw=False):
+        for key, value in items:
+            self.set(key, value, timeout, version=version, raw=raw)
+
     def delete(self, key, version=None):
         raise NotImplementedError
 
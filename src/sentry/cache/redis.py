@@ -8,7 +8,10 @@ sentry.cache.redis
 
 from __future__ import absolute_import
 
-from sentry.utils import json
+import six
+import zlib
+
+from sentry.utils import json, metrics
 from sentry.utils.redis import get_cluster_from_options, redis_clusters
 
 from .base import BaseCache
@@ -18,23 +21,78 @@ class ValueTooLarge(Exception):
     pass
 
 
+# Encoded values start with a null byte, which can never begin a JSON
+# document, followed by the format version.  Anything else is plain JSON.
+ENCODED_MARKER = b'\x00'
+ENCODING_ZLIB_JSON = b'\x01'
+
+
+def encode_value(value, compress_threshold=None):
+    """
+    Serializes a cache value.  Documents of at least ``compress_threshold``
+    bytes are compressed and prefixed with a versioned header; everything
+    else is stored as plain JSON so existing readers are unaffected.
+    """
+    v = json.dumps(value)
+    if compress_threshold is None or len(v) < compress_threshold:
+        return v
+
+    if isinstance(v, six.text_type):
+        v = v.encode('utf-8')
+    encoded = ENCODED_MARKER + ENCODING_ZLIB_JSON + zlib.compress(v)
+    metrics.timing('cache.value-size.raw', len(v))
+    metrics.timing('cache.value-size.encoded', len(encoded))
+    return encoded
+
+
+def decode_value(v):
+    """
+    Inverse of ``encode_value``.  Plain JSON values written before
+    compression was enabled decode unchanged.
+    """
+    if v[:1] != ENCODED_MARKER:
+        return json.loads(v)
+
+    encoding = v[1:2]
+    if encoding == ENCODING_ZLIB_JSON:
+        v = zlib.decompress(v[2:])
+        if isinstance(v, six.binary_type):
+            v = v.decode('utf-8')
+        return json.loads(v)
+
+    raise ValueError('Unknown cache value encoding: %r' % (encoding, ))
+
+
 class CommonRedisCache(BaseCache):
     key_expire = 60 * 60  # 1 hour
     max_size = 50 * 1024 * 1024  # 50MB
 
-    def __init__(self, client, **options):
+    def __init__(self, client, compress_threshold=None, **options):
         self.client = client
+        # Values whose JSON is at least this many bytes are stored zlib
+        # compressed.  Readers always understand both formats, so this can
+        # be enabled once every worker runs a version that decodes them.
+        self.compress_threshold = compress_threshold
         BaseCache.__init__(self, **options)
 
-    def set(self, key, value, timeout, version=None, raw=False):
+    def _set(self, client, key, value, timeout, version=None, raw=False):
         key = self.make_key(key, version=version)
-        v = json.dumps(value) if not raw else value
+        v = encode_value(value, self.compress_threshold) if not raw else value
         if len(v) > self.max_size:
             raise ValueTooLarge('Cache key too large: %r %r' % (key, len(v)))
         if timeout:
-            self.client.setex(key, int(timeout), v)
+            client.setex(key, int(timeout), v)
         else:
-            self.client.set(key, v)
+            client.set(key, v)
+
+    def set(self, key, value, timeout, version=None, raw=False):
+        self._set(self.client, key, value, timeout, version=version, raw=raw)
+
+    def set_many(self, items, timeout, version=None, raw=False):
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items:
+            self._set(pipe, key, value, timeout, version=version, raw=raw)
+        pipe.execute()
 
     def delete(self, key, version=None):
         key = self.make_key(key, version=version)
@@ -44,7 +102,7 @@ class CommonRedisCache(BaseCache):
         key = self.make_key(key, version=version)
         result = self.client.get(key)
         if result is not None and not raw:
-            result = json.loads(result)
+            result = decode_value(result)
         return result
 
 
@@ -56,6 +114,13 @@ class RbCache(CommonRedisCache):
         client = cluster.get_routing_client()
         CommonRedisCache.__init__(self, client, **options)
 
+    def set_many(self, items, timeout, version=None, raw=False):
+        # The routing client cannot pipeline across hosts, but map mode
+        # batches the commands for each host into a single round trip.
+        with self.client.map() as client:
+            for key, value in items:
+                self._set(client, key, value, timeout, version=version, raw=raw)
+
 
 # Confusing legacy name for RbCache.  We don't actually have a pure redis cache
 RedisCache = RbCache
@@ -18,19 +18,18 @@ import zlib
 
 from django.core.exceptions import SuspiciousOperation
 from django.utils.crypto import constant_time_compare
-from gzip import GzipFile
-from six import BytesIO
 from time import time
 
+from sentry import options
 from sentry.attachments import attachment_cache
 from sentry.cache import default_cache
+from sentry.celery import app
 from sentry.models import ProjectKey
 from sentry.tasks.store import preprocess_event, \
     preprocess_event_from_reprocessing
-from sentry.utils import json
+from sentry.utils import json, metrics
 from sentry.utils.auth import parse_auth_header
 from sentry.utils.http import origin_from_request
-from sentry.utils.strings import decompress
 from sentry.utils.sdk import configure_scope
 from sentry.utils.canonical import CANONICAL_TYPES
 
@@ -38,6 +37,9 @@ from sentry.utils.canonical import CANONICAL_TYPES
 _dist_re = re.compile(r'^[a-zA-Z0-9_.-]+$')
 logger = logging.getLogger("sentry.api")
 
+# Amount of inflated output produced per step when decompressing payloads
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
 
 class APIError(Exception):
     http_status = 400
@@ -63,6 +65,11 @@ class APIForbidden(APIError):
     http_status = 403
 
 
+class EventTooLarge(APIError):
+    http_status = 413
+    msg = 'Event payload exceeds the maximum allowed size'
+
+
 class APIRateLimited(APIError):
     http_status = 429
     msg = 'Creation of this event was denied due to rate limiting'
@@ -214,6 +221,39 @@ class ClientApiHelper(object):
         task.delay(cache_key=cache_key, start_time=start_time,
                    event_id=data['event_id'])
 
+    def insert_data_to_database_batch(self, data_list, start_time=None):
+        """
+        Bulk variant of ``insert_data_to_database`` used by the batch store
+        endpoint. All payloads are written to the cache in one round trip
+        and the ``preprocess_event`` tasks are published over a single
+        broker connection.
+        """
+        if start_time is None:
+            start_time = time()
+
+        cache_timeout = 3600
+        items = []
+        for data in data_list:
+            if isinstance(data, CANONICAL_TYPES):
+                data = dict(data.items())
+            items.append((cache_key_for_event(data), data))
+
+        if not items:
+            return
+
+        default_cache.set_many(items, cache_timeout)
+
+        with app.producer_or_acquire() as producer:
+            for cache_key, data in items:
+                preprocess_event.apply_async(
+                    kwargs={
+                        'cache_key': cache_key,
+                        'start_time': start_time,
+                        'event_id': data['event_id'],
+                    },
+                    producer=producer,
+                )
+
 
 class MinidumpApiHelper(ClientApiHelper):
     def origin_from_request(self, request):
@@ -261,9 +301,41 @@ def cache_key_for_event(data):
     return u'e:{1}:{0}'.format(data['project'], data['event_id'])
 
 
+def inflate(encoded_data, wbits=zlib.MAX_WBITS, max_size=None):
+    """
+    Incrementally inflates ``encoded_data``, aborting with ``EventTooLarge``
+    as soon as the output grows past ``max_size`` bytes. This keeps
+    compression bombs from being expanded into memory in full.
+    """
+    if max_size is None:
+        max_size = options.get('store.max-event-size')
+
+    decompressor = zlib.decompressobj(wbits)
+    chunks = []
+    size = 0
+    data = encoded_data
+    while data:
+        chunk = decompressor.decompress(data, DECOMPRESS_CHUNK_SIZE)
+        size += len(chunk)
+        if size > max_size:
+            raise EventTooLarge()
+        chunks.append(chunk)
+        data = decompressor.unconsumed_tail
+
+    chunk = decompressor.flush()
+    size += len(chunk)
+    if size > max_size:
+        raise EventTooLarge()
+    chunks.append(chunk)
+
+    return b''.join(chunks)
+
+
 def decompress_deflate(encoded_data):
     try:
-        return zlib.decompress(encoded_data).decode("utf-8")
+        return inflate(encoded_data).decode("utf-8")
+    except EventTooLarge:
+        raise
     except Exception as e:
         # This error should be caught as it suggests that there's a
         # bug somewhere in the client's code.
@@ -273,12 +345,10 @@ def decompress_deflate(encoded_data):
 
 def decompress_gzip(encoded_data):
     try:
-        fp = BytesIO(encoded_data)
-        try:
-            f = GzipFile(fileobj=fp)
-            return f.read().decode("utf-8")
-        finally:
-            f.close()
+        # A window size offset of 16 makes zlib expect a gzip header
+        return inflate(encoded_data, wbits=16 + zlib.MAX_WBITS).decode("utf-8")
+    except EventTooLarge:
+        raise
     except Exception as e:
         # This error should be caught as it suggests that there's a
         # bug somewhere in the client's code.
@@ -289,9 +359,11 @@ def decompress_gzip(encoded_data):
 def decode_and_decompress_data(encoded_data):
     try:
         try:
-            return decompress(encoded_data).decode("utf-8")
+            return inflate(base64.b64decode(encoded_data)).decode("utf-8")
         except zlib.error:
             return base64.b64decode(encoded_data).decode("utf-8")
+    except EventTooLarge:
+        raise
     except Exception as e:
         # This error should be caught as it suggests that there's a
         # bug somewhere in the client's code.
@@ -299,6 +371,40 @@ def decode_and_decompress_data(encoded_data):
         raise APIError("Bad data decoding request (%s, %s)" % (type(e).__name__, e))
 
 
+def decode_payload(data, content_encoding=None):
+    """
+    Decodes a raw request body into a dictionary, honoring the
+    ``Content-Encoding`` the client declared.
+    """
+    if isinstance(data, six.binary_type):
+        if content_encoding == 'gzip':
+            encoding = 'gzip'
+            decoder = decompress_gzip
+        elif content_encoding == 'deflate':
+            encoding = 'deflate'
+            decoder = decompress_deflate
+        elif data[0] != b'{':
+            encoding = 'base64'
+            decoder = decode_and_decompress_data
+        else:
+            encoding = 'identity'
+            decoder = decode_data
+            if len(data) > options.get('store.max-event-size'):
+                raise EventTooLarge()
+
+        with metrics.timer('events.decode', tags={'content_encoding': encoding}):
+            data = decoder(data)
+            metrics.timing(
+                'events.decompressed_size',
+                len(data),
+                tags={'content_encoding': encoding},
+            )
+            data = safely_load_json_string(data)
+    elif isinstance(data, six.text_type):
+        data = safely_load_json_string(data)
+    return data
+
+
 def decode_data(encoded_data):
     try:
         return encoded_data.decode("utf-8")
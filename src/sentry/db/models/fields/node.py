@@ -39,6 +39,10 @@ class NodeIntegrityFailure(Exception):
 
 
 class NodeData(collections.MutableMapping):
+    # Instances with ``lazy`` set are expected to be loaded from nodestore on
+    # first access, instead of being populated with ``bind_data`` up front.
+    lazy = False
+
     def __init__(self, field, id, data=None):
         self.field = field
         self.id = id
@@ -57,7 +61,9 @@ class NodeData(collections.MutableMapping):
         # CanonicalKeyDict
         data.pop('data', None)
         data['_node_data_CANONICAL'] = isinstance(data['_node_data'], CANONICAL_TYPES)
-        data['_node_data'] = dict(data['_node_data'].items())
+        # Lazy instances that were never loaded stay unpopulated.
+        if data['_node_data'] is not None:
+            data['_node_data'] = dict(data['_node_data'].items())
         return data
 
     def __setstate__(self, state):
@@ -104,7 +110,9 @@ class NodeData(collections.MutableMapping):
             return self._node_data
 
         elif self.id:
-            if settings.DEBUG:
+            if self.lazy:
+                pass
+            elif settings.DEBUG:
                 raise NodeUnpopulated('You should populate node data before accessing it.')
             else:
                 warnings.warn('You should populate node data before accessing it.')
@@ -47,7 +47,7 @@ class GroupDeletionTask(ModelDeletionTask):
         return super(GroupDeletionTask, self).delete_instance(instance)
 
     def mark_deletion_in_progress(self, instance_list):
-        from sentry.models import Group, GroupStatus
+        from sentry.models import Group, GroupHash, GroupStatus
 
         Group.objects.filter(
             id__in=[i.id for i in instance_list],
@@ -56,3 +56,5 @@ class GroupDeletionTask(ModelDeletionTask):
         ).update(
             status=GroupStatus.DELETION_IN_PROGRESS,
         )
+
+        GroupHash.invalidate_cache(group_id__in=[i.id for i in instance_list])
@@ -56,7 +56,7 @@ class Backend(Service):
     be preempted by a new record being added to the timeline, requiring it to
     be transitioned to "waiting" instead.)
     """
-    __all__ = ('add', 'delete', 'digest', 'enabled', 'maintenance', 'schedule', 'validate')
+    __all__ = ('add', 'delete', 'digest', 'digest_many', 'enabled', 'maintenance', 'schedule', 'validate')
 
     def __init__(self, **options):
         # The ``minimum_delay`` option defines the default minimum amount of
@@ -159,6 +159,37 @@ class Backend(Service):
         """
         raise NotImplementedError
 
+    def digest_many(self, keys, minimum_delay=None):
+        """
+        Extract records from several timelines for processing at once.
+
+        This method acts as a context manager like ``digest``, but the target
+        of the ``as`` clause is a mapping of timeline key to the records
+        contained within that digest. ``minimum_delay`` may either be a single
+        value used for all timelines, or a mapping of timeline key to value.
+
+        Timelines that cannot be digested (for example, because they are not
+        in the ready state) are logged and left out of the mapping rather than
+        causing the entire operation to fail. If the context manager
+        successfully exits, each digest that is still present in the mapping
+        is closed, so a digest that could not be processed can be removed from
+        the mapping to preserve its records. If an exception is raised during
+        the execution of the context manager, no digests are closed.
+
+        For example::
+
+            with timelines.digest_many(['project:1', 'project:2']) as digests:
+                messages = {
+                    key: build_digest_email(records)
+                    for key, records in digests.items()
+                }
+
+            for message in messages.values():
+                message.send_async()
+
+        """
+        raise NotImplementedError
+
     def schedule(self, deadline):
         """
         Identify timelines that are ready for processing.
@@ -4,6 +4,7 @@ import logging
 import six
 import time
 
+from collections import defaultdict
 from contextlib import contextmanager
 from redis.client import ResponseError
 
@@ -17,6 +18,7 @@ from sentry.utils.versioning import Version
 logger = logging.getLogger('sentry.digests')
 
 script = load_script('digests/digests.lua')
+delete_lock = load_script('utils/locking/delete_lock.lua')
 
 
 class RedisBackend(Backend):
@@ -197,6 +199,17 @@ class RedisBackend(Backend):
                     exc_info=True
                 )
 
+    def __decode_records(self, response):
+        return map(
+            lambda key__value__timestamp: Record(
+                key__value__timestamp[0],
+                self.codec.decode(
+                    key__value__timestamp[1]) if key__value__timestamp[1] is not None else None,
+                float(key__value__timestamp[2]),
+            ),
+            response,
+        )
+
     @contextmanager
     def digest(self, key, minimum_delay=None, timestamp=None):
         if minimum_delay is None:
@@ -227,15 +240,7 @@ class RedisBackend(Backend):
                 else:
                     raise
 
-            records = map(
-                lambda key__value__timestamp: Record(
-                    key__value__timestamp[0],
-                    self.codec.decode(
-                        key__value__timestamp[1]) if key__value__timestamp[1] is not None else None,
-                    float(key__value__timestamp[2]),
-                ),
-                response,
-            )
+            records = self.__decode_records(response)
 
             # If the record value is `None`, this means the record data was
             # missing (it was presumably evicted by Redis) so we don't need to
@@ -252,6 +257,149 @@ class RedisBackend(Backend):
                 [record.key for record in records],
             )
 
+    def __digest_open_partition(self, host, keys, lock_keys, timestamp):
+        """
+        Lock and open the digests for all of the timelines on a partition,
+        using one pipeline for the locks and one for the scripts. Returns the
+        keys that were locked, and the records of each digest that was opened.
+        """
+        locked, digests = [], {}
+        with self.cluster.get_local_client(host).pipeline(transaction=False) as pipeline:
+            for key in keys:
+                pipeline.set(lock_keys[key], self.locks.backend.uuid, ex=30, nx=True)
+
+            for key, result in zip(keys, pipeline.execute(raise_on_error=False)):
+                if result is True:
+                    locked.append(key)
+                else:
+                    logger.info('Skipped digest of %r, could not acquire lock: %r', key, result)
+
+            for key in locked:
+                script(
+                    pipeline, [key], [
+                        'DIGEST_OPEN',
+                        self.namespace,
+                        self.ttl,
+                        timestamp,
+                        key,
+                        self.capacity if self.capacity else -1,
+                    ]
+                )
+
+            for key, response in zip(locked, pipeline.execute(raise_on_error=False)):
+                if isinstance(response, ResponseError) and \
+                        'err(invalid_state):' in response.message:
+                    logger.info('Skipped digest of %r, timeline is not in the ready state.', key)
+                elif isinstance(response, Exception):
+                    logger.error('Failed to open digest %r due to error: %r', key, response)
+                else:
+                    digests[key] = self.__decode_records(response)
+
+        return locked, digests
+
+    def __digest_close_partition(self, host, digests, minimum_delay, timestamp):
+        keys = list(digests.keys())
+        with self.cluster.get_local_client(host).pipeline(transaction=False) as pipeline:
+            for key in keys:
+                script(
+                    pipeline,
+                    [key],
+                    ['DIGEST_CLOSE', self.namespace, self.ttl, timestamp, key, minimum_delay(key)] +
+                    [record.key for record in digests[key]],
+                )
+
+            for key, response in zip(keys, pipeline.execute(raise_on_error=False)):
+                if isinstance(response, Exception):
+                    logger.error('Failed to close digest %r due to error: %r', key, response)
+
+    def __release_partition_locks(self, host, lock_keys):
+        with self.cluster.get_local_client(host).pipeline(transaction=False) as pipeline:
+            for lock_key in lock_keys:
+                delete_lock(pipeline, (lock_key, ), (self.locks.backend.uuid, ))
+            pipeline.execute(raise_on_error=False)
+
+    @contextmanager
+    def digest_many(self, keys, minimum_delay=None, timestamp=None):
+        def get_minimum_delay(key):
+            if isinstance(minimum_delay, dict):
+                delay = minimum_delay.get(key)
+            else:
+                delay = minimum_delay
+            return delay if delay is not None else self.minimum_delay
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        # The timeline lock is routed by the timeline key (see
+        # ``_get_timeline_lock``), so it is always placed on the same
+        # partition as the timeline itself.
+        router = self.cluster.get_router()
+        partitions = defaultdict(list)
+        lock_keys = {}
+        for key in keys:
+            timeline_key = u'{}:t:{}'.format(self.namespace, key)
+            lock_keys[key] = self.locks.backend.prefix_key(timeline_key)
+            partitions[router.get_host_for_key(timeline_key)].append(key)
+
+        locked = {}
+        opened = {}
+        try:
+            for host, partition_keys in six.iteritems(partitions):
+                try:
+                    locked[host], opened[host] = self.__digest_open_partition(
+                        host, partition_keys, lock_keys, timestamp)
+                except Exception as error:
+                    logger.error(
+                        'Failed to open digests on partition %r due to error: %r',
+                        host,
+                        error,
+                        exc_info=True
+                    )
+
+            # If the record value is `None`, this means the record data was
+            # missing (it was presumably evicted by Redis) so we don't need to
+            # return it here.
+            digests = {
+                key: filter(lambda record: record.value is not None, records)
+                for partition in six.itervalues(opened)
+                for key, records in six.iteritems(partition)
+            }
+
+            yield digests
+
+            # Only the digests that are still part of the mapping are closed,
+            # so the caller can remove a digest to have it left unchanged.
+            for host, partition in six.iteritems(opened):
+                partition = {key: records for key, records in six.iteritems(partition)
+                             if key in digests}
+                if not partition:
+                    continue
+
+                try:
+                    self.__digest_close_partition(host, partition, get_minimum_delay, timestamp)
+                except Exception as error:
+                    logger.error(
+                        'Failed to close digests on partition %r due to error: %r',
+                        host,
+                        error,
+                        exc_info=True
+                    )
+        finally:
+            for host, partition_keys in six.iteritems(locked):
+                if not partition_keys:
+                    continue
+
+                try:
+                    self.__release_partition_locks(
+                        host, [lock_keys[key] for key in partition_keys])
+                except Exception as error:
+                    logger.warning(
+                        'Failed to release digest locks on partition %r due to error: %r',
+                        host,
+                        error,
+                        exc_info=True
+                    )
+
     def delete(self, key, timestamp=None):
         if timestamp is None:
             timestamp = time.time()
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import copy
 import functools
 import itertools
 import logging
@@ -79,6 +80,71 @@ def fetch_state(project, records):
     }
 
 
+def fetch_states(digests):
+    """
+    Fetch the state for several digests at once, where ``digests`` is a
+    mapping of digest key to ``(project, records)``. Returns a mapping of
+    digest key to state, in the same format as ``fetch_state``.
+
+    The groups and rules of all digests are loaded with a single query each.
+    Event and user counts cover the time range of each digest, so they are
+    fetched once for each distinct time range rather than once per digest.
+    """
+    ranges = {}
+    group_ids = set()
+    rule_ids = set()
+    range_group_ids = defaultdict(set)
+    for key, (project, records) in six.iteritems(digests):
+        # See ``fetch_state`` for why these are reversed.
+        ranges[key] = (records[-1].datetime, records[0].datetime)
+        ids = set(record.value.event.group_id for record in records)
+        group_ids.update(ids)
+        range_group_ids[ranges[key]].update(ids)
+        rule_ids.update(itertools.chain.from_iterable(record.value.rules for record in records))
+
+    groups = Group.objects.in_bulk(group_ids)
+    rules = Rule.objects.in_bulk(rule_ids)
+
+    event_counts = {}
+    user_counts = {}
+    for (start, end), ids in six.iteritems(range_group_ids):
+        ids = [id for id in ids if id in groups]
+        event_counts[(start, end)] = tsdb.get_sums(tsdb.models.group, ids, start, end)
+        user_counts[(start, end)] = tsdb.get_distinct_counts_totals(
+            tsdb.models.users_affected_by_group, ids, start, end
+        )
+
+    states = {}
+    for key, (project, records) in six.iteritems(digests):
+        # ``attach_state`` modifies the groups and rules it is provided, so
+        # every digest gets its own copies.
+        digest_groups = {}
+        for record in records:
+            group = groups.get(record.value.event.group_id)
+            if group is not None:
+                digest_groups[group.id] = copy.copy(group)
+
+        states[key] = {
+            'project': project,
+            'groups': digest_groups,
+            'rules': {
+                id: copy.copy(rules[id])
+                for id in itertools.chain.from_iterable(record.value.rules for record in records)
+                if id in rules
+            },
+            'event_counts': {
+                id: count for id, count in six.iteritems(event_counts[ranges[key]])
+                if id in digest_groups
+            },
+            'user_counts': {
+                id: count for id, count in six.iteritems(user_counts[ranges[key]])
+                if id in digest_groups
+            },
+        }
+
+    return states
+
+
 def attach_state(project, groups, rules, event_counts, user_counts):
     for id, group in six.iteritems(groups):
         assert group.project_id == project.id, 'Group must belong to Project'
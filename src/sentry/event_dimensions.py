@@ -0,0 +1,311 @@
+"""
+sentry.event_dimensions
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Resolves the rows that record where an event was seen: its environment, and
+the group, release and project combinations of that environment.
+
+All rows an event needs are looked up with a single ``cache.get_many``. In
+the steady state every row is cached, so resolving them does not touch the
+database at all (apart from the ``last_seen`` updates, which happen at most
+once a minute per row.) Rows that are not cached are created with a single
+``INSERT ... ON CONFLICT DO NOTHING`` statement, and only the rows that
+already existed are read back from the database.
+"""
+from __future__ import absolute_import
+
+import logging
+
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import AutoField
+
+from sentry.models import (
+    Environment, GroupEnvironment, GroupRelease, ReleaseEnvironment, ReleaseProjectEnvironment
+)
+from sentry.utils import metrics
+from sentry.utils.cache import cache
+from sentry.utils.db import supports_insert_on_conflict
+from sentry.utils.hashlib import md5_text
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = 3600
+
+# Rows that could not be created (for instance because the group or release
+# was deleted while the event was processed) are remembered for a short time
+# so that events for them don't retry the insert over and over again.
+NEGATIVE_CACHE_TTL = 60
+MISSING = '__missing__'
+
+LAST_SEEN_UPDATE_INTERVAL = timedelta(seconds=60)
+
+EventDimensions = namedtuple(
+    'EventDimensions',
+    'environment group_environment is_new_group_environment '
+    'release_environment release_project_environment group_release'
+)
+
+
+def get_cache_keys(project, group, environment_name, release=None):
+    name = md5_text(environment_name).hexdigest()
+    keys = OrderedDict([
+        ('environment', u'dim:1:env:{}:{}'.format(project.id, name)),
+        ('group_environment', u'dim:1:groupenv:{}:{}'.format(group.id, name)),
+    ])
+    if release is not None:
+        keys['release_environment'] = u'dim:1:releaseenv:{}:{}:{}'.format(
+            project.organization_id, release.id, name)
+        keys['release_project_environment'] = u'dim:1:releaseprojectenv:{}:{}:{}'.format(
+            project.id, release.id, name)
+        keys['group_release'] = u'dim:1:grouprelease:{}:{}:{}'.format(
+            group.id, release.id, name)
+    return keys
+
+
+def build_rows(dimensions, project, group, environment, release, datetime):
+    """
+    Returns a mapping of dimension to an unsaved instance of its row, and the
+    fields that identify the row.
+    """
+    rows = OrderedDict()
+    if 'group_environment' in dimensions:
+        rows['group_environment'] = (
+            GroupEnvironment(
+                group_id=group.id,
+                environment_id=environment.id,
+                first_release_id=release.id if release else None,
+            ),
+            ('group_id', 'environment_id'),
+        )
+    if 'release_environment' in dimensions:
+        rows['release_environment'] = (
+            ReleaseEnvironment(
+                organization_id=project.organization_id,
+                release_id=release.id,
+                environment_id=environment.id,
+                first_seen=datetime,
+                last_seen=datetime,
+            ),
+            ('organization_id', 'release_id', 'environment_id'),
+        )
+    if 'release_project_environment' in dimensions:
+        rows['release_project_environment'] = (
+            ReleaseProjectEnvironment(
+                release_id=release.id,
+                project_id=project.id,
+                environment_id=environment.id,
+                first_seen=datetime,
+                last_seen=datetime,
+            ),
+            ('release_id', 'project_id', 'environment_id'),
+        )
+    if 'group_release' in dimensions:
+        rows['group_release'] = (
+            GroupRelease(
+                release_id=release.id,
+                group_id=group.id,
+                environment=environment.name,
+                project_id=group.project_id,
+                first_seen=datetime,
+                last_seen=datetime,
+            ),
+            ('group_id', 'release_id', 'environment'),
+        )
+    return rows
+
+
+def insert_rows(using, instances):
+    """
+    Inserts the instances (a mapping of dimension to unsaved instance) with a
+    single statement, skipping any instance that conflicts with an existing
+    row. Returns the dimensions that were created, and sets their ids.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+
+    tables = []
+    selects = []
+    params = []
+    names = list(instances.keys())
+    for i, name in enumerate(names):
+        instance = instances[name]
+        fields = [f for f in instance._meta.local_fields if not isinstance(f, AutoField)]
+        tables.append(
+            u'd{} AS (INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING RETURNING id)'.format(
+                i,
+                quote_name(instance._meta.db_table),
+                u', '.join(quote_name(f.column) for f in fields),
+                u', '.join(['%s'] * len(fields)),
+            )
+        )
+        selects.append(u'SELECT {}, id FROM d{}'.format(i, i))
+        params.extend(
+            f.get_db_prep_save(f.pre_save(instance, True), connection=connection) for f in fields
+        )
+
+    cursor = connection.cursor()
+    cursor.execute(
+        u'WITH {} {}'.format(u', '.join(tables), u' UNION ALL '.join(selects)),
+        params,
+    )
+
+    created = set()
+    for i, id in cursor.fetchall():
+        instances[names[i]].id = id
+        created.add(names[i])
+    return created
+
+
+def get_or_create_row(instance, lookup):
+    model = type(instance)
+    values = {
+        f.attname: getattr(instance, f.attname)
+        for f in instance._meta.local_fields if not isinstance(f, AutoField)
+    }
+    return model.objects.get_or_create(
+        defaults={k: v for k, v in values.items() if k not in lookup},
+        **{k: values[k] for k in lookup}
+    )
+
+
+def resolve_rows(rows):
+    """
+    Gets or creates the rows, returning a mapping of dimension to instance
+    (or ``None`` if the row could not be created) and the set of dimensions
+    that were created.
+    """
+    using = router.db_for_write(GroupEnvironment)
+    instances = OrderedDict((name, instance) for name, (instance, _) in rows.items())
+
+    if supports_insert_on_conflict(using):
+        try:
+            with transaction.atomic(using=using):
+                created = insert_rows(using, instances)
+        except IntegrityError:
+            logger.warning('event_dimensions.insert_failed', exc_info=True)
+        else:
+            results = {}
+            for name, (instance, lookup) in rows.items():
+                if name in created:
+                    results[name] = instance
+                    continue
+                try:
+                    results[name] = type(instance).objects.get(
+                        **{k: getattr(instance, k) for k in lookup}
+                    )
+                except type(instance).DoesNotExist:
+                    results[name] = None
+            return results, created
+
+    # Fall back to creating the rows one at a time, which also isolates the
+    # rows that can't be created.
+    results = {}
+    created = set()
+    for name, (instance, lookup) in rows.items():
+        try:
+            with transaction.atomic(using=using):
+                results[name], is_created = get_or_create_row(instance, lookup)
+        except IntegrityError:
+            logger.warning('event_dimensions.create_failed', exc_info=True,
+                           extra={'dimension': name})
+            results[name] = None
+        else:
+            if is_created:
+                created.add(name)
+    return results, created
+
+
+def touch_last_seen(instance, datetime):
+    """
+    Updates the ``last_seen`` of an existing row, at most once a minute.
+    Returns whether the instance was changed.
+    """
+    if instance.last_seen >= datetime - LAST_SEEN_UPDATE_INTERVAL:
+        return False
+
+    # Postgres can optimistically skip the update if another process
+    # already moved ``last_seen`` forward.
+    type(instance).objects.filter(
+        id=instance.id,
+        last_seen__lt=datetime - LAST_SEEN_UPDATE_INTERVAL,
+    ).update(
+        last_seen=datetime,
+    )
+    instance.last_seen = datetime
+    return True
+
+
+def resolve_event_dimensions(project, group, environment, release=None, datetime=None):
+    """
+    Gets or creates the environment, group environment and (if the event has
+    a release) release environment, release project environment and group
+    release of an event.
+
+    Dimensions whose rows could not be created are returned as ``None``.
+    """
+    environment_name = Environment.get_name_or_default(environment)
+    keys = get_cache_keys(project, group, environment_name, release)
+
+    cached = cache.get_many(keys.values())
+
+    results = {}
+    for name, key in keys.items():
+        value = cached.get(key)
+        if value is None:
+            result = 'miss'
+        elif value == MISSING:
+            result = 'negative'
+            results[name] = None
+        else:
+            result = 'hit'
+            results[name] = value
+        metrics.incr('events.dimensions.cache', skip_internal=True, tags={
+            'dimension': name,
+            'result': result,
+        })
+
+    updates = {}
+    missing = {}
+
+    environment = results.get('environment')
+    if environment is None:
+        environment = Environment.get_or_create(project=project, name=environment_name)
+        results['environment'] = environment
+        updates[keys['environment']] = environment
+
+    created = set()
+    rows = build_rows(
+        [name for name in keys if name not in results],
+        project, group, environment, release, datetime,
+    )
+    if rows:
+        resolved, created = resolve_rows(rows)
+        for name, instance in resolved.items():
+            results[name] = instance
+            if instance is None:
+                missing[keys[name]] = MISSING
+            else:
+                updates[keys[name]] = instance
+
+    for name in ('release_environment', 'release_project_environment', 'group_release'):
+        instance = results.get(name)
+        if instance is None or name in created:
+            continue
+        if touch_last_seen(instance, datetime):
+            updates[keys[name]] = instance
+
+    if updates:
+        cache.set_many(updates, CACHE_TTL)
+    if missing:
+        cache.set_many(missing, NEGATIVE_CACHE_TTL)
+
+    return EventDimensions(
+        environment=results['environment'],
+        group_environment=results['group_environment'],
+        is_new_group_environment='group_environment' in created,
+        release_environment=results.get('release_environment'),
+        release_project_environment=results.get('release_project_environment'),
+        group_release=results.get('group_release'),
+    )
@@ -17,7 +17,7 @@ from django.db import connection, IntegrityError, router, transaction
 from django.utils import timezone
 from django.utils.encoding import force_text
 
-from sentry import buffer, eventtypes, eventstream, features, tsdb, filters
+from sentry import buffer, eventtypes, eventstream, features, options, tsdb, filters
 from sentry.constants import (
     CLIENT_RESERVED_ATTRS, LOG_LEVELS, LOG_LEVELS_MAP, DEFAULT_LOG_LEVEL,
     DEFAULT_LOGGER_NAME, MAX_CULPRIT_LENGTH, VALID_PLATFORMS, MAX_TAG_VALUE_LENGTH
@@ -25,26 +25,23 @@ from sentry.constants import (
 from sentry.coreapi import (
     APIError,
     APIForbidden,
-    decompress_gzip,
-    decompress_deflate,
-    decode_and_decompress_data,
-    decode_data,
-    safely_load_json_string,
+    decode_payload,
 )
+from sentry.event_dimensions import resolve_event_dimensions
 from sentry.interfaces.base import get_interface, prune_empty_keys, InterfaceValidationError
 from sentry.interfaces.exception import normalize_mechanism_meta
 from sentry.interfaces.schemas import validate_and_default_interface
 from sentry.lang.native.utils import get_sdk_from_event
 from sentry.models import (
-    Activity, Environment, Event, EventError, EventMapping, EventUser, Group,
-    GroupEnvironment, GroupHash, GroupLink, GroupRelease, GroupResolution, GroupStatus,
-    Project, Release, ReleaseEnvironment, ReleaseProject,
+    Activity, Event, EventError, EventMapping, EventUser, Group, GroupHash, GroupLink,
+    GroupResolution, GroupStatus, Project, Release, ReleaseProject,
     ReleaseProjectEnvironment, UserReport
 )
 from sentry.plugins import plugins
 from sentry.signals import event_discarded, event_saved, first_event_received
 from sentry.tasks.integrations import kick_off_status_syncs
-from sentry.utils import metrics
+from sentry.utils import metrics, redis
+from sentry.utils.bloom import WindowedBloomFilter
 from sentry.utils.cache import default_cache
 from sentry.utils.canonical import CanonicalKeyDict
 from sentry.utils.data_filters import (
@@ -226,6 +223,38 @@ def has_pending_commit_resolution(group):
     ).exists()
 
 
+def get_event_id_filter():
+    size = options.get('store.event-id-filter.size')
+    if not size:
+        return None
+
+    return WindowedBloomFilter(
+        redis.clusters.get(getattr(settings, 'SENTRY_EVENT_ID_FILTER_CLUSTER', 'default')),
+        'eidf',
+        size,
+        windows=options.get('store.event-id-filter.windows'),
+    )
+
+
+def is_possible_duplicate(project_id, event_id):
+    """
+    Returns whether an event with this ID may already have been saved for the
+    project, recording the ID as seen. This may return false positives, but
+    only returns false negatives for IDs that were last seen before the time
+    windows retained by the filter. Without a filter every event is a
+    possible duplicate.
+    """
+    event_id_filter = get_event_id_filter()
+    if event_id_filter is None:
+        return True
+
+    try:
+        return event_id_filter.check_and_add(u'{}:{}'.format(project_id, event_id))
+    except Exception:
+        logger.warning('event_id_filter.failed', exc_info=True)
+        return True
+
+
 class HashDiscarded(Exception):
     pass
 
@@ -304,19 +333,7 @@ class InvalidTimestamp(Exception):
 
 
 def _decode_event(data, content_encoding):
-    if isinstance(data, six.binary_type):
-        if content_encoding == 'gzip':
-            data = decompress_gzip(data)
-        elif content_encoding == 'deflate':
-            data = decompress_deflate(data)
-        elif data[0] != b'{':
-            data = decode_and_decompress_data(data)
-        else:
-            data = decode_data(data)
-    if isinstance(data, six.text_type):
-        data = safely_load_json_string(data)
-
-    return CanonicalKeyDict(data)
+    return CanonicalKeyDict(decode_payload(data, content_encoding=content_encoding))
 
 
 class EventManager(object):
@@ -793,24 +810,33 @@ class EventManager(object):
         # isn't a perfect solution -- this doesn't handle ``EventMapping`` and
         # there's a race condition between here and when the event is actually
         # saved, but it's an improvement. See GH-7677.)
-        try:
-            event = Event.objects.get(
-                project_id=project.id,
-                event_id=data['event_id'],
-            )
-        except Event.DoesNotExist:
-            pass
+        # IDs are only looked up in the database if the event ID filter has
+        # (probably) seen them before.
+        if is_possible_duplicate(project.id, data['event_id']):
+            try:
+                event = Event.objects.get(
+                    project_id=project.id,
+                    event_id=data['event_id'],
+                )
+            except Event.DoesNotExist:
+                metrics.incr('events.event_id_filter', skip_internal=True,
+                             tags={'result': 'false_positive'})
+            else:
+                metrics.incr('events.event_id_filter', skip_internal=True,
+                             tags={'result': 'duplicate'})
+                logger.info(
+                    'duplicate.found',
+                    exc_info=True,
+                    extra={
+                        'event_uuid': data['event_id'],
+                        'project_id': project.id,
+                        'model': Event.__name__,
+                    }
+                )
+                return event
         else:
-            logger.info(
-                'duplicate.found',
-                exc_info=True,
-                extra={
-                    'event_uuid': data['event_id'],
-                    'project_id': project.id,
-                    'model': Event.__name__,
-                }
-            )
-            return event
+            metrics.incr('events.event_id_filter', skip_internal=True,
+                         tags={'result': 'negative'})
 
         # Pull out the culprit
         culprit = self.get_culprit()
@@ -1000,40 +1026,19 @@ class EventManager(object):
                 )
                 return event
 
-        environment = Environment.get_or_create(
+        dimensions = resolve_event_dimensions(
             project=project,
-            name=environment,
-        )
-
-        group_environment, is_new_group_environment = GroupEnvironment.get_or_create(
-            group_id=group.id,
-            environment_id=environment.id,
-            defaults={
-                'first_release_id': release.id if release else None,
-            },
+            group=group,
+            environment=environment,
+            release=release,
+            datetime=date,
         )
+        environment = dimensions.environment
+        is_new_group_environment = dimensions.is_new_group_environment
+        grouprelease = dimensions.group_release
 
-        if release:
-            ReleaseEnvironment.get_or_create(
-                project=project,
-                release=release,
-                environment=environment,
-                datetime=date,
-            )
-
-            ReleaseProjectEnvironment.get_or_create(
-                project=project,
-                release=release,
-                environment=environment,
-                datetime=date,
-            )
-
-            grouprelease = GroupRelease.get_or_create(
-                group=group,
-                release=release,
-                environment=environment,
-                datetime=date,
-            )
+        # all tsdb writes for this event are committed together
+        tsdb_batch = tsdb.write_batch()
 
         counters = [
             (tsdb.models.group, group.id),
@@ -1043,7 +1048,7 @@ class EventManager(object):
         if release:
             counters.append((tsdb.models.release, release.id))
 
-        tsdb.incr_multi(counters, timestamp=event.datetime, environment_id=environment.id)
+        tsdb_batch.incr_multi(counters, timestamp=event.datetime, environment_id=environment.id)
 
         frequencies = [
             # (tsdb.models.frequent_projects_by_organization, {
@@ -1063,7 +1068,7 @@ class EventManager(object):
             })
         ]
 
-        if release:
+        if grouprelease is not None:
             frequencies.append(
                 (tsdb.models.frequent_releases_by_group, {
                     group.id: {
@@ -1072,7 +1077,7 @@ class EventManager(object):
                 })
             )
 
-        tsdb.record_frequency_multi(frequencies, timestamp=event.datetime)
+        tsdb_batch.record_frequency_multi(frequencies, timestamp=event.datetime)
 
         UserReport.objects.filter(
             project=project,
@@ -1098,6 +1103,7 @@ class EventManager(object):
                         'model': Event.__name__,
                     }
                 )
+                tsdb_batch.commit()
                 return event
 
             index_event_tags.delay(
@@ -1111,7 +1117,7 @@ class EventManager(object):
             )
 
         if event_user:
-            tsdb.record_multi(
+            tsdb_batch.record_multi(
                 (
                     (tsdb.models.users_affected_by_group, group.id, (event_user.tag_value, )),
                     (tsdb.models.users_affected_by_project, project.id, (event_user.tag_value, )),
@@ -1119,6 +1125,9 @@ class EventManager(object):
                 timestamp=event.datetime,
                 environment_id=environment.id,
             )
+
+        tsdb_batch.commit()
+
         if release:
             if is_new:
                 buffer.incr(
@@ -1213,29 +1222,63 @@ class EventManager(object):
                 default_cache.set(cache_key, e_userid, 3600)
         return euser
 
-    def _find_hashes(self, project, hash_list):
-        return map(
-            lambda hash: GroupHash.objects.get_or_create(
-                project=project,
-                hash=hash,
-            )[0],
-            hash_list,
-        )
+    def _find_hashes(self, project, hash_list, use_cache=True):
+        cached = GroupHash.get_cached_many(project.id, hash_list) if use_cache else {}
 
-    def _save_aggregate(self, event, hashes, release, **kwargs):
-        project = event.project
+        all_hashes = []
+        found = []
+        for hash in hash_list:
+            h = cached.get(hash)
+            if h is None:
+                h = GroupHash.objects.get_or_create(
+                    project=project,
+                    hash=hash,
+                )[0]
+                found.append(h)
+            all_hashes.append(h)
 
-        # attempt to find a matching hash
-        all_hashes = self._find_hashes(project, hashes)
+        GroupHash.cache_many(found)
+        return all_hashes, bool(cached)
 
-        existing_group_id = None
+    def _find_existing_group_id(self, all_hashes):
         for h in all_hashes:
             if h.group_id is not None:
-                existing_group_id = h.group_id
-                break
+                return h.group_id
             if h.group_tombstone_id is not None:
                 raise HashDiscarded('Matches group tombstone %s' % h.group_tombstone_id)
 
+    def _save_aggregate(self, event, hashes, release, **kwargs):
+        project = event.project
+
+        # attempt to find a matching hash
+        all_hashes, from_cache = self._find_hashes(project, hashes)
+        existing_group_id = self._find_existing_group_id(all_hashes)
+
+        group = None
+        if existing_group_id is not None:
+            try:
+                group = Group.objects.get(id=existing_group_id)
+            except Group.DoesNotExist:
+                if not from_cache:
+                    raise
+
+            if from_cache and (group is None or group.status in (
+                GroupStatus.PENDING_DELETION,
+                GroupStatus.DELETION_IN_PROGRESS,
+                GroupStatus.PENDING_MERGE,
+            )):
+                # The hash cache may still refer to a group that is being (or
+                # has been) deleted or merged away, so resolve the hashes
+                # from the database instead.
+                metrics.incr('grouphash.cache.stale', skip_internal=True)
+                GroupHash.uncache_many(project.id, hashes)
+                all_hashes, _ = self._find_hashes(project, hashes, use_cache=False)
+                existing_group_id = self._find_existing_group_id(all_hashes)
+                if existing_group_id is None:
+                    group = None
+                elif existing_group_id != getattr(group, 'id', None):
+                    group = Group.objects.get(id=existing_group_id)
+
         # XXX(dcramer): this has the opportunity to create duplicate groups
         # it should be resolved by the hash merging function later but this
         # should be better tested/reviewed
@@ -1245,8 +1288,10 @@ class EventManager(object):
             # make sure it still exists
             first_release = kwargs.pop('first_release', None)
 
+            # The short ID is allocated before the group is created so that
+            # the counter row isn't locked for the rest of the transaction.
+            short_id = project.next_short_id()
             with transaction.atomic():
-                short_id = project.next_short_id()
                 group, group_is_new = Group.objects.create(
                     project=project,
                     short_id=short_id,
@@ -1263,8 +1308,6 @@ class EventManager(object):
             )
 
         else:
-            group = Group.objects.get(id=existing_group_id)
-
             group_is_new = False
 
         # If all hashes are brand new we treat this event as new
@@ -1286,6 +1329,11 @@ class EventManager(object):
                 state=GroupHash.State.LOCKED_IN_MIGRATION,
             ).update(group=group)
 
+            GroupHash.cache_many([
+                GroupHash(id=h.id, project_id=project.id, hash=h.hash, group_id=group.id)
+                for h in new_hashes if h.state != GroupHash.State.LOCKED_IN_MIGRATION
+            ])
+
             if group_is_new and len(new_hashes) == len(all_hashes):
                 is_new = True
 
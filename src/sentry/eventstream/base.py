@@ -2,8 +2,9 @@ from __future__ import absolute_import
 
 import logging
 
+from sentry import options
 from sentry.utils.services import Service
-from sentry.tasks.post_process import post_process_group
+from sentry.tasks.post_process import get_event_ref, post_process_group, record_message_size
 
 
 logger = logging.getLogger(__name__)
@@ -33,15 +34,28 @@ class EventStream(Service):
         if skip_consume:
             logger.info('post_process.skip.raw_event', extra={'event_id': event.id})
         else:
-            post_process_group.delay(
-                group=group,
-                event=event,
+            event_ref = None
+            compact = options.get('eventstream.compact-post-process')
+            if compact:
+                event_ref = get_event_ref(event)
+
+            if event_ref is not None:
+                task_kwargs = {'event': None, 'event_ref': event_ref}
+            else:
+                task_kwargs = {'group': group, 'event': event}
+
+            task_kwargs.update(
                 is_new=is_new,
                 is_sample=is_sample,
                 is_regression=is_regression,
                 is_new_group_environment=is_new_group_environment,
                 primary_hash=primary_hash,
             )
+            # The size is only measured while rolling out compact messages,
+            # since pickling the full event is costly.
+            if compact:
+                record_message_size(task_kwargs)
+            post_process_group.delay(**task_kwargs)
 
     def start_delete_groups(self, project_id, group_ids):
         pass
@@ -62,5 +76,6 @@ class EventStream(Service):
         pass
 
     def relay(self, consumer_group, commit_log_topic,
-              synchronize_commit_group, commit_batch_size=100, initial_offset_reset='latest'):
+              synchronize_commit_group, commit_batch_size=100, initial_offset_reset='latest',
+              dispatch_batch_size=0, dispatch_batch_window=1.0):
         raise RelayNotRequired
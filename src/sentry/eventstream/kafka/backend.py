@@ -1,9 +1,11 @@
 from __future__ import absolute_import
 
+from collections import defaultdict
 from datetime import datetime
 import logging
 import pytz
 import six
+import time
 from uuid import uuid4
 
 from confluent_kafka import OFFSET_INVALID, Producer, TopicPartition
@@ -14,8 +16,8 @@ from sentry.models import Organization
 from sentry.eventstream.base import EventStream
 from sentry.eventstream.kafka.consumer import SynchronizedConsumer
 from sentry.eventstream.kafka.protocol import get_task_kwargs_for_message
-from sentry.tasks.post_process import post_process_group
-from sentry.utils import json
+from sentry.tasks.post_process import post_process_group, post_process_group_batch
+from sentry.utils import json, metrics
 
 logger = logging.getLogger(__name__)
 
@@ -244,7 +246,16 @@ class KafkaEventStream(EventStream):
         )
 
     def relay(self, consumer_group, commit_log_topic,
-              synchronize_commit_group, commit_batch_size=100, initial_offset_reset='latest'):
+              synchronize_commit_group, commit_batch_size=100, initial_offset_reset='latest',
+              dispatch_batch_size=0, dispatch_batch_window=1.0):
+        """
+        Enqueues post-processing tasks for the messages once they have been
+        committed by the Snuba writer. With a ``dispatch_batch_size``, the
+        messages received within ``dispatch_batch_window`` seconds are
+        collected and dispatched as one ``post_process_group_batch`` task
+        per project. Offsets are only committed after their messages were
+        dispatched.
+        """
         logger.debug('Starting relay...')
 
         consumer = SynchronizedConsumer(
@@ -257,6 +268,34 @@ class KafkaEventStream(EventStream):
 
         owned_partition_offsets = {}
 
+        # Task arguments collected for batched dispatch, and the time the
+        # first of them was received.
+        pending = []
+        pending_since = [None]
+
+        def dispatch():
+            if not pending:
+                return
+
+            events_by_project = defaultdict(list)
+            for task_kwargs in pending:
+                events_by_project[task_kwargs['event'].project_id].append(task_kwargs)
+
+            for events in six.itervalues(events_by_project):
+                events.sort(key=lambda task_kwargs: task_kwargs['event'].group_id)
+                post_process_group_batch.delay(events=events)
+
+            metrics.timing('eventstream.relay.dispatch-size', len(pending))
+            metrics.timing('eventstream.relay.dispatch-tasks', len(events_by_project))
+
+            del pending[:]
+            pending_since[0] = None
+
+        def dispatch_expired():
+            if pending_since[0] is not None and \
+                    time.time() - pending_since[0] >= dispatch_batch_window:
+                dispatch()
+
         def commit(partitions):
             results = consumer.commit(offsets=partitions, asynchronous=False)
 
@@ -316,6 +355,7 @@ class KafkaEventStream(EventStream):
                 offsets_to_commit.append(TopicPartition(i.topic, i.partition, offset))
 
             if offsets_to_commit:
+                dispatch()
                 logger.debug(
                     'Committing offset(s) for %s revoked partition(s): %r',
                     len(offsets_to_commit),
@@ -329,6 +369,8 @@ class KafkaEventStream(EventStream):
         )
 
         def commit_offsets():
+            dispatch()
+
             offsets_to_commit = []
             for (topic, partition), offset in owned_partition_offsets.items():
                 if offset is None:
@@ -349,6 +391,7 @@ class KafkaEventStream(EventStream):
             while True:
                 message = consumer.poll(0.1)
                 if message is None:
+                    dispatch_expired()
                     continue
 
                 error = message.error()
@@ -365,7 +408,16 @@ class KafkaEventStream(EventStream):
 
                 task_kwargs = get_task_kwargs_for_message(message.value())
                 if task_kwargs is not None:
-                    post_process_group.delay(**task_kwargs)
+                    if dispatch_batch_size:
+                        if pending_since[0] is None:
+                            pending_since[0] = time.time()
+                        pending.append(task_kwargs)
+                        if len(pending) >= dispatch_batch_size:
+                            dispatch()
+                    else:
+                        post_process_group.delay(**task_kwargs)
+
+                dispatch_expired()
 
                 if i % commit_batch_size == 0:
                     commit_offsets()
@@ -1,10 +1,16 @@
 from __future__ import absolute_import, print_function
 
+import threading
+
+from collections import OrderedDict
+from hashlib import sha1
 from six import text_type
-from symbolic import SourceView
+from symbolic import SourceMapView, SourceView
+from sentry import options
+from sentry.utils import metrics
 from sentry.utils.strings import codec_lookup
 
-__all__ = ['SourceCache', 'SourceMapCache']
+__all__ = ['SourceCache', 'SourceMapCache', 'SourceMapViewCache']
 
 
 def is_utf8(codec):
@@ -84,3 +90,71 @@ class SourceMapCache(object):
             sourcemap = self.get(sourcemap_url)
             return (sourcemap_url, sourcemap)
         return (None, None)
+
+
+class SourceMapViewCache(object):
+    """
+    A process wide cache of parsed sourcemaps, keyed by the hash of their
+    contents so that identical sourcemaps are only parsed once no matter
+    which event or URL they were fetched for.  Least recently used entries
+    are evicted once the total size of the cached sourcemaps exceeds
+    ``max_size`` bytes, which defaults to the ``sourcemaps.view-cache-size``
+    option.
+    """
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self.size = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def max_size(self):
+        if self._max_size is not None:
+            return self._max_size
+        return options.get('sourcemaps.view-cache-size')
+
+    def get(self, key):
+        with self._lock:
+            try:
+                view, size = self._cache.pop(key)
+            except KeyError:
+                return None
+            self._cache[key] = (view, size)
+            return view
+
+    def add(self, key, view, size):
+        max_size = self.max_size
+        if size > max_size:
+            return
+
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._cache[key] = (view, size)
+            self.size += size
+            while self.size > max_size:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.size = 0
+
+    def from_json_bytes(self, body):
+        key = sha1(body).digest()
+        view = self.get(key)
+        if view is not None:
+            metrics.incr('sourcemaps.view_cache.hit', skip_internal=True)
+            return view
+
+        metrics.incr('sourcemaps.view_cache.miss', skip_internal=True)
+        with metrics.timer('sourcemaps.view_cache.parse'):
+            view = SourceMapView.from_json_bytes(body)
+        self.add(key, view, len(body))
+        return view
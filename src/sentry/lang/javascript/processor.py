@@ -9,11 +9,12 @@ import base64
 import six
 import zlib
 
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 from os.path import splitext
 from requests.utils import get_encoding_from_headers
 from six.moves.urllib.parse import urljoin, urlsplit
-from symbolic import SourceMapView
+from uuid import uuid4
 
 # In case SSL is unavailable (light builds) we can't import this here.
 try:
@@ -27,6 +28,7 @@ except ImportError:
 from sentry import http
 from sentry.interfaces.stacktrace import Stacktrace
 from sentry.models import EventError, ReleaseFile
+from sentry.models.releasefile import RELEASE_FILE_INDEX_TTL
 from sentry.utils.cache import cache
 from sentry.utils.files import compress_file
 from sentry.utils.hashlib import md5_text
@@ -35,7 +37,7 @@ from sentry.utils.safe import get_path
 from sentry.utils import metrics
 from sentry.stacktraces import StacktraceProcessor
 
-from .cache import SourceCache, SourceMapCache
+from .cache import SourceCache, SourceMapCache, SourceMapViewCache
 
 # number of surrounding lines (on each side) to fetch
 LINES_OF_CONTEXT = 5
@@ -64,9 +66,17 @@ CACHE_CONTROL_MIN = 60
 # the maximum number of remote resources (i.e. source files) that should be
 # fetched
 MAX_RESOURCE_FETCHES = 100
+# releases with more artifacts than this are resolved with per-file queries
+# instead of an artifact index
+MAX_INDEXED_RELEASE_FILES = 10000
+# the number of release files that are read concurrently
+RELEASE_FILE_FETCH_CONCURRENCY = 4
 
 logger = logging.getLogger(__name__)
 
+# parsed sourcemaps shared by all events processed in this worker
+sourcemap_view_cache = SourceMapViewCache()
+
 
 class UnparseableSourcemap(http.BadSource):
     error_type = EventError.JS_INVALID_SOURCEMAP
@@ -199,88 +209,259 @@ def discover_sourcemap(result):
     return sourcemap
 
 
-def fetch_release_file(filename, release, dist=None):
-    cache_key = 'releasefile:v1:%s:%s' % (release.id, md5_text(filename).hexdigest(), )
-
-    logger.debug('Checking cache for release artifact %r (release_id=%s)', filename, release.id)
-    result = cache.get(cache_key)
-
-    dist_name = dist and dist.name or None
+def get_release_file_cache_key(release_id, filename):
+    return 'releasefile:v1:%s:%s' % (release_id, md5_text(filename).hexdigest(), )
 
-    if result is None:
-        filename_choices = ReleaseFile.normalize(filename)
-        filename_idents = [ReleaseFile.get_ident(f, dist_name) for f in filename_choices]
 
-        logger.debug(
-            'Checking database for release artifact %r (release_id=%s)', filename, release.id
-        )
+def get_release_file_index(release, dist=None):
+    """
+    Returns a dictionary mapping the idents of all artifacts of a release
+    and distribution to their ``ReleaseFile`` ids. The index is built with a
+    single query and cached until an artifact of the release changes.
 
-        possible_files = list(
+    Returns None for releases with too many artifacts to index.
+    """
+    dist_id = dist and dist.id
+    version_key = ReleaseFile.get_index_version_cache_key(release.id, dist_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, RELEASE_FILE_INDEX_TTL)
+        version = cache.get(version_key)
+
+    # The version is read before the query, so an index built while an
+    # artifact changes is cached under the version that change replaced.
+    cache_key = ReleaseFile.get_index_cache_key(release.id, dist_id, version)
+    index = cache.get(cache_key)
+
+    if index is None:
+        logger.debug('Building release artifact index (release_id=%s)', release.id)
+        rows = list(
             ReleaseFile.objects.filter(
                 release=release,
                 dist=dist,
-                ident__in=filename_idents,
-            ).select_related('file')
+            ).values_list('ident', 'id')[:MAX_INDEXED_RELEASE_FILES + 1]
         )
+        if len(rows) > MAX_INDEXED_RELEASE_FILES:
+            index = -1
+        else:
+            index = dict(rows)
+        cache.set(cache_key, index, RELEASE_FILE_INDEX_TTL)
+        metrics.timing('sourcemaps.release_file_index.size', len(rows))
+
+    if index == -1:
+        return None
+    return index
+
+
+def _query_release_file(filename, release, dist=None):
+    dist_name = dist and dist.name or None
+    filename_choices = ReleaseFile.normalize(filename)
+    filename_idents = [ReleaseFile.get_ident(f, dist_name) for f in filename_choices]
+
+    logger.debug(
+        'Checking database for release artifact %r (release_id=%s)', filename, release.id
+    )
+
+    possible_files = list(
+        ReleaseFile.objects.filter(
+            release=release,
+            dist=dist,
+            ident__in=filename_idents,
+        ).select_related('file')
+    )
+
+    if len(possible_files) == 0:
+        return None
+    elif len(possible_files) == 1:
+        return possible_files[0]
+
+    # Pick first one that matches in priority order.
+    # This is O(N*M) but there are only ever at most 4 things here
+    # so not really worth optimizing.
+    return next((
+        rf
+        for ident in filename_idents
+        for rf in possible_files
+        if rf.ident == ident
+    ))
+
+
+def _lookup_release_files(filenames, release, dist=None):
+    """
+    Resolves filenames to ``ReleaseFile`` instances (or None) through the
+    release artifact index, loading all matched artifacts in one query.
+    """
+    index = get_release_file_index(release, dist)
+    if index is None:
+        return {f: _query_release_file(f, release, dist) for f in filenames}
+
+    dist_name = dist and dist.name or None
+    releasefile_ids = {}
+    for filename in filenames:
+        # Pick first one that matches in priority order.
+        for choice in ReleaseFile.normalize(filename):
+            releasefile_id = index.get(ReleaseFile.get_ident(choice, dist_name))
+            if releasefile_id is not None:
+                releasefile_ids[filename] = releasefile_id
+                break
+
+    if releasefile_ids:
+        releasefiles = {
+            rf.id: rf for rf in ReleaseFile.objects.filter(
+                id__in=set(releasefile_ids.values()),
+            ).select_related('file')
+        }
+    else:
+        releasefiles = {}
+
+    return {
+        f: releasefiles.get(releasefile_ids.get(f))
+        for f in filenames
+    }
+
+
+def _open_release_file(releasefile):
+    # Opening the file loads its blob index, which has to happen on the
+    # calling thread's database connection.
+    try:
+        return releasefile.file.getfile()
+    except Exception:
+        logger.error('sourcemap.compress_read_failed', exc_info=sys.exc_info())
+        return None
+
+
+def _read_release_file(releasefile, fp):
+    if fp is None:
+        return None
+
+    try:
+        with metrics.timer('sourcemaps.release_file_read'):
+            with fp:
+                z_body, body = compress_file(fp)
+    except Exception:
+        logger.error('sourcemap.compress_read_failed', exc_info=sys.exc_info())
+        return None
 
-        if len(possible_files) == 0:
+    headers = {k.lower(): v for k, v in releasefile.file.headers.items()}
+    encoding = get_encoding_from_headers(headers)
+    return headers, z_body, body, encoding
+
+
+def _result_from_cache(filename, result):
+    # Previous caches would be a 3-tuple instead of a 4-tuple,
+    # so this is being maintained for backwards compatibility
+    try:
+        encoding = result[3]
+    except IndexError:
+        encoding = None
+    return http.UrlResult(
+        filename, result[0], zlib.decompress(result[1]), result[2], encoding
+    )
+
+
+def fetch_release_files(filenames, release, dist=None):
+    """
+    Fetches several release artifacts at once, returning a dictionary that
+    maps each filename to a ``UrlResult``, or to None if the release has no
+    matching artifact.
+
+    Cached artifacts are loaded with a single ``get_many``, the remaining
+    names are resolved through the release artifact index and the files
+    are read concurrently.
+    """
+    filenames = set(filenames)
+    if not filenames:
+        return {}
+
+    cache_keys = {f: get_release_file_cache_key(release.id, f) for f in filenames}
+
+    logger.debug('Checking cache for %d release artifacts (release_id=%s)',
+                 len(filenames), release.id)
+    cached = cache.get_many(cache_keys.values())
+
+    results = {}
+    missing = []
+    for filename in filenames:
+        result = cached.get(cache_keys[filename])
+        if result is None:
+            missing.append(filename)
+        elif result == -1:
+            # We cached an error, so normalize
+            # it down to None
+            results[filename] = None
+        else:
+            results[filename] = _result_from_cache(filename, result)
+
+    metrics.incr('sourcemaps.release_file_cache.hit', amount=len(filenames) - len(missing),
+                 skip_internal=True)
+    metrics.incr('sourcemaps.release_file_cache.miss', amount=len(missing),
+                 skip_internal=True)
+
+    if not missing:
+        return results
+
+    releasefiles = _lookup_release_files(missing, release, dist)
+
+    # Several names can resolve to the same artifact, read each file once.
+    to_read = {rf.id: rf for rf in six.itervalues(releasefiles) if rf is not None}
+    handles = {id: _open_release_file(rf) for id, rf in six.iteritems(to_read)}
+    if len(to_read) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(len(to_read), RELEASE_FILE_FETCH_CONCURRENCY)
+        ) as exe:
+            futures = {
+                id: exe.submit(_read_release_file, rf, handles[id])
+                for id, rf in six.iteritems(to_read)
+            }
+        contents = {id: f.result() for id, f in six.iteritems(futures)}
+    else:
+        contents = {
+            id: _read_release_file(rf, handles[id]) for id, rf in six.iteritems(to_read)
+        }
+
+    found = {}
+    not_found = {}
+    for filename in missing:
+        releasefile = releasefiles.get(filename)
+        if releasefile is None:
             logger.debug(
                 'Release artifact %r not found in database (release_id=%s)', filename, release.id
             )
-            cache.set(cache_key, -1, 60)
-            return None
-        elif len(possible_files) == 1:
-            releasefile = possible_files[0]
-        else:
-            # Pick first one that matches in priority order.
-            # This is O(N*M) but there are only ever at most 4 things here
-            # so not really worth optimizing.
-            releasefile = next((
-                rf
-                for ident in filename_idents
-                for rf in possible_files
-                if rf.ident == ident
-            ))
+            not_found[cache_keys[filename]] = -1
+            results[filename] = None
+            continue
 
         logger.debug(
             'Found release artifact %r (id=%s, release_id=%s)', filename, releasefile.id, release.id
         )
-        try:
-            with metrics.timer('sourcemaps.release_file_read'):
-                with releasefile.file.getfile() as fp:
-                    z_body, body = compress_file(fp)
-        except Exception:
-            logger.error('sourcemap.compress_read_failed', exc_info=sys.exc_info())
-            result = None
-        else:
-            headers = {k.lower(): v for k, v in releasefile.file.headers.items()}
-            encoding = get_encoding_from_headers(headers)
-            result = http.UrlResult(filename, headers, body, 200, encoding)
-            cache.set(cache_key, (headers, z_body, 200, encoding), 3600)
-
-    elif result == -1:
-        # We cached an error, so normalize
-        # it down to None
-        result = None
-    else:
-        # Previous caches would be a 3-tuple instead of a 4-tuple,
-        # so this is being maintained for backwards compatibility
-        try:
-            encoding = result[3]
-        except IndexError:
-            encoding = None
-        result = http.UrlResult(
-            filename, result[0], zlib.decompress(result[1]), result[2], encoding
-        )
+        content = contents[releasefile.id]
+        if content is None:
+            results[filename] = None
+            continue
 
-    return result
+        headers, z_body, body, encoding = content
+        results[filename] = http.UrlResult(filename, headers, body, 200, encoding)
+        found[cache_keys[filename]] = (headers, z_body, 200, encoding)
+
+    if found:
+        cache.set_many(found, 3600)
+    if not_found:
+        cache.set_many(not_found, 60)
+
+    return results
 
 
-def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
+def fetch_release_file(filename, release, dist=None):
+    return fetch_release_files([filename], release, dist)[filename]
+
+
+def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True,
+               release_files=None):
     """
     Pull down a URL, returning a UrlResult object.
 
-    Attempts to fetch from the cache.
+    Attempts to fetch from the cache. ``release_files`` may hold release
+    artifacts that were already fetched with ``fetch_release_files``.
     """
     # If our url has been truncated, it'd be impossible to fetch
     # so we check for this early and bail
@@ -292,8 +473,11 @@ def fetch_file(url, project=None, release=None, dist=None, allow_scraping=True):
             }
         )
     if release:
-        with metrics.timer('sourcemaps.release_file'):
-            result = fetch_release_file(url, release, dist)
+        if release_files is not None and url in release_files:
+            result = release_files[url]
+        else:
+            with metrics.timer('sourcemaps.release_file'):
+                result = fetch_release_file(url, release, dist)
     else:
         result = None
 
@@ -420,7 +604,7 @@ def fetch_sourcemap(url, project=None, release=None, dist=None, allow_scraping=T
         )
         body = result.body
     try:
-        return SourceMapView.from_json_bytes(body)
+        return sourcemap_view_cache.from_json_bytes(body)
     except Exception as exc:
         # This is in debug because the product shows an error already.
         logger.debug(six.text_type(exc), exc_info=True)
@@ -487,6 +671,7 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
         self.sourcemaps = SourceMapCache()
         self.release = None
         self.dist = None
+        self.release_files = {}
 
     def get_stacktraces(self, data):
         exceptions = get_path(data, 'exception', 'values', filter=True, default=())
@@ -777,7 +962,8 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                 project=self.project,
                 release=self.release,
                 dist=self.dist,
-                allow_scraping=self.allow_scraping
+                allow_scraping=self.allow_scraping,
+                release_files=self.release_files,
             )
         except http.BadSource as exc:
             cache.add_error(filename, exc.data)
@@ -841,6 +1027,15 @@ class JavaScriptStacktraceProcessor(StacktraceProcessor):
                 continue
             pending_file_list.add(f['abs_path'])
 
+        if self.release is not None:
+            # Resolve the release artifacts for every frame at once, but
+            # no more than we are allowed to fetch.
+            prefetch = list(pending_file_list)[:self.max_fetches - self.fetch_count]
+            with metrics.timer('sourcemaps.release_file_prefetch'):
+                self.release_files.update(
+                    fetch_release_files(prefetch, self.release, self.dist)
+                )
+
         for idx, filename in enumerate(pending_file_list):
             self.cache_source(
                 filename=filename,
@@ -8,10 +8,15 @@ sentry.models.counter
 
 from __future__ import absolute_import
 
-from django.db import connection, connections
+import os
+import threading
+
+from django.db import connection, connections, transaction
 from django.db.models.signals import post_syncdb
 
+from sentry import options
 from sentry.db.models import (FlexibleForeignKey, Model, sane_repr, BoundedBigIntegerField)
+from sentry.utils import metrics
 from sentry.utils.db import is_mysql, is_postgres, is_sqlite
 
 
@@ -32,6 +37,66 @@ class Counter(Model):
         """Increments a counter.  This can never decrement."""
         return increment_project_counter(project, delta)
 
+    @classmethod
+    def next_value(cls, project):
+        """
+        Returns the next value of a counter.
+
+        When ``counter.block-size`` is set, values are handed out from blocks
+        that are reserved ahead of time by each process. Unused values of a
+        block are never handed out, so the values have gaps and are not
+        ordered across processes. Blocks can only be reserved outside of a
+        transaction, since a rolled back reservation would hand out values
+        that are reserved again later.
+        """
+        block_size = options.get('counter.block-size')
+        if block_size > 1:
+            if not transaction.get_connection().in_atomic_block:
+                return block_allocator.next(project, block_size)
+            metrics.incr('counter.block', skip_internal=True, tags={'result': 'in_transaction'})
+        return increment_project_counter(project)
+
+
+class CounterBlockAllocator(object):
+    """
+    Hands out the values of project counters from blocks of values that are
+    reserved with a single increment.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._blocks = {}
+        self._pid = os.getpid()
+
+    def next(self, project, block_size):
+        with self._lock:
+            # Blocks reserved before forking must not be handed out by
+            # multiple processes.
+            if self._pid != os.getpid():
+                self._blocks = {}
+                self._pid = os.getpid()
+
+            value, end = self._blocks.get(project.id, (None, None))
+            if value is not None and value <= end:
+                metrics.incr('counter.block', skip_internal=True, tags={'result': 'hit'})
+            else:
+                metrics.incr('counter.block', skip_internal=True, tags={'result': 'reserve'})
+                # The time it takes to reserve a block includes waiting for
+                # the lock on the counter row, which measures contention.
+                with metrics.timer('counter.block.reserve'):
+                    end = increment_project_counter(project, block_size)
+                value = end - block_size + 1
+
+            self._blocks[project.id] = (value + 1, end)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._blocks = {}
+
+
+block_allocator = CounterBlockAllocator()
+
 
 def increment_project_counter(project, delta=1):
     """This method primarily exists so that south code can use it."""
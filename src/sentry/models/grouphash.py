@@ -7,13 +7,118 @@ sentry.models.grouphash
 """
 from __future__ import absolute_import
 
+import threading
+import time
+
+from collections import OrderedDict, defaultdict
 from django.conf import settings
 from django.db import models
 from django.db.models.signals import post_delete
 from django.utils.translation import ugettext_lazy as _
 
+from sentry import options
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model
-from sentry.utils import redis
+from sentry.utils import metrics, redis
+
+
+class GroupHashCache(object):
+    """
+    Caches the group or tombstone that a hash resolves to, keyed by project
+    and hash. Lookups go through a small in-process LRU in front of Redis.
+
+    Entries are removed from Redis (and the local cache of the current
+    process) whenever the hashes are moved to another group, tombstoned or
+    deleted, but the local caches of other processes can't be invalidated,
+    so local entries are only kept for ``grouphash.cache-local-ttl`` seconds.
+    The cache is disabled unless ``grouphash.cache-ttl`` is set.
+    """
+
+    def __init__(self, local_size=10000):
+        self.local_size = local_size
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return options.get('grouphash.cache-ttl')
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _get_cluster(self):
+        return redis.clusters.get(getattr(settings, 'GROUP_HASH_CACHE_CLUSTER_NAME', 'default'))
+
+    def _make_key(self, project_id, hash):
+        return u'gh:c:{}:{}'.format(project_id, hash)
+
+    def _encode(self, value):
+        return u':'.join(u'{}'.format(v) if v is not None else u'' for v in value)
+
+    def _decode(self, value):
+        return tuple(int(v) if v else None for v in value.split(':'))
+
+    def _set_local(self, project_id, values):
+        expires = time.time() + min(options.get('grouphash.cache-local-ttl'), self.ttl)
+        with self._lock:
+            for hash, value in values.items():
+                self._local.pop((project_id, hash), None)
+                self._local[(project_id, hash)] = (value, expires)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get_many(self, project_id, hashes):
+        """
+        Returns a mapping of hash to ``(id, group_id, group_tombstone_id)``
+        for the hashes that are cached.
+        """
+        results = {}
+        missing = []
+        now = time.time()
+        with self._lock:
+            for hash in hashes:
+                item = self._local.pop((project_id, hash), None)
+                if item is not None and item[1] > now:
+                    self._local[(project_id, hash)] = item
+                    results[hash] = item[0]
+                else:
+                    missing.append(hash)
+
+        if missing:
+            with self._get_cluster().map() as client:
+                promises = [
+                    (hash, client.get(self._make_key(project_id, hash))) for hash in missing
+                ]
+            found = {
+                hash: self._decode(promise.value)
+                for hash, promise in promises if promise.value is not None
+            }
+            self._set_local(project_id, found)
+            results.update(found)
+
+        return results
+
+    def set_many(self, project_id, values):
+        ttl = self.ttl
+        with self._get_cluster().map() as client:
+            for hash, value in values.items():
+                client.set(self._make_key(project_id, hash), self._encode(value), ex=ttl)
+        self._set_local(project_id, values)
+
+    def delete_many(self, project_id, hashes):
+        with self._lock:
+            for hash in hashes:
+                self._local.pop((project_id, hash), None)
+        with self._get_cluster().map() as client:
+            for hash in hashes:
+                client.delete(self._make_key(project_id, hash))
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+
+hash_cache = GroupHashCache()
 
 
 class GroupHash(Model):
@@ -39,6 +144,75 @@ class GroupHash(Model):
         db_table = 'sentry_grouphash'
         unique_together = (('project', 'hash'), )
 
+    @classmethod
+    def get_cached_many(cls, project_id, hashes):
+        """
+        Returns a mapping of hash to ``GroupHash`` for the hashes of the
+        project that are resolved by the hash cache.
+        """
+        if not hash_cache.enabled:
+            return {}
+
+        cached = hash_cache.get_many(project_id, hashes)
+        metrics.incr('grouphash.cache', amount=len(cached), tags={'result': 'hit'},
+                     skip_internal=True)
+        metrics.incr('grouphash.cache', amount=len(hashes) - len(cached),
+                     tags={'result': 'miss'}, skip_internal=True)
+        return {
+            hash: cls(
+                id=id,
+                project_id=project_id,
+                hash=hash,
+                group_id=group_id,
+                group_tombstone_id=group_tombstone_id,
+            ) for hash, (id, group_id, group_tombstone_id) in cached.items()
+        }
+
+    @classmethod
+    def cache_many(cls, instances):
+        """
+        Adds the hashes that are associated with a group or tombstone to the
+        hash cache.
+        """
+        if not hash_cache.enabled:
+            return
+
+        values = defaultdict(dict)
+        for instance in instances:
+            if instance.group_id is None and instance.group_tombstone_id is None:
+                continue
+            values[instance.project_id][instance.hash] = (
+                instance.id,
+                instance.group_id,
+                instance.group_tombstone_id,
+            )
+
+        for project_id, project_values in values.items():
+            hash_cache.set_many(project_id, project_values)
+
+    @classmethod
+    def invalidate_cache(cls, **filters):
+        """
+        Removes the hashes matching ``filters`` from the hash cache. This
+        should be called after the hashes were updated.
+        """
+        if not hash_cache.enabled:
+            return
+
+        hashes = defaultdict(list)
+        for project_id, hash in cls.objects.filter(**filters).values_list('project_id', 'hash'):
+            hashes[project_id].append(hash)
+
+        for project_id, project_hashes in hashes.items():
+            cls.uncache_many(project_id, project_hashes)
+
+    @classmethod
+    def uncache_many(cls, project_id, hashes):
+        if not hash_cache.enabled:
+            return
+
+        hash_cache.delete_many(project_id, hashes)
+
     @classmethod
     def __get_last_processed_event_id_cluster(cls):
         cluster_name = getattr(settings, 'GROUP_HASH_LAST_PROCESSED_EVENT_CLUSTER_NAME', 'default')
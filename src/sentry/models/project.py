@@ -130,7 +130,7 @@ class Project(Model):
 
     def next_short_id(self):
         from sentry.models import Counter
-        return Counter.increment(self)
+        return Counter.next_value(self)
 
     def save(self, *args, **kwargs):
         if not self.slug:
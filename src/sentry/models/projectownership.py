@@ -6,13 +6,22 @@ from jsonfield import JSONField
 
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
 from django.utils import timezone
 
 from six.moves import reduce
 
 from sentry.db.models import Model, sane_repr
 from sentry.db.models.fields import FlexibleForeignKey
-from sentry.ownership.grammar import load_schema
+from sentry.ownership.grammar import load_compiled_schema
+from sentry.utils.cache import cache
+from sentry.utils.hashlib import md5_text
+
+READ_CACHE_DURATION = 3600
+
+# Resolved actors depend on team and membership state which is not
+# tracked here, so they are only kept for a short time.
+ACTOR_CACHE_DURATION = 60
 
 
 class ProjectOwnership(Model):
@@ -35,6 +44,28 @@ class ProjectOwnership(Model):
 
     __repr__ = sane_repr('project_id', 'is_active')
 
+    @classmethod
+    def get_cache_key(cls, project_id):
+        return u'projectownership_project_id:1:{}'.format(project_id)
+
+    @classmethod
+    def get_ownership_cached(cls, project_id):
+        """
+        Cached read access to projectownership.
+
+        Most projects have no ownership rules at all, so a missing row is
+        cached as well. Returns None if there is no ownership configured.
+        """
+        cache_key = cls.get_cache_key(project_id)
+        ownership = cache.get(cache_key)
+        if ownership is None:
+            try:
+                ownership = cls.objects.get(project_id=project_id)
+            except cls.DoesNotExist:
+                ownership = False
+            cache.set(cache_key, ownership, READ_CACHE_DURATION)
+        return ownership or None
+
     @classmethod
     def get_owners(cls, project_id, data):
         """
@@ -46,25 +77,43 @@ class ProjectOwnership(Model):
         If an empty list is returned, this means there are explicitly
         no owners.
         """
-        try:
-            ownership = cls.objects.get(project_id=project_id)
-        except cls.DoesNotExist:
+        ownership = cls.get_ownership_cached(project_id)
+        if not ownership:
             ownership = cls(
                 project_id=project_id,
             )
 
         rules = []
         if ownership.schema is not None:
-            for rule in load_schema(ownership.schema):
-                if rule.test(data):
-                    rules.append(rule)
+            rules = load_compiled_schema(ownership.schema).match(data)
 
         if not rules:
             return cls.Everyone if ownership.fallthrough else [], None
 
         owners = {o for rule in rules for o in rule.owners}
 
-        return filter(None, resolve_actors(owners, project_id).values()), rules
+        return filter(None, resolve_actors_cached(owners, project_id).values()), rules
+
+
+def resolve_actors_cached(owners, project_id):
+    """
+    Cached variant of ``resolve_actors``, keyed by the set of owners so
+    every event matching the same rules shares a single lookup.
+    """
+    if not owners:
+        return {}
+
+    cache_key = u'projectownership_actors:1:{}:{}'.format(
+        project_id,
+        md5_text(u'&'.join(sorted(
+            u'{}:{}'.format(o.type, o.identifier) for o in owners
+        ))).hexdigest(),
+    )
+    actors = cache.get(cache_key)
+    if actors is None:
+        actors = resolve_actors(owners, project_id)
+        cache.set(cache_key, actors, ACTOR_CACHE_DURATION)
+    return actors
 
 
 def resolve_actors(owners, project_id):
@@ -119,3 +168,19 @@ def resolve_actors(owners, project_id):
         o: actors.get((o.type, o.identifier.lower()))
         for o in owners
     }
+
+
+def process_resource_change(instance, **kwargs):
+    cache.delete(ProjectOwnership.get_cache_key(instance.project_id))
+
+
+post_save.connect(
+    process_resource_change,
+    sender=ProjectOwnership,
+    weak=False,
+)
+post_delete.connect(
+    process_resource_change,
+    sender=ProjectOwnership,
+    weak=False,
+)
@@ -9,11 +9,17 @@ sentry.models.releasefile
 from __future__ import absolute_import
 
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from six.moves.urllib.parse import urlsplit, urlunsplit
+from uuid import uuid4
 
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model, sane_repr
+from sentry.utils.cache import cache
 from sentry.utils.hashlib import sha1_text
 
+# Seconds the artifact index of a release is cached for
+RELEASE_FILE_INDEX_TTL = 3600
+
 
 class ReleaseFile(Model):
     r"""
@@ -55,6 +61,14 @@ class ReleaseFile(Model):
             )
         return super(ReleaseFile, self).update(*args, **kwargs)
 
+    @classmethod
+    def get_index_cache_key(cls, release_id, dist_id=None, version=None):
+        return u'releasefile:index:v2:{}:{}:{}'.format(release_id, dist_id or 0, version)
+
+    @classmethod
+    def get_index_version_cache_key(cls, release_id, dist_id=None):
+        return u'releasefile:index-version:v1:{}:{}'.format(release_id, dist_id or 0)
+
     @classmethod
     def get_ident(cls, name, dist=None):
         if dist is not None:
@@ -82,3 +96,25 @@ class ReleaseFile(Model):
         if query:
             urls.append('~' + urlunsplit(uri_relative_without_query))
         return urls
+
+
+def clear_release_file_index(instance, **kwargs):
+    # Indexes are cached per version, so bumping it also invalidates indexes
+    # that are still being built from before the change.
+    cache.set(
+        ReleaseFile.get_index_version_cache_key(instance.release_id, instance.dist_id),
+        uuid4().hex,
+        RELEASE_FILE_INDEX_TTL,
+    )
+
+
+post_save.connect(
+    clear_release_file_index,
+    sender=ReleaseFile,
+    weak=False,
+)
+post_delete.connect(
+    clear_release_file_index,
+    sender=ReleaseFile,
+    weak=False,
+)
@@ -9,6 +9,9 @@ sentry.nodestore.cassandra.backend
 from __future__ import absolute_import, print_function
 
 import casscache
+import six
+
+from concurrent.futures import ThreadPoolExecutor, wait
 
 from sentry.nodestore.base import NodeStorage
 from sentry.utils.cache import memoize
@@ -23,12 +26,20 @@ class CassandraNodeStorage(NodeStorage):
     ...     keyspace='sentry',
     ...     columnfamily='nodestore',
     ... )
+
+    Multi-key operations are split into chunks of ``multi_chunk_size`` keys
+    which run concurrently on a pool of ``multi_pool_size`` threads, and fail
+    if they take longer than ``multi_timeout`` seconds.
     """
 
-    def __init__(self, servers, keyspace='sentry', columnfamily='nodestore', **kwargs):
+    def __init__(self, servers, keyspace='sentry', columnfamily='nodestore',
+                 multi_chunk_size=100, multi_pool_size=5, multi_timeout=None, **kwargs):
         self.servers = servers
         self.keyspace = keyspace
         self.columnfamily = columnfamily
+        self.multi_chunk_size = multi_chunk_size
+        self.multi_pool_size = multi_pool_size
+        self.multi_timeout = multi_timeout
         self.options = kwargs
         super(CassandraNodeStorage, self).__init__()
 
@@ -41,14 +52,51 @@ class CassandraNodeStorage(NodeStorage):
             **self.options
         )
 
+    @memoize
+    def executor(self):
+        return ThreadPoolExecutor(max_workers=self.multi_pool_size)
+
+    def _execute_concurrently(self, func, args_list):
+        """
+        Calls ``func`` once for each argument tuple on the thread pool and
+        returns the results in order, raising the first exception if any
+        call failed.
+        """
+        if len(args_list) == 1:
+            return [func(*args_list[0])]
+
+        futures = [self.executor.submit(func, *args) for args in args_list]
+        _, not_done = wait(futures, timeout=self.multi_timeout)
+        for future in not_done:
+            future.cancel()
+        # ``result`` raises the exception of failed calls, and a
+        # ``TimeoutError`` for calls that did not finish in time.
+        return [future.result(timeout=0) for future in futures]
+
     def delete(self, id):
         self.connection.delete(id)
 
+    def delete_multi(self, id_list):
+        self._execute_concurrently(self.connection.delete, [(id, ) for id in id_list])
+
     def get(self, id):
         return self.connection.get(id)
 
     def get_multi(self, id_list):
-        return self.connection.get_multi(id_list)
+        id_list = list(id_list)
+        if len(id_list) <= self.multi_chunk_size:
+            return self.connection.get_multi(id_list)
+
+        results = {}
+        for chunk in self._execute_concurrently(self.connection.get_multi, [
+            (id_list[i:i + self.multi_chunk_size], )
+            for i in range(0, len(id_list), self.multi_chunk_size)
+        ]):
+            results.update(chunk)
+        return results
 
     def set(self, id, data):
         self.connection.set(id, data)
+
+    def set_multi(self, values):
+        self._execute_concurrently(self.connection.set, list(six.iteritems(values)))
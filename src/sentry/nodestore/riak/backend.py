@@ -35,6 +35,10 @@ class RiakNodeStorage(NodeStorage):
     A Riak-based backend for storing node data.
 
     >>> RiakNodeStorage(nodes=[{'host':'127.0.0.1','port':8098}])
+
+    Multi-key operations run concurrently on a pool of
+    ``multiget_pool_size`` threads and fail if they take longer than
+    ``multi_timeout`` seconds.
     """
 
     def __init__(
@@ -45,6 +49,7 @@ class RiakNodeStorage(NodeStorage):
         cooldown=5,
         max_retries=3,
         multiget_pool_size=5,
+        multi_timeout=None,
         tcp_keepalive=True,
         protocol=None
     ):
@@ -56,6 +61,7 @@ class RiakNodeStorage(NodeStorage):
             import warnings
             warnings.warn("'protocol' has been deprecated", DeprecationWarning)
         self.bucket = bucket
+        self.multi_timeout = multi_timeout
         self.conn = RiakClient(
             hosts=nodes,
             max_retries=max_retries,
@@ -67,9 +73,34 @@ class RiakNodeStorage(NodeStorage):
     def set(self, id, data):
         self.conn.put(self.bucket, id, json_dumps(data), returnbody='false')
 
+    def set_multi(self, values):
+        if len(values) == 1:
+            id, data = next(six.iteritems(values))
+            return self.set(id, data)
+
+        rv = self.conn.multiput(
+            self.bucket,
+            {id: json_dumps(data) for id, data in six.iteritems(values)},
+            timeout=self.multi_timeout,
+            returnbody='false',
+        )
+        for value in six.itervalues(rv):
+            if isinstance(value, Exception):
+                six.reraise(type(value), value)
+
     def delete(self, id):
         self.conn.delete(self.bucket, id)
 
+    def delete_multi(self, id_list):
+        id_list = list(id_list)
+        if len(id_list) == 1:
+            return self.delete(id_list[0])
+
+        rv = self.conn.multidelete(self.bucket, id_list, timeout=self.multi_timeout)
+        for value in six.itervalues(rv):
+            if isinstance(value, Exception):
+                six.reraise(type(value), value)
+
     def get(self, id):
         rv = self.conn.get(self.bucket, id, r=1)
         if rv.status != 200:
@@ -83,7 +114,7 @@ class RiakNodeStorage(NodeStorage):
             id = id_list[0]
             return {id: self.get(id)}
 
-        rv = self.conn.multiget(self.bucket, id_list, r=1)
+        rv = self.conn.multiget(self.bucket, id_list, timeout=self.multi_timeout, r=1)
         results = {}
         for key, value in six.iteritems(rv):
             if isinstance(value, Exception):
@@ -23,7 +23,7 @@ from threading import Lock, Thread, Event
 from requests.certs import where as ca_certs
 from six.moves.urllib.parse import urlencode, quote_plus
 from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
-from urllib3.exceptions import HTTPError
+from urllib3.exceptions import HTTPError, TimeoutError
 
 from sentry.net.http import UnixHTTPConnectionPool
 
@@ -125,14 +125,53 @@ class RiakClient(object):
             headers=headers,
         )
 
-    def multiget(self, bucket, keys, headers=None, **kwargs):
+    def multiget(self, bucket, keys, headers=None, timeout=None, **kwargs):
         """
         Thread-safe multiget implementation that shares the same thread pool
         for all requests.
         """
-        # Each request is paired with a thread.Event to signal when it is finished
-        requests = [(key, self.build_url(bucket, key, kwargs), Event()) for key in keys]
+        return self._multi([
+            (key, 'GET', self.build_url(bucket, key, kwargs), {'headers': headers})
+            for key in keys
+        ], timeout)
+
+    def multiput(self, bucket, items, headers=None, timeout=None, **kwargs):
+        """
+        Stores a mapping of keys to data concurrently, sharing the thread
+        pool used by ``multiget``.
+        """
+        if headers is None:
+            headers = {}
+        headers['content-type'] = 'application/json'
+
+        return self._multi([
+            (key, 'PUT', self.build_url(bucket, key, kwargs), {'headers': headers, 'body': data})
+            for key, data in six.iteritems(items)
+        ], timeout)
 
+    def multidelete(self, bucket, keys, headers=None, timeout=None, **kwargs):
+        """
+        Deletes keys concurrently, sharing the thread pool used by
+        ``multiget``.
+        """
+        return self._multi([
+            (key, 'DELETE', self.build_url(bucket, key, kwargs), {'headers': headers})
+            for key in keys
+        ], timeout)
+
+    def _multi(self, requests, timeout=None):
+        """
+        Runs ``(key, method, url, kwargs)`` requests on the thread pool and
+        returns a mapping of each key to its response, or to the exception
+        it raised. Requests that have not finished within ``timeout``
+        seconds map to a ``TimeoutError``.
+
+        The timeout is a single deadline for the whole batch, not for every
+        request. Requests that time out are not cancelled and keep occupying
+        a pool thread until they finish, and their responses are discarded.
+        """
+        # Each request is paired with a thread.Event to signal when it is finished
+        events = []
         results = {}
 
         def callback(key, event, rv):
@@ -140,14 +179,14 @@ class RiakClient(object):
             # Signal that this request is finished
             event.set()
 
-        for key, url, event in requests:
+        for key, method, url, kwargs in requests:
+            event = Event()
+            events.append((key, event))
             self.pool.submit(
                 (
                     self.manager.urlopen,  # func
-                    ('GET', url),  # args
-                    {
-                        'headers': headers
-                    },  # kwargs
+                    (method, url),  # args
+                    kwargs,  # kwargs
                     functools.partial(
                         callback,
                         key,
@@ -157,10 +196,22 @@ class RiakClient(object):
             )
 
         # Now we wait for all of the callbacks to be finished
-        for _, _, event in requests:
-            event.wait()
-
-        return results
+        deadline = None if timeout is None else time() + timeout
+        for key, event in events:
+            if deadline is None:
+                event.wait()
+            else:
+                event.wait(max(deadline - time(), 0))
+
+        # Late callbacks keep writing into ``results``, so only the requests
+        # that had finished are copied into the returned mapping.
+        rv = {}
+        for key, event in events:
+            if event.is_set():
+                rv[key] = results[key]
+            else:
+                rv[key] = TimeoutError('Request timed out after %ss' % timeout)
+        return rv
 
     def close(self):
         self.manager.close()
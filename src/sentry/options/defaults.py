@@ -93,6 +93,10 @@ register(
 )
 
 register('api.rate-limit.org-create', default=5, flags=FLAG_ALLOW_EMPTY | FLAG_PRIORITIZE_DISK)
+# How paginated endpoints count hits: "exact", "estimate" (from the query
+# planner) or "cached" (an exact count cached for hits-cache-ttl seconds)
+register('api.paginator.hits-strategy', default='exact')
+register('api.paginator.hits-cache-ttl', default=60)
 
 # Beacon
 register('beacon.anonymous', type=Bool, flags=FLAG_REQUIRED)
@@ -145,6 +149,38 @@ register('snuba.search.max-pre-snuba-candidates', default=5000)
 register('snuba.search.chunk-growth-rate', default=1.5)
 register('snuba.search.max-chunk-size', default=2000)
 register('snuba.search.max-total-chunk-time-seconds', default=30.0)
+# Seconds an organization's event retention is memoized for by snuba queries,
+# 0 disables the memoization
+register('snuba.retention-cache-ttl', default=60)
+# Seconds snuba query results are cached for, 0 disables the result cache
+register('snuba.result-cache-ttl', default=0)
+
+# Store
+register('store.batch-max-events', default=100)
+# Upper bound for the decoded size of a single store request body
+register('store.max-event-size', default=20 * 1024 * 1024)
+# Save events that need no processing from within preprocess_event. The save
+# then runs under the time limit of preprocess_event (300 seconds) instead of
+# none, so a save stuck for longer is killed partway through. Slow saves also
+# keep preprocess workers busy, which delays the events queued behind them.
+register('store.fused-save-event', type=Bool, default=False)
+# Seconds the group of a hash is cached for when saving events, 0 disables it
+register('grouphash.cache-ttl', default=0)
+# Upper bound for how long a process keeps cached hashes in memory, since
+# invalidations only reach the local cache of the invalidating process
+register('grouphash.cache-local-ttl', default=10)
+# Memory budget in bytes of the filter of recently seen event IDs that saves
+# the duplicate lookup for new events, 0 disables the filter
+register('store.event-id-filter.size', default=0)
+# Hours of event IDs retained by the event ID filter
+register('store.event-id-filter.windows', default=24)
+# Number of short IDs each process reserves from a project's counter at
+# once, 0 or 1 allocates the short IDs one at a time
+register('counter.block-size', default=0)
+
+# Sourcemaps
+# Upper bound for the size of the sourcemaps kept parsed in each worker
+register('sourcemaps.view-cache-size', default=64 * 1024 * 1024)
 
 # Kafka Publisher
 register('kafka-publisher.raw-event-sample-rate', default=0.0)
@@ -152,3 +188,9 @@ register('kafka-publisher.max-event-size', default=100000)
 
 # Event Stream
 register('eventstream.kafka.send-post_process-task', type=Bool, default=True)
+# Pass stored events to post_process_group by reference instead of pickled
+register('eventstream.compact-post-process', type=Bool, default=False)
+
+# Digests
+# Number of ready timelines delivered by each task, 0 delivers them one by one
+register('digests.delivery-batch-size', default=0)
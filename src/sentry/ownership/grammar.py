@@ -1,14 +1,25 @@
 from __future__ import absolute_import
 
+import re
+import six
+
 from collections import namedtuple
-from fnmatch import fnmatch
+from fnmatch import fnmatch, translate
 from parsimonious.grammar import Grammar, NodeVisitor
 from parsimonious.exceptions import ParseError  # noqa
 
-__all__ = ('parse_rules', 'dump_schema', 'load_schema')
+from sentry.utils import json
+from sentry.utils.hashlib import md5_text
+
+__all__ = ('parse_rules', 'dump_schema', 'load_schema', 'load_compiled_schema')
 
 VERSION = 1
 
+# Maximum number of compiled schemas kept in process memory
+COMPILED_SCHEMA_CACHE_SIZE = 1000
+
+_compiled_schemas = {}
+
 # Grammar is defined in EBNF syntax.
 ownership_grammar = Grammar(r"""
 
@@ -216,6 +227,105 @@ def _iter_frames(data):
             continue
 
 
+def _translate(pattern):
+    """
+    Translate a glob pattern into a regular expression body without the
+    trailing anchor and flags that ``fnmatch.translate`` adds, so several
+    patterns can be combined into a single expression.
+    """
+    regex = translate(pattern)
+    # Python 2 renders ``*.py`` as ``.*\.py\Z(?ms)``
+    if regex.endswith('\\Z(?ms)'):
+        return regex[:-len('\\Z(?ms)')]
+    # Python 3 renders ``*.py`` as ``(?s:.*\.py)\Z``
+    if regex.startswith('(?s:') and regex.endswith(')\\Z'):
+        return regex[len('(?s:'):-len(')\\Z')]
+    return regex
+
+
+def _compile(regexes):
+    return re.compile(
+        u'(?:%s)\\Z' % u'|'.join(u'(?:%s)' % r for r in regexes),
+        re.MULTILINE | re.DOTALL,
+    )
+
+
+class CompiledMatchers(object):
+    """
+    All matchers of a single type, compiled for evaluation against many
+    values at once. A combined expression of every pattern discards values
+    that cannot match any rule with a single regex evaluation, so the
+    individual patterns only run for values that are known to match.
+    """
+
+    def __init__(self, rules):
+        regexes = [_translate(rule.matcher.pattern) for _, rule in rules]
+        self.combined = _compile(regexes) if regexes else None
+        self.matchers = [
+            (index, _compile([regex]))
+            for (index, _), regex in zip(rules, regexes)
+        ]
+
+    def test(self, values):
+        matches = set()
+        if self.combined is None:
+            return matches
+
+        for value in values:
+            if not isinstance(value, six.string_types):
+                continue
+            if not self.combined.match(value):
+                continue
+            for index, regex in self.matchers:
+                if index not in matches and regex.match(value):
+                    matches.add(index)
+        return matches
+
+
+class CompiledSchema(object):
+    """
+    A Rule tree prepared for repeated evaluation. Matching an event is
+    equivalent to calling ``Rule.test`` on every rule, but each frame is
+    only visited once regardless of the number of rules.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.path_matchers = CompiledMatchers(
+            [(i, r) for i, r in enumerate(rules) if r.matcher.type == 'path'])
+        self.url_matchers = CompiledMatchers(
+            [(i, r) for i, r in enumerate(rules) if r.matcher.type == 'url'])
+
+    def match(self, data):
+        """Return the rules matching the event data, in schema order"""
+        matches = self.path_matchers.test(_iter_paths(data))
+
+        try:
+            url = data['request']['url']
+        except (KeyError, TypeError):
+            pass
+        else:
+            matches |= self.url_matchers.test([url])
+
+        return [rule for i, rule in enumerate(self.rules) if i in matches]
+
+
+def _iter_paths(data):
+    seen = set()
+    for frame in _iter_frames(data):
+        try:
+            filename = frame['filename']
+        except KeyError:
+            try:
+                filename = frame['abs_path']
+            except KeyError:
+                continue
+
+        if filename not in seen:
+            seen.add(filename)
+            yield filename
+
+
 def parse_rules(data):
     """Convert a raw text input into a Rule tree"""
     tree = ownership_grammar.parse(data)
@@ -235,3 +345,22 @@ def load_schema(schema):
     if schema['$version'] != VERSION:
         raise RuntimeError('Invalid schema $version: %r' % schema['$version'])
     return [Rule.load(r) for r in schema['rules']]
+
+
+def load_compiled_schema(schema):
+    """
+    Convert a JSON schema into a CompiledSchema. Results are kept in process
+    memory keyed by a hash of the schema, so a changed schema is compiled
+    again on first use.
+    """
+    key = md5_text(json.dumps(schema, sort_keys=True)).hexdigest()
+    try:
+        return _compiled_schemas[key]
+    except KeyError:
+        pass
+
+    compiled = CompiledSchema(load_schema(schema))
+    if len(_compiled_schemas) >= COMPILED_SCHEMA_CACHE_SIZE:
+        _compiled_schemas.clear()
+    _compiled_schemas[key] = compiled
+    return compiled
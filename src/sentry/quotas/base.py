@@ -46,7 +46,7 @@ class Quota(Service):
     """
     __all__ = (
         'get_maximum_quota', 'get_organization_quota', 'get_project_quota', 'is_rate_limited',
-        'translate_quota', 'validate', 'refund', 'get_event_retention',
+        'is_rate_limited_batch', 'translate_quota', 'validate', 'refund', 'get_event_retention',
     )
 
     def __init__(self, **options):
@@ -55,6 +55,15 @@ class Quota(Service):
     def is_rate_limited(self, project, key=None):
         return NotRateLimited()
 
+    def is_rate_limited_batch(self, project, key=None, count=1):
+        """
+        Check the quotas for ``count`` items submitted together, returning a
+        ``RateLimit`` for each item in submission order. Items are consumed
+        against the quota one after another, so a batch that crosses the
+        limit is partially accepted.
+        """
+        return [self.is_rate_limited(project, key=key) for _ in range(count)]
+
     def refund(self, project, key=None, timestamp=None):
         raise NotImplementedError
 
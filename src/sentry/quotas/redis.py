@@ -165,16 +165,7 @@ class RedisQuota(Quota):
         """Return the timestamp when the next rate limit period begins for an interval."""
         return (((timestamp - shift) // interval) + 1) * interval + shift
 
-    def is_rate_limited(self, project, key=None, timestamp=None):
-        if timestamp is None:
-            timestamp = time()
-
-        quotas = self.get_quotas_with_limits(project, key=key)
-
-        # If there are no quotas to actually check, skip the trip to the database.
-        if not quotas:
-            return NotRateLimited()
-
+    def __get_script_arguments(self, project, quotas, timestamp):
         keys = []
         args = []
         for quota in quotas:
@@ -184,9 +175,9 @@ class RedisQuota(Quota):
             keys.extend((key, return_key))
             expiry = self.get_next_period_start(quota.window, shift, timestamp) + self.grace
             args.extend((quota.limit, int(expiry)))
+        return keys, args
 
-        client = self.cluster.get_local_client_for_key(six.text_type(project.organization_id))
-        rejections = is_rate_limited(client, keys, args)
+    def __get_rate_limit(self, project, quotas, rejections, timestamp):
         if any(rejections):
             enforce = False
             worst_case = (0, None)
@@ -205,3 +196,44 @@ class RedisQuota(Quota):
                     reason_code=worst_case[1],
                 )
         return NotRateLimited()
+
+    def is_rate_limited(self, project, key=None, timestamp=None):
+        if timestamp is None:
+            timestamp = time()
+
+        quotas = self.get_quotas_with_limits(project, key=key)
+
+        # If there are no quotas to actually check, skip the trip to the database.
+        if not quotas:
+            return NotRateLimited()
+
+        keys, args = self.__get_script_arguments(project, quotas, timestamp)
+
+        client = self.cluster.get_local_client_for_key(six.text_type(project.organization_id))
+        rejections = is_rate_limited(client, keys, args)
+        return self.__get_rate_limit(project, quotas, rejections, timestamp)
+
+    def is_rate_limited_batch(self, project, key=None, count=1, timestamp=None):
+        if timestamp is None:
+            timestamp = time()
+
+        quotas = self.get_quotas_with_limits(project, key=key)
+
+        if not quotas:
+            return [NotRateLimited() for _ in range(count)]
+
+        keys, args = self.__get_script_arguments(project, quotas, timestamp)
+
+        # Every item in the batch shares the same counters, so the script is
+        # evaluated once per item within a single pipeline. Redis executes the
+        # calls in order, which preserves the accept/reject outcome each item
+        # would have had if it had been submitted on its own.
+        client = self.cluster.get_local_client_for_key(six.text_type(project.organization_id))
+        pipe = client.pipeline(transaction=False)
+        for _ in range(count):
+            is_rate_limited(pipe, keys, args)
+
+        return [
+            self.__get_rate_limit(project, quotas, rejections, timestamp)
+            for rejections in pipe.execute()
+        ]
@@ -9,6 +9,7 @@ from django.utils import timezone
 
 from sentry.models import GroupRuleStatus, Rule
 from sentry.rules import EventState, rules
+from sentry.rules.conditions.event_frequency import BaseEventFrequencyCondition
 from sentry.utils.safe import safe_execute
 
 RuleFuture = namedtuple('RuleFuture', ['rule', 'kwargs'])
@@ -40,7 +41,8 @@ class EventCompatibilityProxy(object):
 class RuleProcessor(object):
     logger = logging.getLogger('sentry.rules')
 
-    def __init__(self, event, is_new, is_regression, is_new_group_environment, has_reappeared):
+    def __init__(self, event, is_new, is_regression, is_new_group_environment, has_reappeared,
+                 rules=None):
         self.event = EventCompatibilityProxy(event)
         self.group = event.group
         self.project = event.project
@@ -51,10 +53,43 @@ class RuleProcessor(object):
         self.has_reappeared = has_reappeared
 
         self.grouped_futures = {}
+        self.rate_cache = {}
+        self.rules = rules
 
     def get_rules(self):
+        if self.rules is not None:
+            return self.rules
         return Rule.get_for_project(self.project.id)
 
+    def get_rule_plan(self):
+        """
+        Returns the rules that can apply to this event, paired with their
+        conditions ordered so that conditions which only inspect the event
+        are evaluated before the ones that have to query tsdb.
+        """
+        environment_id = None
+        plan = []
+        for rule in self.get_rules():
+            # XXX(dcramer): if theres no condition should we really skip it,
+            # or should we just apply it blindly?
+            condition_list = rule.data.get('conditions', ())
+            if not condition_list:
+                continue
+
+            if rule.environment_id is not None:
+                if environment_id is None:
+                    environment_id = self.event.get_environment().id
+                if environment_id != rule.environment_id:
+                    continue
+
+            plan.append((rule, sorted(condition_list, key=self.is_expensive_condition)))
+        return plan
+
+    def is_expensive_condition(self, condition):
+        condition_cls = rules.get(condition['id'])
+        return condition_cls is not None \
+            and issubclass(condition_cls, BaseEventFrequencyCondition)
+
     def get_rule_status(self, rule):
         rule_status, _ = GroupRuleStatus.objects.get_or_create(
             rule=rule,
@@ -66,13 +101,36 @@ class RuleProcessor(object):
 
         return rule_status
 
+    def get_rule_statuses(self, rule_list):
+        """
+        Returns a mapping of rule ID to ``GroupRuleStatus``, fetching the
+        existing statuses for all rules with a single query.
+        """
+        rule_statuses = {
+            rule_status.rule_id: rule_status
+            for rule_status in GroupRuleStatus.objects.filter(
+                group=self.group,
+                rule__in=[rule.id for rule in rule_list],
+            )
+        }
+
+        for rule in rule_list:
+            if rule.id not in rule_statuses:
+                rule_statuses[rule.id] = self.get_rule_status(rule)
+
+        return rule_statuses
+
     def condition_matches(self, condition, state, rule):
         condition_cls = rules.get(condition['id'])
         if condition_cls is None:
             self.logger.warn('Unregistered condition %r', condition['id'])
             return
 
-        condition_inst = condition_cls(self.project, data=condition, rule=rule)
+        kwargs = {}
+        if issubclass(condition_cls, BaseEventFrequencyCondition):
+            kwargs['rate_cache'] = self.rate_cache
+
+        condition_inst = condition_cls(self.project, data=condition, rule=rule, **kwargs)
         return safe_execute(condition_inst.passes, self.event, state, _with_transaction=False)
 
     def get_state(self):
@@ -83,9 +141,10 @@ class RuleProcessor(object):
             has_reappeared=self.has_reappeared,
         )
 
-    def apply_rule(self, rule):
+    def apply_rule(self, rule, status=None, condition_list=None):
         match = rule.data.get('action_match') or Rule.DEFAULT_ACTION_MATCH
-        condition_list = rule.data.get('conditions', ())
+        if condition_list is None:
+            condition_list = rule.data.get('conditions', ())
         frequency = rule.data.get('frequency') or Rule.DEFAULT_FREQUENCY
 
         # XXX(dcramer): if theres no condition should we really skip it,
@@ -97,7 +156,8 @@ class RuleProcessor(object):
                 and self.event.get_environment().id != rule.environment_id:
             return
 
-        status = self.get_rule_status(rule)
+        if status is None:
+            status = self.get_rule_status(rule)
 
         now = timezone.now()
         freq_offset = now - timedelta(minutes=frequency)
@@ -154,6 +214,10 @@ class RuleProcessor(object):
 
     def apply(self):
         self.grouped_futures.clear()
-        for rule in self.get_rules():
-            self.apply_rule(rule)
+        self.rate_cache.clear()
+
+        plan = self.get_rule_plan()
+        rule_statuses = self.get_rule_statuses([rule for rule, _ in plan])
+        for rule, condition_list in plan:
+            self.apply_rule(rule, rule_statuses[rule.id], condition_list)
         return six.itervalues(self.grouped_futures)
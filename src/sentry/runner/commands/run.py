@@ -264,6 +264,10 @@ def cron(**options):
               help='How many messages to process (may or may not result in an enqueued task) before committing offsets.')
 @click.option('--initial-offset-reset', default='latest', type=click.Choice(['earliest', 'latest']),
               help='Position in the commit log topic to begin reading from when no prior offset has been recorded.')
+@click.option('--dispatch-batch-size', default=0, type=int,
+              help='How many events to collect before enqueuing them as one post-processing task per project. Disabled when 0.')
+@click.option('--dispatch-batch-window', default=1.0, type=float,
+              help='How many seconds to collect events for before enqueuing them, when batching is enabled.')
 @log_options()
 @configuration
 def relay(**options):
@@ -276,6 +280,8 @@ def relay(**options):
             synchronize_commit_group=options['synchronize_commit_group'],
             commit_batch_size=options['commit_batch_size'],
             initial_offset_reset=options['initial_offset_reset'],
+            dispatch_batch_size=options['dispatch_batch_size'],
+            dispatch_batch_window=options['dispatch_batch_window'],
         )
     except RelayNotRequired:
         sys.stdout.write(
@@ -0,0 +1,38 @@
+--[[
+
+Checks whether an item was (probably) added to any window of a time windowed
+bloom filter, and adds it to the current window.
+
+KEYS: the key of the current window, followed by the keys of the previous
+    windows that should be checked
+ARGV: the number of seconds the current window should be kept for,
+    followed by the bit offsets of the item
+
+Returns 1 if all of the bits of the item were set in any of the windows,
+and 0 otherwise.
+
+]]--
+
+local ttl = tonumber(ARGV[1])
+
+local found = 0
+for _, key in ipairs(KEYS) do
+    local match = 1
+    for i = 2, #ARGV do
+        if redis.call('GETBIT', key, ARGV[i]) == 0 then
+            match = 0
+            break
+        end
+    end
+    if match == 1 then
+        found = 1
+        break
+    end
+end
+
+for i = 2, #ARGV do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+end
+redis.call('EXPIRE', KEYS[1], ttl)
+
+return found
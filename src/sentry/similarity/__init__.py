@@ -17,13 +17,23 @@ from sentry.similarity.features import (
     MessageFeature,
     get_application_chunks,
 )
-from sentry.similarity.signatures import MinHashSignatureBuilder
+from sentry.similarity.signatures import (
+    MinHashSignatureBuilder,
+    UniversalHashSignatureBuilder,
+)
 from sentry.utils import redis
 from sentry.utils.datastructures import BidirectionalMapping
 from sentry.utils.iterators import shingle
 
 logger = logging.getLogger(__name__)
 
+# Signatures from different builders cannot be compared with each other, so
+# every builder writes to its own versioned index namespace.
+signature_builders = {
+    1: MinHashSignatureBuilder,
+    2: UniversalHashSignatureBuilder,
+}
+
 
 def text_shingle(n, value):
     return itertools.imap(
@@ -77,11 +87,13 @@ def _make_index_backend(cluster=None):
             logger.info(u'No redis cluster provided for similarity, using {!r}.'.format(index))
             return index
 
+    version = getattr(settings, 'SENTRY_SIMILARITY_INDEX_VERSION', 1)
+
     return MetricsWrapper(
         RedisScriptMinHashIndexBackend(
             cluster,
-            'sim:1',
-            MinHashSignatureBuilder(16, 0xFFFF),
+            'sim:{}'.format(version),
+            signature_builders[version](16, 0xFFFF),
             8,
             60 * 60 * 24 * 30,
             3,
@@ -2,6 +2,11 @@ from __future__ import absolute_import
 
 import mmh3
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class MinHashSignatureBuilder(object):
     def __init__(self, columns, rows):
@@ -21,3 +26,48 @@ class MinHashSignatureBuilder(object):
             ),
             range(self.columns),
         )
+
+
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+class UniversalHashSignatureBuilder(object):
+    """
+    MinHash signature builder that hashes every feature only once and derives
+    the per-column permutations with universal hashing, ``((a * h + b) mod p)
+    mod rows``. The coefficients are derived from the column number, so the
+    signatures are stable across processes. When NumPy is available all
+    columns are computed in a single vectorized pass.
+
+    The signatures are not compatible with ``MinHashSignatureBuilder``, so
+    the two must not share an index namespace.
+    """
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.coefficients = [
+            (
+                (mmh3.hash('a', column) & 0xFFFFFFFF) % (MERSENNE_PRIME - 1) + 1,
+                (mmh3.hash('b', column) & 0xFFFFFFFF) % MERSENNE_PRIME,
+            ) for column in range(columns)
+        ]
+        if numpy is not None:
+            self._a, self._b = (
+                numpy.array(values, dtype=numpy.uint64).reshape(columns, 1)
+                for values in zip(*self.coefficients)
+            )
+
+    def __call__(self, features):
+        hashes = [mmh3.hash(feature) & 0xFFFFFFFF for feature in features]
+
+        if numpy is not None:
+            values = self._a * numpy.array(hashes, dtype=numpy.uint64) + self._b
+            values %= numpy.uint64(MERSENNE_PRIME)
+            values %= numpy.uint64(self.rows)
+            return values.min(axis=1).tolist()
+
+        return [
+            min((a * h + b) % MERSENNE_PRIME % self.rows for h in hashes)
+            for a, b in self.coefficients
+        ]
@@ -87,6 +87,7 @@ class TagStorage(Service):
 
         'incr_tag_value_times_seen',
         'incr_group_tag_value_times_seen',
+        'incr_event_tag_values_times_seen',
         'update_group_tag_key_values_seen',
         'update_group_for_events',
     ])
@@ -304,6 +305,32 @@ class TagStorage(Service):
         """
         raise NotImplementedError
 
+    def incr_event_tag_values_times_seen(self, project_id, group_id, environment_id,
+                                         tags, date):
+        """
+        Increments the times seen of all tags of an event, both for the
+        project and the group. ``tags`` is a list of ``(key, value)`` or
+        ``(key, value, data)`` tuples.
+
+        >>> incr_event_tag_values_times_seen(1, 2, 3, [("key1", "value1")], timezone.now())
+        """
+        for tag_item in tags:
+            if len(tag_item) == 2:
+                (key, value), data = tag_item, None
+            else:
+                key, value, data = tag_item
+
+            self.incr_tag_value_times_seen(project_id, environment_id, key, value, extra={
+                'last_seen': date,
+                'data': data,
+            })
+
+            self.incr_group_tag_value_times_seen(project_id, group_id, environment_id, key, value,
+                                                 extra={
+                                                     'project_id': project_id,
+                                                     'last_seen': date,
+                                                 })
+
     def get_group_event_filter(self, project_id, group_id, environment_id, tags):
         """
         >>> get_group_event_filter(1, 2, 3, {'key1': 'value1', 'key2': 'value2'})
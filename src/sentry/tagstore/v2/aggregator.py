@@ -0,0 +1,447 @@
+"""
+sentry.tagstore.v2.aggregator
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2018 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import
+
+import atexit
+import logging
+import six
+import threading
+import weakref
+
+from collections import defaultdict
+from celery.signals import worker_process_shutdown
+from django.db import DatabaseError, connections, router, transaction
+from django.utils.encoding import force_text
+
+from sentry import buffer
+from sentry.db.models import BoundedPositiveIntegerField
+from sentry.utils import metrics
+from sentry.utils.db import supports_insert_on_conflict
+
+from . import models
+
+logger = logging.getLogger('sentry.tagstore.v2')
+
+# Aggregators, which are flushed once when the process exits. The set doesn't
+# keep the aggregators alive.
+_aggregators = weakref.WeakSet()
+
+
+def _flush_aggregators(**kwargs):
+    for aggregator in list(_aggregators):
+        aggregator._safe_flush()
+
+
+atexit.register(_flush_aggregators)
+worker_process_shutdown.connect(
+    _flush_aggregators,
+    weak=False,
+    dispatch_uid='sentry.tagstore.v2.aggregator.flush_aggregators',
+)
+
+
+class TagValueCount(object):
+    """
+    The times seen of a tag value that have been merged in process and not
+    yet written to the database.
+    """
+    __slots__ = ['times_seen', 'first_seen', 'last_seen', 'data']
+
+    def __init__(self):
+        self.times_seen = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.data = None
+
+    def add(self, count, first_seen, last_seen, data=None):
+        self.times_seen += count
+        if first_seen is not None and (self.first_seen is None or first_seen < self.first_seen):
+            self.first_seen = first_seen
+        if last_seen is not None and (self.last_seen is None or last_seen > self.last_seen):
+            self.last_seen = last_seen
+        if data is not None:
+            # last write wins, as it does with buffered increments
+            self.data = data
+
+
+class TagCountAggregator(object):
+    """
+    Merges the times seen of tag values (and group tag values) across events
+    in process, and writes them to the database once ``flush_interval``
+    milliseconds have passed or ``max_keys`` distinct rows have been
+    aggregated.
+
+    Every flush updates all rows of a table with a single ``INSERT ... ON
+    CONFLICT DO UPDATE`` statement (per ``batch_size`` rows.) Batches that
+    can't be written, and databases that don't support upserts, fall back to
+    buffered increments of the merged counts.
+    """
+
+    def __init__(self, storage, flush_interval, max_keys=10000, batch_size=500):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self.batch_size = batch_size
+        assert self.flush_interval > 0
+        assert self.max_keys > 0
+        assert self.batch_size > 0
+
+        self._lock = threading.Lock()
+        self._tag_values = {}
+        self._group_tag_values = {}
+        self._timer = None
+        _aggregators.add(self)
+
+    def add(self, project_id, group_id, environment_id, tags, date):
+        with self._lock:
+            for tag_item in tags:
+                if len(tag_item) == 2:
+                    (key, value), data = tag_item, None
+                else:
+                    key, value, data = tag_item
+
+                tag_value = self._tag_values.get((project_id, environment_id, key, value))
+                if tag_value is None:
+                    tag_value = self._tag_values[(project_id, environment_id, key, value)] = \
+                        TagValueCount()
+                tag_value.add(1, date, date, data)
+
+                group_tag_value = self._group_tag_values.get(
+                    (project_id, group_id, environment_id, key, value))
+                if group_tag_value is None:
+                    group_tag_value = self._group_tag_values[
+                        (project_id, group_id, environment_id, key, value)] = TagValueCount()
+                group_tag_value.add(1, date, date)
+
+            full = len(self._tag_values) + len(self._group_tag_values) >= self.max_keys
+            if not full and self._timer is None:
+                self._timer = threading.Timer(
+                    self.flush_interval / 1000.0,
+                    self._flush_on_timer,
+                )
+                self._timer.daemon = True
+                self._timer.start()
+
+        # The tags are added while saving an event, which must not fail (and
+        # be retried, counting the event twice) because of a failed flush.
+        if full:
+            self._safe_flush()
+
+    def _safe_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('tagstore.aggregator.flush-failed')
+
+    def _flush_on_timer(self):
+        try:
+            self._safe_flush()
+        finally:
+            # Every timer runs on a new thread, which has its own connections.
+            for connection in connections.all():
+                connection.close()
+
+    def flush(self):
+        """
+        Write all times seen that have been merged in process to the database.
+        """
+        with self._lock:
+            tag_values, self._tag_values = self._tag_values, {}
+            group_tag_values, self._group_tag_values = self._group_tag_values, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not tag_values:
+            return
+
+        using = router.db_for_write(models.TagValue)
+        with metrics.timer('tagstore.aggregator.flush'):
+            if supports_insert_on_conflict(using):
+                try:
+                    tag_keys = self._get_tag_keys(tag_values)
+                except Exception:
+                    # Nothing has been written yet, so the counts are kept
+                    # for the next flush.
+                    self._restore(tag_values, group_tag_values)
+                    raise
+                self._upsert(using, tag_keys, tag_values, group_tag_values)
+            else:
+                self._incr(tag_values, group_tag_values)
+
+        metrics.timing('tagstore.aggregator.flush-size', len(tag_values), tags={
+            'model': 'tagvalue',
+        })
+        metrics.timing('tagstore.aggregator.flush-size', len(group_tag_values), tags={
+            'model': 'grouptagvalue',
+        })
+
+    def _restore(self, tag_values, group_tag_values):
+        with self._lock:
+            for pending, counts in ((self._tag_values, tag_values),
+                                    (self._group_tag_values, group_tag_values)):
+                for key, count in six.iteritems(counts):
+                    if key not in pending:
+                        pending[key] = TagValueCount()
+                    pending[key].add(count.times_seen, count.first_seen, count.last_seen,
+                                     count.data)
+
+    def _incr(self, tag_values, group_tag_values):
+        for (project_id, environment_id, key, value), count in six.iteritems(tag_values):
+            self.storage.incr_tag_value_times_seen(
+                project_id, environment_id, key, value, count=count.times_seen, extra={
+                    'last_seen': count.last_seen,
+                    'data': count.data,
+                })
+
+        for (project_id, group_id, environment_id, key, value), count in \
+                six.iteritems(group_tag_values):
+            self.storage.incr_group_tag_value_times_seen(
+                project_id, group_id, environment_id, key, value, count=count.times_seen, extra={
+                    'project_id': project_id,
+                    'last_seen': count.last_seen,
+                })
+
+    def _get_tag_keys(self, tag_values):
+        """
+        Returns a mapping of ``(project_id, environment_id, key)`` to the id
+        of the tag key, for both the environment and the aggregate
+        environment of every tag value.
+        """
+        from sentry.tagstore.v2.backend import AGGREGATE_ENVIRONMENT_ID
+
+        keys = defaultdict(set)
+        for project_id, environment_id, key, _ in tag_values:
+            keys[(project_id, environment_id)].add(key)
+            keys[(project_id, AGGREGATE_ENVIRONMENT_ID)].add(key)
+
+        tag_keys = {}
+        for (project_id, environment_id), names in six.iteritems(keys):
+            for key, tag_key in six.iteritems(models.TagKey.get_or_create_bulk(
+                project_id, environment_id, list(names),
+            )):
+                tag_keys[(project_id, environment_id, key)] = tag_key.id
+        return tag_keys
+
+    def _upsert(self, using, tag_keys, tag_values, group_tag_values):
+        from sentry.tagstore.v2.backend import AGGREGATE_ENVIRONMENT_ID
+
+        # Counts are recorded for the environment of the event and for the
+        # aggregate of all environments, which merges the counts of different
+        # environments into the same row. Values are coerced to text so that
+        # they can be matched with the values returned by the database.
+        values = defaultdict(TagValueCount)
+        for (project_id, environment_id, key, value), count in six.iteritems(tag_values):
+            value = force_text(value)
+            for env in (environment_id, AGGREGATE_ENVIRONMENT_ID):
+                values[(project_id, tag_keys[(project_id, env, key)], value)].add(
+                    count.times_seen, count.first_seen, count.last_seen, count.data)
+
+        group_values = defaultdict(TagValueCount)
+        for (project_id, group_id, environment_id, key, value), count in \
+                six.iteritems(group_tag_values):
+            value = force_text(value)
+            for env in (environment_id, AGGREGATE_ENVIRONMENT_ID):
+                group_values[(project_id, group_id, tag_keys[(project_id, env, key)], value)].add(
+                    count.times_seen, count.first_seen, count.last_seen)
+
+        value_ids, created = self._upsert_tag_values(using, values)
+
+        created_keys = defaultdict(int)
+        for project_id, key_id, _ in created:
+            created_keys[(project_id, key_id)] += 1
+        for (project_id, key_id), count in six.iteritems(created_keys):
+            buffer.incr(models.TagKey,
+                        columns={
+                            'values_seen': count,
+                        },
+                        filters={
+                            'id': key_id,
+                            'project_id': project_id,
+                        })
+
+        values_by_id = {}
+        for (project_id, group_id, key_id, value), count in six.iteritems(group_values):
+            value_id = value_ids.get((project_id, key_id, value))
+            if value_id is None:
+                # The tag value was written by a failed batch.
+                try:
+                    value_id = models.TagValue.get_or_create(
+                        project_id=project_id,
+                        _key_id=key_id,
+                        value=value,
+                    )[0].id
+                except DatabaseError:
+                    logger.exception('tagstore.aggregator.get-tag-value-failed')
+                    continue
+            values_by_id[(project_id, group_id, key_id, value_id)] = count
+
+        created = self._upsert_group_tag_values(using, values_by_id)
+
+        created_keys = defaultdict(int)
+        for project_id, group_id, key_id, _ in created:
+            created_keys[(project_id, group_id, key_id)] += 1
+        for (project_id, group_id, key_id), count in six.iteritems(created_keys):
+            buffer.incr(models.GroupTagKey,
+                        columns={
+                            'values_seen': count,
+                        },
+                        filters={
+                            'project_id': project_id,
+                            'group_id': group_id,
+                            '_key_id': key_id,
+                        })
+
+    def _execute_upsert(self, using, model, columns, conflict, returning, rows):
+        """
+        Inserts the rows (sequences of values for ``columns``), adding the
+        ``times_seen`` of rows that conflict on the ``conflict`` columns to
+        the existing rows (up to the maximum value of the column) and keeping
+        the latest ``last_seen``. Returns a list of the values of the
+        ``returning`` columns of every row and whether the row was created,
+        and a list of the rows of the batches that failed.
+
+        The rows are written in order of their ``conflict`` columns, so that
+        concurrent flushes lock the rows in the same order.
+        """
+        connection = connections[using]
+        quote_name = connection.ops.quote_name
+        fields = [model._meta.get_field(name) for name in columns]
+        table = quote_name(model._meta.db_table)
+
+        updates = [
+            u'times_seen = LEAST({table}.times_seen::bigint + EXCLUDED.times_seen, %d)' % (
+                BoundedPositiveIntegerField.MAX_VALUE,
+            ),
+            u'last_seen = GREATEST({table}.last_seen, EXCLUDED.last_seen)',
+        ]
+        if 'data' in columns:
+            updates.append(u'data = COALESCE(EXCLUDED.data, {table}.data)')
+
+        sql_template = u'INSERT INTO {} ({}) VALUES {{}} ON CONFLICT ({}) DO UPDATE SET {} ' \
+            u'RETURNING {}, (xmax = 0)'.format(
+                table,
+                u', '.join(quote_name(f.column) for f in fields),
+                u', '.join(quote_name(model._meta.get_field(name).column) for name in conflict),
+                u', '.join(updates).format(table=table),
+                u', '.join(quote_name(model._meta.get_field(name).column) for name in returning),
+            )
+        row_sql = u'({})'.format(u', '.join([u'%s'] * len(fields)))
+
+        rows = sorted(rows, key=lambda row: tuple(row[columns.index(c)] for c in conflict))
+        results = []
+        failed = []
+        cursor = connection.cursor()
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            params = []
+            for row in batch:
+                params.extend(
+                    field.get_db_prep_save(value, connection=connection)
+                    for field, value in zip(fields, row)
+                )
+
+            try:
+                with transaction.atomic(using=using):
+                    cursor.execute(sql_template.format(u', '.join([row_sql] * len(batch))), params)
+                    results.extend((tuple(row[:-1]), row[-1]) for row in cursor.fetchall())
+            except DatabaseError:
+                logger.exception('tagstore.aggregator.upsert-failed', extra={
+                    'model': model.__name__,
+                })
+                metrics.incr('tagstore.aggregator.upsert-failed', tags={
+                    'model': model.__name__.lower(),
+                })
+                failed.extend(batch)
+        return results, failed
+
+    def _upsert_tag_values(self, using, values):
+        """
+        Returns a mapping of ``(project_id, key_id, value)`` to the id of the
+        tag value, and the set of tag values that were created. The tag
+        values that couldn't be written are buffered instead.
+        """
+        rows = [
+            (project_id, key_id, value, count.data,
+             min(count.times_seen, BoundedPositiveIntegerField.MAX_VALUE),
+             count.first_seen, count.last_seen)
+            for (project_id, key_id, value), count in six.iteritems(values)
+        ]
+
+        results, failed = self._execute_upsert(
+            using,
+            models.TagValue,
+            ('project_id', '_key', 'value', 'data', 'times_seen', 'first_seen', 'last_seen'),
+            ('project_id', '_key', 'value'),
+            ('id', 'project_id', '_key', 'value'),
+            rows,
+        )
+
+        value_ids = {}
+        created = set()
+        for (id, project_id, key_id, value), is_created in results:
+            value_ids[(project_id, key_id, value)] = id
+            if is_created:
+                created.add((project_id, key_id, value))
+
+        for project_id, key_id, value, data, times_seen, _, last_seen in failed:
+            buffer.incr(models.TagValue,
+                        columns={
+                            'times_seen': times_seen,
+                        },
+                        filters={
+                            'project_id': project_id,
+                            '_key_id': key_id,
+                            'value': value,
+                        },
+                        extra={
+                            'last_seen': last_seen,
+                            'data': data,
+                        })
+
+        return value_ids, created
+
+    def _upsert_group_tag_values(self, using, values):
+        """
+        Returns the set of ``(project_id, group_id, key_id, value_id)`` group
+        tag values that were created. The group tag values that couldn't be
+        written are buffered instead.
+        """
+        rows = [
+            (project_id, group_id, key_id, value_id,
+             min(count.times_seen, BoundedPositiveIntegerField.MAX_VALUE),
+             count.first_seen, count.last_seen)
+            for (project_id, group_id, key_id, value_id), count in six.iteritems(values)
+        ]
+
+        results, failed = self._execute_upsert(
+            using,
+            models.GroupTagValue,
+            ('project_id', 'group_id', '_key', '_value', 'times_seen', 'first_seen', 'last_seen'),
+            ('project_id', 'group_id', '_key', '_value'),
+            ('project_id', 'group_id', '_key', '_value'),
+            rows,
+        )
+
+        for project_id, group_id, key_id, value_id, times_seen, _, last_seen in failed:
+            buffer.incr(models.GroupTagValue,
+                        columns={
+                            'times_seen': times_seen,
+                        },
+                        filters={
+                            'project_id': project_id,
+                            'group_id': group_id,
+                            '_key_id': key_id,
+                            '_value_id': value_id,
+                        },
+                        extra={
+                            'project_id': project_id,
+                            'last_seen': last_seen,
+                        })
+
+        return set(row for row, is_created in results if is_created)
@@ -26,6 +26,7 @@ from sentry.tagstore.base import TagStorage, TOP_VALUES_DEFAULT_LIMIT
 from sentry.utils import db
 
 from . import models
+from .aggregator import TagCountAggregator
 from sentry.tagstore.types import TagKey, TagValue, GroupTagKey, GroupTagValue
 
 
@@ -68,8 +69,22 @@ class V2TagStorage(TagStorage):
 
     An ``environment_id`` value of ``None`` is used to keep track of the aggregate value across
     all environments.
+
+    When ``aggregate_flush_interval`` (in milliseconds) is set, the times seen of the tags of
+    events are merged in process and written to the database in bulk once the interval has
+    passed or ``aggregate_max_keys`` distinct rows have been merged.
     """
 
+    def __init__(self, aggregate_flush_interval=0, aggregate_max_keys=10000):
+        if aggregate_flush_interval:
+            self.aggregator = TagCountAggregator(
+                self,
+                flush_interval=aggregate_flush_interval,
+                max_keys=aggregate_max_keys,
+            )
+        else:
+            self.aggregator = None
+
     def setup(self):
         self.setup_deletions()
 
@@ -659,6 +674,14 @@ class V2TagStorage(TagStorage):
                         },
                         extra=extra)
 
+    def incr_event_tag_values_times_seen(self, project_id, group_id, environment_id,
+                                         tags, date):
+        if self.aggregator is None:
+            return super(V2TagStorage, self).incr_event_tag_values_times_seen(
+                project_id, group_id, environment_id, tags, date)
+
+        self.aggregator.add(project_id, group_id, environment_id, tags, date)
+
     def get_group_event_filter(self, project_id, group_id, environment_id, tags):
         # NOTE: `environment_id=None` needs to be filtered differently in this method.
         # EventTag never has NULL `environment_id` fields (individual Events always have an environment),
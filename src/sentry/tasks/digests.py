@@ -3,10 +3,14 @@ from __future__ import absolute_import
 import logging
 import time
 
+from collections import defaultdict
+
+from sentry import options
 from sentry.digests import get_option_key
 from sentry.digests.backends.base import InvalidState
 from sentry.digests.notifications import (
     build_digest,
+    fetch_states,
     split_key,
 )
 from sentry.models import (
@@ -35,8 +39,21 @@ def schedule_digests():
     timeout = 300
     digests.maintenance(deadline - timeout)
 
+    batch_size = options.get('digests.delivery-batch-size')
+    if not batch_size:
+        for entry in digests.schedule(deadline):
+            deliver_digest.delay(entry.key, entry.timestamp)
+        return
+
+    batch = []
     for entry in digests.schedule(deadline):
-        deliver_digest.delay(entry.key, entry.timestamp)
+        batch.append(entry.key)
+        if len(batch) >= batch_size:
+            deliver_digests.delay(batch, deadline)
+            batch = []
+
+    if batch:
+        deliver_digests.delay(batch, deadline)
 
 
 @instrumented_task(name='sentry.tasks.digests.deliver_digest', queue='digests.delivery')
@@ -63,3 +80,74 @@ def deliver_digest(key, schedule_timestamp=None):
 
     if digest:
         plugin.notify_digest(project, digest)
+
+
+@instrumented_task(name='sentry.tasks.digests.deliver_digests', queue='digests.delivery')
+def deliver_digests(keys, schedule_timestamp=None):
+    """
+    Deliver the digests for several timelines, opening all of them with
+    ``digest_many`` and fetching their state in bulk.
+    """
+    from sentry import digests
+    from sentry.plugins import plugins
+
+    targets = {}
+    project_ids = set()
+    for key in keys:
+        plugin_slug, _, project_id = key.split(':', 2)
+        targets[key] = (plugins.get(plugin_slug), int(project_id))
+        project_ids.add(int(project_id))
+
+    projects = Project.objects.in_bulk(project_ids)
+    for key, (plugin, project_id) in list(targets.items()):
+        if project_id not in projects:
+            logger.info('Cannot deliver digest %r due to error: project does not exist', key)
+            digests.delete(key)
+            del targets[key]
+            continue
+        targets[key] = (plugin, projects[project_id])
+
+    option_keys = {
+        key: get_option_key(plugin.get_conf_key(), 'minimum_delay')
+        for key, (plugin, project) in targets.items()
+    }
+    minimum_delays = defaultdict(dict)
+    for option in ProjectOption.objects.filter(
+        project__in=project_ids,
+        key__in=set(option_keys.values()),
+    ):
+        minimum_delays[option.project_id][option.key] = option.value
+
+    results = {}
+    with digests.digest_many(
+        targets.keys(),
+        minimum_delay={
+            key: minimum_delays[project.id].get(option_keys[key])
+            for key, (plugin, project) in targets.items()
+        },
+    ) as opened:
+        states = fetch_states({
+            key: (targets[key][1], records)
+            for key, records in opened.items() if records
+        })
+        for key, records in list(opened.items()):
+            plugin, project = targets[key]
+            try:
+                results[key] = build_digest(project, records, state=states.get(key))
+            except Exception as error:
+                # Leave the timeline open so that its records are delivered
+                # once maintenance reschedules it.
+                logger.error('Failed to build digest %r due to error: %r', key, error,
+                             exc_info=True)
+                del opened[key]
+
+    for key, digest in results.items():
+        if not digest:
+            continue
+
+        plugin, project = targets[key]
+        try:
+            plugin.notify_digest(project, digest)
+        except Exception as error:
+            logger.error('Failed to deliver digest %r due to error: %r', key, error,
+                         exc_info=True)
@@ -52,6 +52,7 @@ def merge_groups(
         GroupMeta,
         get_group_with_redirect,
     )
+    from sentry.models.grouphash import hash_cache
 
     if not (from_object_ids and to_object_id):
         logger.error(
@@ -111,6 +112,15 @@ def merge_groups(
             GroupMeta,
         )
 
+        # Only the hashes of the group that is merged move to the new group,
+        # so only those have to be removed from the hash cache.
+        if hash_cache.enabled:
+            hashes = list(
+                GroupHash.objects.filter(group_id=group.id).values_list('hash', flat=True)
+            )
+        else:
+            hashes = []
+
         has_more = merge_objects(
             model_list,
             group,
@@ -119,6 +129,8 @@ def merge_groups(
             transaction_id=transaction_id,
         )
 
+        GroupHash.uncache_many(group.project_id, hashes)
+
         if not has_more:
             # There are no more objects to merge for *this* "from" group, remove it
             # from the list of "from" groups that are being merged, and finish the
@@ -9,6 +9,7 @@ sentry.tasks.post_process
 from __future__ import absolute_import, print_function
 
 import logging
+import random
 import time
 
 from django.conf import settings
@@ -19,6 +20,7 @@ from sentry.plugins import plugins
 from sentry.signals import event_processed
 from sentry.tasks.base import instrumented_task
 from sentry.utils import metrics
+from sentry.utils.compat import pickle
 from sentry.utils.redis import redis_clusters
 from sentry.utils.safe import safe_execute
 from sentry.utils.sdk import configure_scope
@@ -37,7 +39,7 @@ def _get_service_hooks(project_id):
     return result
 
 
-def _capture_stats(event, is_new):
+def _capture_stats(event, is_new, event_size=None):
     # TODO(dcramer): limit platforms to... something?
     group = event.group
     platform = group.platform
@@ -50,7 +52,66 @@ def _capture_stats(event, is_new):
 
     metrics.incr('events.processed')
     metrics.incr(u'events.processed.{platform}'.format(platform=platform))
-    metrics.timing('events.size.data', event.size, tags={'platform': platform})
+    if event_size is None:
+        event_size = event.size
+    metrics.timing('events.size.data', event_size, tags={'platform': platform})
+
+
+def get_event_ref(event):
+    """
+    Returns the compact reference to a stored event that ``post_process_group``
+    accepts in place of the pickled event, or ``None`` if the event was not
+    written to the database (e.g. because it was sampled.)
+    """
+    if event.id is None or not event.data.id:
+        return None
+
+    return {
+        'id': event.id,
+        'event_id': event.event_id,
+        'project_id': event.project_id,
+        'group_id': event.group_id,
+        'message': event.message,
+        'platform': event.platform,
+        'datetime': event.datetime,
+        'node_id': event.data.id,
+        # Measured here so the stats don't load the body from nodestore.
+        'size': event.size,
+    }
+
+
+def get_event_from_ref(event_ref):
+    from sentry.models import Event
+
+    event = Event(
+        id=event_ref['id'],
+        event_id=event_ref['event_id'],
+        project_id=event_ref['project_id'],
+        group_id=event_ref['group_id'],
+        message=event_ref['message'],
+        platform=event_ref['platform'],
+        datetime=event_ref['datetime'],
+        data={'node_id': event_ref['node_id']},
+    )
+    # The body is only fetched from nodestore once a rule, plugin or
+    # service hook reads it.
+    event.data.lazy = True
+    return event
+
+
+# Fraction of the post-processing messages whose pickled size is recorded
+MESSAGE_SIZE_SAMPLE_RATE = 0.1
+
+
+def record_message_size(task_kwargs):
+    if random.random() >= MESSAGE_SIZE_SAMPLE_RATE:
+        return
+
+    metrics.timing(
+        'events.post_process.message-size',
+        len(pickle.dumps(task_kwargs, pickle.HIGHEST_PROTOCOL)),
+        tags={'format': 'compact' if task_kwargs.get('event_ref') else 'full'},
+    )
 
 
 def check_event_already_post_processed(event):
@@ -70,10 +131,76 @@ def check_event_already_post_processed(event):
 
 
 @instrumented_task(name='sentry.tasks.post_process.post_process_group')
-def post_process_group(event, is_new, is_regression, is_sample, is_new_group_environment, **kwargs):
+def post_process_group(event, is_new, is_regression, is_sample, is_new_group_environment,
+                       event_ref=None, **kwargs):
     """
     Fires post processing hooks for a group.
+
+    The event is either passed pickled as ``event``, or as the compact
+    ``event_ref`` returned by ``get_event_ref`` with ``event`` set to
+    ``None``.
     """
+    event_size = None
+    if event is None:
+        event = get_event_from_ref(event_ref)
+        event_size = event_ref.get('size')
+
+    _do_post_process_group(
+        event, is_new, is_regression, is_sample, is_new_group_environment,
+        primary_hash=kwargs.get('primary_hash'), event_size=event_size,
+    )
+
+
+@instrumented_task(name='sentry.tasks.post_process.post_process_group_batch')
+def post_process_group_batch(events, **kwargs):
+    """
+    Fires post processing hooks for several events, binding the groups,
+    projects, rules and plugins they share only once. ``events`` is a list
+    of ``post_process_group`` keyword arguments.
+    """
+    from sentry.models import Project, Rule
+    from sentry.models.group import get_group_with_redirect
+
+    groups = {}
+    projects = {}
+    project_rules = {}
+    project_plugins = {}
+
+    metrics.timing('events.post_process.batch-size', len(events))
+
+    for task_kwargs in events:
+        event = task_kwargs['event']
+        try:
+            group = groups.get(event.group_id)
+            if group is None:
+                group, _ = get_group_with_redirect(event.group_id)
+                groups[event.group_id] = group
+
+            project_id = group.project_id
+            project = projects.get(project_id)
+            if project is None:
+                project = Project.objects.get_from_cache(id=project_id)
+                projects[project_id] = project
+                project_rules[project_id] = Rule.get_for_project(project_id)
+                project_plugins[project_id] = list(plugins.for_project(project))
+
+            _do_post_process_group(
+                group=group,
+                project=project,
+                rules=project_rules[project_id],
+                plugin_list=project_plugins[project_id],
+                **task_kwargs
+            )
+        except Exception:
+            logger.exception('post_process.batch.failed', extra={
+                'project_id': event.project_id,
+                'event_id': event.event_id,
+            })
+
+
+def _do_post_process_group(event, is_new, is_regression, is_sample, is_new_group_environment,
+                           primary_hash=None, group=None, project=None, rules=None,
+                           plugin_list=None, event_size=None, **kwargs):
     if check_event_already_post_processed(event):
         logger.info('post_process.skipped', extra={
             'project_id': event.project_id,
@@ -92,7 +219,9 @@ def post_process_group(event, is_new, is_regression, is_sample, is_new_group_env
 
     # Re-bind Group since we're pickling the whole Event object
     # which may contain a stale Group.
-    event.group, _ = get_group_with_redirect(event.group_id)
+    if group is None:
+        group, _ = get_group_with_redirect(event.group_id)
+    event.group = group
     event.group_id = event.group.id
 
     project_id = event.group.project_id
@@ -101,14 +230,20 @@ def post_process_group(event, is_new, is_regression, is_sample, is_new_group_env
 
     # Re-bind Project since we're pickling the whole Event object
     # which may contain a stale Project.
-    event.project = Project.objects.get_from_cache(id=project_id)
+    if project is None:
+        project = Project.objects.get_from_cache(id=project_id)
+    event.project = project
 
-    _capture_stats(event, is_new)
+    _capture_stats(event, is_new, event_size)
 
     # we process snoozes before rules as it might create a regression
     has_reappeared = process_snoozes(event.group)
 
-    rp = RuleProcessor(event, is_new, is_regression, is_new_group_environment, has_reappeared)
+    rp_kwargs = {}
+    if rules is not None:
+        rp_kwargs['rules'] = rules
+    rp = RuleProcessor(event, is_new, is_regression, is_new_group_environment, has_reappeared,
+                       **rp_kwargs)
     has_alert = False
     # TODO(dcramer): ideally this would fanout, but serializing giant
     # objects back and forth isn't super efficient
@@ -132,7 +267,10 @@ def post_process_group(event, is_new, is_regression, is_sample, is_new_group_env
                         event=event,
                     )
 
-    for plugin in plugins.for_project(event.project):
+    if plugin_list is None:
+        plugin_list = plugins.for_project(event.project)
+
+    for plugin in plugin_list:
         plugin_post_process_group(
             plugin_slug=plugin.slug,
             event=event,
@@ -146,7 +284,7 @@ def post_process_group(event, is_new, is_regression, is_sample, is_new_group_env
         project=event.project,
         group=event.group,
         event=event,
-        primary_hash=kwargs.get('primary_hash'),
+        primary_hash=primary_hash,
     )
 
 
@@ -15,7 +15,7 @@ import six
 from time import time
 from django.utils import timezone
 
-from sentry import features, reprocessing
+from sentry import features, options, reprocessing
 from sentry.attachments import attachment_cache
 from sentry.cache import default_cache
 from sentry.tasks.base import instrumented_task
@@ -59,7 +59,7 @@ def should_process(data):
     return False
 
 
-def _do_preprocess_event(cache_key, data, start_time, event_id, process_event):
+def _do_preprocess_event(cache_key, data, start_time, event_id, process_event, fused=False):
     if cache_key:
         data = default_cache.get(cache_key)
 
@@ -74,12 +74,28 @@ def _do_preprocess_event(cache_key, data, start_time, event_id, process_event):
     with configure_scope() as scope:
         scope.set_tag("project", project)
 
-    if should_process(data):
+    pipeline = 'fused' if fused else 'default'
+
+    with metrics.timer('events.store.stage', tags={'stage': 'preprocess', 'pipeline': pipeline}):
+        needs_processing = should_process(data)
+
+    if needs_processing:
         process_event.delay(cache_key=cache_key, start_time=start_time, event_id=event_id)
         return
 
     # If we get here, that means the event had no preprocessing needed to be done
     # so we can jump directly to save_event
+    if fused:
+        # Save the event right away with the payload we already hold. It
+        # stays in the cache until it has been saved, just like it does
+        # when it is handed to the save_event task.
+        metrics.incr('events.store.fused', skip_internal=True)
+        _do_save_event(
+            cache_key=cache_key, data=data, start_time=start_time, event_id=event_id,
+            project_id=project, pipeline=pipeline,
+        )
+        return
+
     if cache_key:
         data = None
     save_event.delay(
@@ -88,14 +104,20 @@ def _do_preprocess_event(cache_key, data, start_time, event_id, process_event):
     )
 
 
+# The limits leave room for saving the event when ``store.fused-save-event``
+# is on, as ``save_event`` itself has no time limit. Without it this task
+# only checks whether the event needs processing.
 @instrumented_task(
     name='sentry.tasks.store.preprocess_event',
     queue='events.preprocess_event',
-    time_limit=65,
-    soft_time_limit=60,
+    time_limit=305,
+    soft_time_limit=300,
 )
 def preprocess_event(cache_key=None, data=None, start_time=None, event_id=None, **kwargs):
-    return _do_preprocess_event(cache_key, data, start_time, event_id, process_event)
+    return _do_preprocess_event(
+        cache_key, data, start_time, event_id, process_event,
+        fused=options.get('store.fused-save-event'),
+    )
 
 
 @instrumented_task(
@@ -344,11 +366,16 @@ def save_event(cache_key=None, data=None, start_time=None, event_id=None,
     """
     Saves an event to the database.
     """
+    return _do_save_event(cache_key, data, start_time, event_id, project_id)
+
+
+def _do_save_event(cache_key=None, data=None, start_time=None, event_id=None,
+                   project_id=None, pipeline='default'):
     from sentry.event_manager import HashDiscarded, EventManager
     from sentry import quotas, tsdb
     from sentry.models import ProjectKey
 
-    if cache_key:
+    if cache_key and data is None:
         data = default_cache.get(cache_key)
 
     if data is not None:
@@ -384,7 +411,8 @@ def save_event(cache_key=None, data=None, start_time=None, event_id=None,
     event = None
     try:
         manager = EventManager(data)
-        event = manager.save(project_id, assume_normalized=True)
+        with metrics.timer('events.store.stage', tags={'stage': 'save', 'pipeline': pipeline}):
+            event = manager.save(project_id, assume_normalized=True)
 
         # Always load attachments from the cache so we can later prune them.
         # Only save them if the event-attachments feature is active, though.
@@ -442,4 +470,5 @@ def save_event(cache_key=None, data=None, start_time=None, event_id=None,
             metrics.timing(
                 'events.time-to-process',
                 time() - start_time,
-                instance=data['platform'])
+                instance=data['platform'],
+                tags={'pipeline': pipeline})
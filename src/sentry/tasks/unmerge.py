@@ -187,6 +187,7 @@ def migrate_events(caches, project, source_id, destination_id,
             project_id=project.id,
             hash__in=fingerprints,
         ).update(group=destination_id)
+        GroupHash.uncache_many(project.id, fingerprints)
 
         # Create activity records for the source and destination group.
         Activity.objects.create(
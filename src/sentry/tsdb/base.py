@@ -100,6 +100,77 @@ class TSDBModel(Enum):
     servicehook_fired = 700
 
 
+class TSDBWriteBatch(object):
+    """
+    Collects counter, distinct counter and frequency table writes so that
+    they can be committed to the backend together:
+
+    >>> with tsdb.write_batch() as batch:
+    >>>     batch.incr_multi([(TimeSeriesModel.project, 1)])
+    >>>     batch.record_multi([(TimeSeriesModel.users_affected_by_project, 1, ('foo',))])
+
+    The batch is committed when the block exits without an exception, or
+    explicitly by calling ``commit``.
+    """
+
+    def __init__(self, tsdb):
+        self.tsdb = tsdb
+        # (model, key, timestamp, count, environment_id)
+        self.counters = []
+        # (model, key, values, timestamp, environment_id)
+        self.distinct_counters = []
+        # (model, request, timestamp, environment_id)
+        self.frequencies = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.commit()
+
+    def __len__(self):
+        return len(self.counters) + len(self.distinct_counters) + len(self.frequencies)
+
+    def incr_multi(self, items, timestamp=None, count=1, environment_id=None):
+        self.tsdb.validate_arguments([model for model, _ in items], [environment_id])
+
+        if timestamp is None:
+            timestamp = timezone.now()
+
+        for model, key in items:
+            self.counters.append((model, key, timestamp, count, environment_id))
+
+    def record_multi(self, items, timestamp=None, environment_id=None):
+        self.tsdb.validate_arguments([model for model, _, _ in items], [environment_id])
+
+        if timestamp is None:
+            timestamp = timezone.now()
+
+        for model, key, values in items:
+            self.distinct_counters.append((model, key, values, timestamp, environment_id))
+
+    def record_frequency_multi(self, requests, timestamp=None, environment_id=None):
+        self.tsdb.validate_arguments([model for model, _ in requests], [environment_id])
+
+        if timestamp is None:
+            timestamp = timezone.now()
+
+        for model, request in requests:
+            self.frequencies.append((model, request, timestamp, environment_id))
+
+    def commit(self):
+        if not len(self):
+            return
+
+        try:
+            self.tsdb.commit_write_batch(self)
+        finally:
+            self.counters = []
+            self.distinct_counters = []
+            self.frequencies = []
+
+
 class BaseTSDB(Service):
     __read_methods__ = frozenset([
         'get_range',
@@ -126,6 +197,7 @@ class BaseTSDB(Service):
         'merge_frequencies',
         'delete_frequencies',
         'flush',
+        'write_batch',
     ])
 
     __all__ = frozenset([
@@ -496,3 +568,25 @@ class BaseTSDB(Service):
         Delete all data.
         """
         raise NotImplementedError
+
+    def write_batch(self):
+        """
+        Return a ``TSDBWriteBatch`` that collects writes to this backend and
+        commits them together.
+        """
+        return TSDBWriteBatch(self)
+
+    def commit_write_batch(self, batch):
+        """
+        Apply all writes collected by a ``TSDBWriteBatch``. Backends that
+        can submit several writes at once should override this.
+        """
+        for model, key, timestamp, count, environment_id in batch.counters:
+            self.incr(model, key, timestamp, count, environment_id=environment_id)
+
+        for model, key, values, timestamp, environment_id in batch.distinct_counters:
+            self.record(model, key, values, timestamp, environment_id=environment_id)
+
+        for model, request, timestamp, environment_id in batch.frequencies:
+            self.record_frequency_multi([(model, request)], timestamp,
+                                        environment_id=environment_id)
@@ -716,6 +716,104 @@ class RedisTSDB(BaseTSDB):
                 if durable:
                     raise
 
+    def commit_write_batch(self, batch):
+        """
+        Apply all writes collected by a ``TSDBWriteBatch`` with a single
+        pipelined set of commands per cluster host. Writes to the same key
+        are coalesced: counter increments and frequency table scores are
+        summed, distinct counter values are merged, and each key is only
+        expired once.
+        """
+        # (cluster, durable) -> {hash key: {hash field: count}}
+        counters = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        # (cluster, durable) -> {routing key: {key: set(values)}}
+        distinct_counters = defaultdict(lambda: defaultdict(lambda: defaultdict(set)))
+        # (cluster, durable) -> {routing key: {tuple(keys): {item: score}}}
+        frequencies = defaultdict(lambda: defaultdict(lambda: defaultdict(
+            lambda: defaultdict(int))))
+        # (cluster, durable) -> {key: expiration}
+        expirations = defaultdict(dict)
+
+        def expire(cluster, key, expiry):
+            current = expirations[cluster].get(key)
+            if current is None or expiry > current:
+                expirations[cluster][key] = expiry
+
+        for model, key, timestamp, count, environment_id in batch.counters:
+            for cluster, environment_ids in self.get_cluster_groups(set([None, environment_id])):
+                for rollup, max_values in six.iteritems(self.rollups):
+                    expiry = self.calculate_expiry(rollup, max_values, timestamp)
+                    for environment_id in environment_ids:
+                        hash_key, hash_field = self.make_counter_key(
+                            model, rollup, timestamp, key, environment_id)
+                        counters[cluster][hash_key][hash_field] += count
+                        expire(cluster, hash_key, expiry)
+
+        for model, key, values, timestamp, environment_id in batch.distinct_counters:
+            ts = int(to_timestamp(timestamp))
+            for cluster, environment_ids in self.get_cluster_groups(set([None, environment_id])):
+                for rollup, max_values in six.iteritems(self.rollups):
+                    expiry = self.calculate_expiry(rollup, max_values, timestamp)
+                    for environment_id in environment_ids:
+                        k = self.make_key(model, rollup, ts, key, environment_id)
+                        distinct_counters[cluster][key][k].update(values)
+                        expire(cluster, k, expiry)
+
+        if self.enable_frequency_sketches:
+            for model, request, timestamp, environment_id in batch.frequencies:
+                ts = int(to_timestamp(timestamp))
+                for cluster, environment_ids in self.get_cluster_groups(
+                        set([None, environment_id])):
+                    for key, items in six.iteritems(request):
+                        keys = []
+                        for rollup, max_values in six.iteritems(self.rollups):
+                            expiry = self.calculate_expiry(rollup, max_values, timestamp)
+                            for environment_id in environment_ids:
+                                chunk = self.make_frequency_table_keys(
+                                    model, rollup, ts, key, environment_id)
+                                keys.extend(chunk)
+                                for k in chunk:
+                                    expire(cluster, k, expiry)
+
+                        scores = frequencies[cluster][key][tuple(keys)]
+                        for member, score in six.iteritems(items):
+                            scores[member] += score
+
+        clusters = set(counters) | set(distinct_counters) | set(frequencies)
+        for cluster, durable in clusters:
+            commands = defaultdict(list)
+            routed = {}
+
+            # Counters and their expirations are routed by the hash key,
+            # distinct counters and frequency tables by the model key.
+            for hash_key, fields in six.iteritems(counters[(cluster, durable)]):
+                for hash_field, count in six.iteritems(fields):
+                    commands[hash_key].append(('HINCRBY', hash_key, hash_field, count))
+                routed[hash_key] = hash_key
+
+            for key, values_by_key in six.iteritems(distinct_counters[(cluster, durable)]):
+                for k, values in six.iteritems(values_by_key):
+                    commands[key].append(('PFADD', k) + tuple(values))
+                    routed[k] = key
+
+            for key, requests in six.iteritems(frequencies[(cluster, durable)]):
+                for keys, scores in six.iteritems(requests):
+                    arguments = ['INCR'] + list(self.DEFAULT_SKETCH_PARAMETERS)
+                    for member, score in six.iteritems(scores):
+                        arguments.extend((score, member))
+                    commands[key].append((CountMinScript, list(keys), arguments))
+                    for k in keys:
+                        routed[k] = key
+
+            for k, expiry in six.iteritems(expirations[(cluster, durable)]):
+                commands[routed[k]].append(('EXPIREAT', k, expiry))
+
+            try:
+                cluster.execute_commands(commands)
+            except Exception:
+                if durable:
+                    raise
+
     def get_most_frequent(self, model, keys, start, end=None,
                           rollup=None, limit=None, environment_id=None):
         self.validate_arguments([model], [environment_id])
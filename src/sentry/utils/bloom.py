@@ -0,0 +1,79 @@
+"""
+sentry.utils.bloom
+~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2018 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import
+
+import struct
+import time
+
+from hashlib import md5
+
+from django.utils.encoding import force_bytes
+
+from sentry.utils.redis import load_script
+
+check_and_add = load_script('utils/bloom/check_and_add.lua')
+
+
+class WindowedBloomFilter(object):
+    """
+    A bloom filter of the items seen during the last ``windows`` time windows
+    of ``window`` seconds each, stored in Redis.
+
+    The items are spread over ``shards`` separate filters so that the filters
+    can be distributed over a Redis cluster. Every filter takes up to ``size
+    / (windows * shards)`` bytes, so ``size`` is the memory budget of all of
+    the filters combined. The filter size is part of the key, so changing
+    the budget starts with empty filters.
+
+    A lookup never returns a false negative for items that were added within
+    the retained windows. The rate of false positives depends on the number
+    of items added per window and shard relative to the filter size.
+    """
+
+    def __init__(self, cluster, namespace, size, windows=24, window=3600, shards=16,
+                 hashes=5):
+        self.cluster = cluster
+        self.namespace = namespace
+        self.windows = windows
+        self.window = window
+        self.shards = shards
+        self.hashes = hashes
+        self.bits = max(size * 8 // (windows * shards), 1)
+
+    def _get_offsets(self, value):
+        # Uses double hashing to derive all of the offsets from a single
+        # digest (Kirsch & Mitzenmacher, "Less Hashing, Same Performance".)
+        a, b = struct.unpack('<QQ', md5(force_bytes(value)).digest())
+        return a % self.shards, [(a + i * b) % self.bits for i in range(self.hashes)]
+
+    def _get_keys(self, shard, timestamp):
+        current = int(timestamp // self.window)
+        return [
+            u'{}:{}:{}:{}'.format(self.namespace, self.bits, shard, window)
+            for window in range(current, current - self.windows, -1)
+        ]
+
+    def check_and_add(self, value, timestamp=None):
+        """
+        Adds ``value`` to the filter, returning whether it was (probably)
+        added before.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        shard, offsets = self._get_offsets(value)
+        keys = self._get_keys(shard, timestamp)
+        return bool(
+            check_and_add(
+                self.cluster.get_local_client_for_key(
+                    u'{}:{}'.format(self.namespace, shard),
+                ),
+                keys,
+                [self.windows * self.window] + offsets,
+            )
+        )
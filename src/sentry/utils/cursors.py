@@ -50,12 +50,13 @@ class Cursor(object):
 
 
 class CursorResult(Sequence):
-    def __init__(self, results, next, prev, hits=None, max_hits=None):
+    def __init__(self, results, next, prev, hits=None, max_hits=None, hits_strategy=None):
         self.results = results
         self.next = next
         self.prev = prev
         self.hits = hits
         self.max_hits = max_hits
+        self.hits_strategy = hits_strategy
 
     def __len__(self):
         return len(self.results)
@@ -199,7 +200,7 @@ def _build_prev_values(cursor, results, key, limit, is_desc):
 
 
 def build_cursor(results, key, limit=100, is_desc=False, cursor=None, hits=None,
-        max_hits=None, on_results=None):
+        max_hits=None, on_results=None, hits_strategy=None):
     if cursor is None:
         cursor = Cursor(0, 0, 0)
 
@@ -243,4 +244,5 @@ def build_cursor(results, key, limit=100, is_desc=False, cursor=None, hits=None,
         prev=prev_cursor,
         hits=hits,
         max_hits=max_hits,
+        hits_strategy=hits_strategy,
     )
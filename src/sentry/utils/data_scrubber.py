@@ -15,32 +15,116 @@ from sentry.constants import DEFAULT_SCRUBBED_FIELDS, FILTER_MASK, NOT_SCRUBBED_
 from sentry.utils.safe import get_path
 
 
+# Kinds of containers visited by ``varmap``
+DICT, MAPPING, SEQUENCE = range(3)
+
+# Maximum number of compiled field patterns kept in process memory
+FIELDS_RE_CACHE_SIZE = 1000
+
+_fields_re_cache = {}
+
+
+def _get_container_kind(var):
+    if isinstance(var, dict):
+        return DICT
+    if isinstance(var, (list, tuple)):
+        # treat it like a mapping
+        if all(isinstance(v, (list, tuple)) and len(v) == 2 for v in var):
+            return MAPPING
+        return SEQUENCE
+    return None
+
+
+def _rebuild(var, kind, items, results):
+    """
+    Returns a container holding ``results`` in place of the values of
+    ``var``. The original container is reused if no value changed.
+    """
+    if all(r is v for (_, v), r in zip(items, results)):
+        return var
+    if kind == DICT:
+        return dict((k, r) for (k, _), r in zip(items, results))
+    if kind == MAPPING:
+        return [[k, r] for (k, _), r in zip(items, results)]
+    return list(results)
+
+
 def varmap(func, var, context=None, name=None):
     """
     Executes ``func(key_name, value)`` on all values
     recurisively discovering dict and list scoped
     values.
+
+    The traversal keeps its own stack rather than recursing, and a
+    container is only copied if ``func`` changed one of its values.
     """
     if context is None:
         context = set()
 
-    objid = id(var)
-    if objid in context:
-        return func(name, '<...>')
-    context.add(objid)
+    # Each frame is a container being visited along with its kind, its
+    # (name, value) children and the results for the children seen so far.
+    stack = []
+    key, value = name, var
+    while True:
+        kind = _get_container_kind(value)
+        if kind is None:
+            result = func(key, value)
+        elif id(value) in context:
+            result = func(key, '<...>')
+        else:
+            if kind == DICT:
+                items = list(six.iteritems(value))
+            elif kind == MAPPING:
+                items = [(k, v) for k, v in value]
+            else:
+                items = [(key, v) for v in value]
 
-    if isinstance(var, dict):
-        ret = dict((k, varmap(func, v, context, k)) for k, v in six.iteritems(var))
-    elif isinstance(var, (list, tuple)):
-        # treat it like a mapping
-        if all(isinstance(v, (list, tuple)) and len(v) == 2 for v in var):
-            ret = [[k, varmap(func, v, context, k)] for k, v in var]
+            if items:
+                context.add(id(value))
+                stack.append((value, kind, items, []))
+                key, value = items[0]
+                continue
+            result = value
+
+        # Hand the result to the parent container, finishing every
+        # container whose children have all been visited.
+        while stack:
+            container, kind, items, results = stack[-1]
+            results.append(result)
+            if len(results) < len(items):
+                key, value = items[len(results)]
+                break
+            stack.pop()
+            context.remove(id(container))
+            result = _rebuild(container, kind, items, results)
         else:
-            ret = [varmap(func, f, context, name) for f in var]
+            return result
+
+
+def get_fields_re(fields):
+    """
+    Compiles a set of lowercased field names into a single expression that
+    finds any of them as a substring. Patterns are cached per field set.
+    """
+    key = frozenset(fields)
+    try:
+        return _fields_re_cache[key]
+    except KeyError:
+        pass
+
+    if key:
+        # Longer fields first, so the alternation prefers the most specific
+        # name; any match is sufficient to scrub a value.
+        fields_re = re.compile(u'|'.join(
+            re.escape(f) for f in sorted(key, key=lambda f: (-len(f), f))
+        ))
     else:
-        ret = func(name, var)
-    context.remove(objid)
-    return ret
+        fields_re = None
+
+    if len(_fields_re_cache) >= FIELDS_RE_CACHE_SIZE:
+        _fields_re_cache.clear()
+    _fields_re_cache[key] = fields_re
+    return fields_re
 
 
 class SensitiveDataFilter(object):
@@ -72,6 +156,7 @@ class SensitiveDataFilter(object):
             fields += DEFAULT_SCRUBBED_FIELDS
         self.exclude_fields = {f.lower() for f in exclude_fields}
         self.fields = set(fields)
+        self.fields_re = get_fields_re(self.fields)
 
     def apply(self, data):
         # TODO(dcramer): move this into each interface
@@ -130,11 +215,12 @@ class SensitiveDataFilter(object):
         else:
             str_value = ''
 
-        for field in self.fields:
-            if field in str_value:
-                return FILTER_MASK
-            if field in key and value not in NOT_SCRUBBED_VALUES:
-                return FILTER_MASK
+        if self.fields_re is None:
+            return value
+        if str_value and self.fields_re.search(str_value):
+            return FILTER_MASK
+        if key and self.fields_re.search(key) and value not in NOT_SCRUBBED_VALUES:
+            return FILTER_MASK
         return value
 
     def filter_stacktrace(self, data):
@@ -37,6 +37,16 @@ def is_sqlite(alias='default'):
     return 'sqlite' in engine
 
 
+def supports_insert_on_conflict(alias=DEFAULT_DB_ALIAS):
+    """
+    Returns whether the database supports ``INSERT ... ON CONFLICT`` (which
+    was added in Postgres 9.5.)
+    """
+    connection = connections[alias]
+    return connection.vendor == 'postgresql' and \
+        getattr(connection, 'pg_version', 0) >= 90500
+
+
 def has_charts(db):
     if is_sqlite(db):
         return False
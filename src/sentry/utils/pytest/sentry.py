@@ -100,6 +100,9 @@ def pytest_configure(config):
     # enable draft features
     settings.SENTRY_OPTIONS['mail.enable-replies'] = True
 
+    # tests change retention between queries, don't memoize it
+    settings.SENTRY_OPTIONS['snuba.retention-cache-ttl'] = 0
+
     settings.SENTRY_ALLOW_ORIGIN = '*'
 
     settings.SENTRY_TSDB = 'sentry.tsdb.inmemory.InMemoryTSDB'
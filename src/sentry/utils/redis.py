@@ -5,6 +5,7 @@ import logging
 import posixpath
 import six
 
+from hashlib import sha1
 from threading import Lock
 
 import rb
@@ -219,6 +220,12 @@ def check_cluster_versions(cluster, required, recommended=None, label=None):
 def load_script(path):
     script = Script(None, resource_string('sentry', posixpath.join('scripts', path)))
 
+    # Compute the script hash up front rather than when the script is first
+    # loaded, so that the script can also be queued in a pipeline (which
+    # loads any missing scripts before the queued commands are executed.)
+    if not script.sha:
+        script.sha = sha1(script.script).hexdigest()
+
     # This changes the argument order of the ``Script.__call__`` method to
     # encourage using the script with a specific Redis client, rather
     # than implicitly using the first client that the script was registered
@@ -1,9 +1,12 @@
 from __future__ import absolute_import
 
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from dateutil.parser import parse as parse_datetime
+import copy
+import logging
 import pytz
 import re
 import six
@@ -12,13 +15,19 @@ import urllib3
 
 from django.conf import settings
 
-from sentry import quotas
+from sentry import options, quotas
+from sentry.app import locks
+from sentry.cache import default_cache
 from sentry.models import (
     Environment, Group, GroupRelease,
     Organization, Project, Release, ReleaseProject
 )
 from sentry.utils import metrics, json
 from sentry.utils.dates import to_timestamp
+from sentry.utils.hashlib import md5_text
+from sentry.utils.locking import UnableToAcquireLock
+
+logger = logging.getLogger(__name__)
 
 # TODO remove this when Snuba accepts more than 500 issues
 MAX_ISSUES = 500
@@ -164,13 +173,48 @@ def connection_from_url(url, **kw):
     return urllib3.connectionpool.connection_from_url(url, **kw)
 
 
+# Upper bound for the number of queries ``bulk_raw_query`` sends at once
+# across all callers in the process. The connection pool is sized to keep a
+# connection for each of them as well as for the requests made directly.
+MAX_CONCURRENT_QUERIES = 10
+
 _snuba_pool = connection_from_url(
     settings.SENTRY_SNUBA,
     retries=False,
     timeout=30,
-    maxsize=10,
+    maxsize=MAX_CONCURRENT_QUERIES * 2,
 )
 
+_query_thread_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_QUERIES)
+
+PROJECT_ORGANIZATION_TTL = 60
+
+# How long a process may hold the lock for populating a cached result, and
+# how long the other processes wait for it before querying snuba themselves.
+RESULT_LOCK_DURATION = 30
+RESULT_LOCK_WAIT = 2
+RESULT_LOCK_POLL_INTERVAL = 0.05
+MAX_MEMOIZED_ITEMS = 10000
+
+_project_organization_cache = {}
+_retention_cache = {}
+
+
+def _memoize(cache, key, ttl, func):
+    if ttl <= 0:
+        return func()
+
+    now = time.time()
+    item = cache.get(key)
+    if item is not None and item[0] > now:
+        return item[1]
+
+    value = func()
+    if len(cache) >= MAX_MEMOIZED_ITEMS:
+        cache.clear()
+    cache[key] = (now + ttl, value)
+    return value
+
 
 def get_snuba_column_name(name):
     """
@@ -266,27 +310,34 @@ def transform_aliases_and_query(**kwargs):
     return result
 
 
-def raw_query(start, end, groupby=None, conditions=None, filter_keys=None,
-              aggregations=None, rollup=None, arrayjoin=None, limit=None, offset=None,
-              orderby=None, having=None, referrer=None, is_grouprelease=False,
-              selected_columns=None, totals=None, limitby=None, turbo=False):
+def get_query_retention(project_id):
     """
-    Sends a query to snuba.
+    Returns the event retention in days of the organization owning the
+    project, or ``None`` if retention is unlimited.
 
-    `conditions`: A list of (column, operator, literal) conditions to be passed
-    to the query. Conditions that we know will not have to be translated should
-    be passed this way (eg tag[foo] = bar).
+    The organization of every project is memoized in process for
+    ``PROJECT_ORGANIZATION_TTL`` seconds. The retention itself is memoized
+    for ``snuba.retention-cache-ttl`` seconds, so changes to an
+    organization's quota can take that long to apply to queries.
+    """
+    organization_id = _memoize(
+        _project_organization_cache, project_id, PROJECT_ORGANIZATION_TTL,
+        lambda: Project.objects.filter(pk=project_id).values_list(
+            'organization_id', flat=True).get(),
+    )
+    return _memoize(
+        _retention_cache, organization_id, options.get('snuba.retention-cache-ttl'),
+        lambda: quotas.get_event_retention(organization=Organization(organization_id)),
+    )
 
-    `filter_keys`: A dictionary of {col: [key, ...]} that will be converted
-    into "col IN (key, ...)" conditions. These are used to restrict the query to
-    known sets of project/issue/environment/release etc. Appropriate
-    translations (eg. from environment model ID to environment name) are
-    performed on the query, and the inverse translation performed on the
-    result. The project_id(s) to restrict the query to will also be
-    automatically inferred from these keys.
 
-    `aggregations` a list of (aggregation_function, column, alias) tuples to be
-    passed to the query.
+def _prepare_query(start, end, groupby=None, conditions=None, filter_keys=None,
+                   aggregations=None, rollup=None, arrayjoin=None, limit=None, offset=None,
+                   orderby=None, having=None, referrer=None, is_grouprelease=False,
+                   selected_columns=None, totals=None, limitby=None, turbo=False):
+    """
+    Builds the snuba request body for the ``raw_query`` arguments. Returns
+    the request and the function translating result rows back to model ids.
     """
 
     # convert to naive UTC datetimes, as Snuba only deals in UTC
@@ -327,10 +378,7 @@ def raw_query(start, end, groupby=None, conditions=None, filter_keys=None,
             "No project_id filter, or none could be inferred from other filters.")
 
     # any project will do, as they should all be from the same organization
-    project = Project.objects.get(pk=project_ids[0])
-    retention = quotas.get_event_retention(
-        organization=Organization(project.organization_id)
-    )
+    retention = get_query_retention(project_ids[0])
     if retention:
         start = max(start, datetime.utcnow() - timedelta(days=retention))
         if start > end:
@@ -363,17 +411,27 @@ def raw_query(start, end, groupby=None, conditions=None, filter_keys=None,
         'turbo': turbo
     }) if v is not None}
 
+    return request, reverse
+
+
+def _send_query(body, referrer=None, timeout=None):
     headers = {}
     if referrer:
         headers['referer'] = referrer
 
+    kwargs = {}
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+
     try:
         with timer('snuba_query'):
-            response = _snuba_pool.urlopen(
-                'POST', '/query', body=json.dumps(request), headers=headers)
+            return _snuba_pool.urlopen(
+                'POST', '/query', body=body, headers=headers, **kwargs)
     except urllib3.exceptions.HTTPError as err:
         raise SnubaError(err)
 
+
+def _parse_response(response):
     try:
         body = json.loads(response.data)
     except ValueError:
@@ -398,11 +456,152 @@ def raw_query(start, end, groupby=None, conditions=None, filter_keys=None,
         else:
             raise SnubaError(u'HTTP {}'.format(response.status))
 
+    return body
+
+
+def _get_result_cache_key(request):
+    # Round the time window to the rollup, so that polls of the same
+    # relative window share the cached result until it expires.
+    granularity = request.get('granularity') or 60
+    key = dict(request)
+    for name in ('from_date', 'to_date'):
+        timestamp = int(to_timestamp(parse_datetime(key[name]).replace(tzinfo=pytz.utc)))
+        key[name] = timestamp - timestamp % granularity
+    return u'snuba:result:{}'.format(
+        md5_text(json.dumps(sorted(six.iteritems(key)))).hexdigest(),
+    )
+
+
+def _execute_query(request, referrer=None, timeout=None, cache_ttl=0):
+    """
+    Sends the request to snuba and returns the decoded response body. With
+    a ``cache_ttl`` the result is read through ``default_cache``, and only
+    one process at a time sends a request that is not cached yet.
+    """
+    if not cache_ttl:
+        return _parse_response(_send_query(json.dumps(request), referrer, timeout))
+
+    metric_tags = {'referrer': referrer or 'unknown'}
+    cache_key = _get_result_cache_key(request)
+    body = default_cache.get(cache_key)
+    if body is not None:
+        metrics.incr('snuba.client.cache', tags=dict(metric_tags, result='hit'))
+        return body
+
+    lock = locks.get(u'{}:lock'.format(cache_key), duration=RESULT_LOCK_DURATION)
+    try:
+        releaser = lock.acquire()
+    except UnableToAcquireLock:
+        # Somebody else is running the same query, give them a chance to
+        # populate the cache before querying snuba ourselves.
+        deadline = time.time() + RESULT_LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(RESULT_LOCK_POLL_INTERVAL)
+            body = default_cache.get(cache_key)
+            if body is not None:
+                metrics.incr('snuba.client.cache', tags=dict(metric_tags, result='wait'))
+                return body
+
+        metrics.incr('snuba.client.cache', tags=dict(metric_tags, result='timeout'))
+        return _parse_response(_send_query(json.dumps(request), referrer, timeout))
+
+    with releaser:
+        metrics.incr('snuba.client.cache', tags=dict(metric_tags, result='miss'))
+        body = _parse_response(_send_query(json.dumps(request), referrer, timeout))
+        try:
+            default_cache.set(cache_key, body, cache_ttl)
+        except Exception:
+            # The query itself succeeded, so only the caching is skipped
+            # (for instance because the result is too large.)
+            logger.warning('snuba.result-cache.set-failed', exc_info=True, extra={
+                'referrer': referrer,
+            })
+        return body
+
+
+def _translate_result(body, reverse):
     # Forward and reverse translation maps from model ids to snuba keys, per column
     body['data'] = [reverse(d) for d in body['data']]
     return body
 
 
+def raw_query(start, end, groupby=None, conditions=None, filter_keys=None,
+              aggregations=None, rollup=None, arrayjoin=None, limit=None, offset=None,
+              orderby=None, having=None, referrer=None, is_grouprelease=False,
+              selected_columns=None, totals=None, limitby=None, turbo=False):
+    """
+    Sends a query to snuba.
+
+    `conditions`: A list of (column, operator, literal) conditions to be passed
+    to the query. Conditions that we know will not have to be translated should
+    be passed this way (eg tag[foo] = bar).
+
+    `filter_keys`: A dictionary of {col: [key, ...]} that will be converted
+    into "col IN (key, ...)" conditions. These are used to restrict the query to
+    known sets of project/issue/environment/release etc. Appropriate
+    translations (eg. from environment model ID to environment name) are
+    performed on the query, and the inverse translation performed on the
+    result. The project_id(s) to restrict the query to will also be
+    automatically inferred from these keys.
+
+    `aggregations` a list of (aggregation_function, column, alias) tuples to be
+    passed to the query.
+    """
+    request, reverse = _prepare_query(
+        start, end, groupby=groupby, conditions=conditions, filter_keys=filter_keys,
+        aggregations=aggregations, rollup=rollup, arrayjoin=arrayjoin, limit=limit,
+        offset=offset, orderby=orderby, having=having, is_grouprelease=is_grouprelease,
+        selected_columns=selected_columns, totals=totals, limitby=limitby, turbo=turbo,
+    )
+    body = _execute_query(
+        request, referrer=referrer, cache_ttl=options.get('snuba.result-cache-ttl'),
+    )
+    return _translate_result(body, reverse)
+
+
+def bulk_raw_query(snuba_param_list, referrer=None, timeout=None):
+    """
+    Sends several queries to snuba at the same time. Every item of
+    ``snuba_param_list`` is a dictionary of ``raw_query`` keyword arguments,
+    and the results are returned in the same order. Identical queries are
+    only sent once, and ``timeout`` (in seconds) applies to each request.
+
+    Errors are raised in the same way as for ``raw_query``, for the first
+    query in the list that failed.
+    """
+    cache_ttl = options.get('snuba.result-cache-ttl')
+
+    prepared = []
+    futures = {}
+    for snuba_params in snuba_param_list:
+        snuba_params = dict(snuba_params)
+        query_referrer = snuba_params.pop('referrer', None) or referrer
+        request, reverse = _prepare_query(**snuba_params)
+        key = (json.dumps(request), query_referrer)
+        if key not in futures:
+            futures[key] = _query_thread_pool.submit(
+                _execute_query, request, referrer=query_referrer, timeout=timeout,
+                cache_ttl=cache_ttl,
+            )
+        prepared.append((key, reverse))
+
+    metrics.timing('snuba.client.bulk.size', len(prepared))
+    metrics.incr('snuba.client.bulk.deduplicated', len(prepared) - len(futures))
+
+    results = []
+    seen = set()
+    with timer('bulk_snuba_query'):
+        for key, reverse in prepared:
+            body = futures[key].result()
+            # The translation modifies the rows in place, so every duplicate
+            # query gets its own copy of the shared response.
+            if key in seen:
+                body = copy.deepcopy(body)
+            seen.add(key)
+            results.append(_translate_result(body, reverse))
+    return results
+
+
 def query(start, end, groupby, conditions=None, filter_keys=None,
           aggregations=None, rollup=None, arrayjoin=None, limit=None, offset=None,
           orderby=None, having=None, referrer=None, is_grouprelease=False,
@@ -11,6 +11,7 @@ import six
 import traceback
 import uuid
 
+from collections import defaultdict
 from time import time
 
 from django.conf import settings
@@ -31,7 +32,7 @@ from symbolic import ProcessMinidumpError, Unreal4Error
 from sentry import features, quotas, tsdb, options
 from sentry.attachments import CachedAttachment
 from sentry.coreapi import (
-    Auth, APIError, APIForbidden, APIRateLimited, ClientApiHelper, SecurityApiHelper, MinidumpApiHelper, safely_load_json_string, logger as api_logger
+    Auth, APIError, APIForbidden, APIRateLimited, ClientApiHelper, SecurityApiHelper, MinidumpApiHelper, decode_payload, safely_load_json_string, logger as api_logger
 )
 from sentry.event_manager import EventManager
 from sentry.interfaces import schemas
@@ -370,6 +371,70 @@ class StoreView(APIView):
         """Mutate the given EventManager. Hook for subtypes of StoreView (CSP)"""
         pass
 
+    def _get_received_increments(self, project, key):
+        return [
+            (tsdb.models.project_total_received, project.id),
+            (tsdb.models.organization_total_received,
+             project.organization_id),
+            (tsdb.models.key_total_received, key.id),
+        ]
+
+    def _get_rejected_increments(self, project, key):
+        return self._get_received_increments(project, key) + [
+            (tsdb.models.project_total_rejected, project.id),
+            (tsdb.models.organization_total_rejected,
+             project.organization_id),
+            (tsdb.models.key_total_rejected, key.id),
+        ]
+
+    def _get_filtered_increments(self, project, key, filter_reason):
+        increment_list = self._get_received_increments(project, key) + [
+            (tsdb.models.project_total_blacklisted, project.id),
+            (tsdb.models.organization_total_blacklisted,
+             project.organization_id),
+            (tsdb.models.key_total_blacklisted, key.id),
+        ]
+        try:
+            increment_list.append(
+                (FILTER_STAT_KEYS_TO_VALUES[filter_reason], project.id))
+        # should error when filter_reason does not match a key in FILTER_STAT_KEYS_TO_VALUES
+        except KeyError:
+            pass
+        return increment_list
+
+    def _scrub_data(self, data, project, helper, org_options):
+        scrub_ip_address = (org_options.get('sentry:require_scrub_ip_address', False) or
+                            project.get_option('sentry:scrub_ip_address', False))
+        scrub_data = (org_options.get('sentry:require_scrub_data', False) or
+                      project.get_option('sentry:scrub_data', True))
+
+        if scrub_data:
+            # We filter data immediately before it ever gets into the queue
+            sensitive_fields_key = 'sentry:sensitive_fields'
+            sensitive_fields = (
+                org_options.get(sensitive_fields_key, []) +
+                project.get_option(sensitive_fields_key, [])
+            )
+
+            exclude_fields_key = 'sentry:safe_fields'
+            exclude_fields = (
+                org_options.get(exclude_fields_key, []) +
+                project.get_option(exclude_fields_key, [])
+            )
+
+            scrub_defaults = (org_options.get('sentry:require_scrub_defaults', False) or
+                              project.get_option('sentry:scrub_defaults', True))
+
+            SensitiveDataFilter(
+                fields=sensitive_fields,
+                include_defaults=scrub_defaults,
+                exclude_fields=exclude_fields,
+            ).apply(data)
+
+        if scrub_ip_address:
+            # We filter data immediately before it ever gets into the queue
+            helper.ensure_does_not_have_ip(data)
+
     def process(self, request, project, key, auth, helper, data, attachments=None, **kwargs):
         metrics.incr('events.total')
 
@@ -399,25 +464,8 @@ class StoreView(APIView):
         tsdb_start_time = to_datetime(start_time)
         should_filter, filter_reason = event_mgr.should_filter()
         if should_filter:
-            increment_list = [
-                (tsdb.models.project_total_received, project.id),
-                (tsdb.models.project_total_blacklisted, project.id),
-                (tsdb.models.organization_total_received,
-                 project.organization_id),
-                (tsdb.models.organization_total_blacklisted,
-                 project.organization_id),
-                (tsdb.models.key_total_received, key.id),
-                (tsdb.models.key_total_blacklisted, key.id),
-            ]
-            try:
-                increment_list.append(
-                    (FILTER_STAT_KEYS_TO_VALUES[filter_reason], project.id))
-            # should error when filter_reason does not match a key in FILTER_STAT_KEYS_TO_VALUES
-            except KeyError:
-                pass
-
             tsdb.incr_multi(
-                increment_list,
+                self._get_filtered_increments(project, key, filter_reason),
                 timestamp=tsdb_start_time,
             )
 
@@ -443,16 +491,7 @@ class StoreView(APIView):
             if rate_limit is None:
                 api_logger.debug('Dropped event due to error with rate limiter')
             tsdb.incr_multi(
-                [
-                    (tsdb.models.project_total_received, project.id),
-                    (tsdb.models.project_total_rejected, project.id),
-                    (tsdb.models.organization_total_received,
-                     project.organization_id),
-                    (tsdb.models.organization_total_rejected,
-                     project.organization_id),
-                    (tsdb.models.key_total_received, key.id),
-                    (tsdb.models.key_total_rejected, key.id),
-                ],
+                self._get_rejected_increments(project, key),
                 timestamp=tsdb_start_time,
             )
             metrics.incr(
@@ -471,12 +510,7 @@ class StoreView(APIView):
                 raise APIRateLimited(rate_limit.retry_after)
         else:
             tsdb.incr_multi(
-                [
-                    (tsdb.models.project_total_received, project.id),
-                    (tsdb.models.organization_total_received,
-                     project.organization_id),
-                    (tsdb.models.key_total_received, key.id),
-                ],
+                self._get_received_increments(project, key),
                 timestamp=tsdb_start_time,
             )
 
@@ -496,37 +530,7 @@ class StoreView(APIView):
             raise APIForbidden(
                 'An event with the same ID already exists (%s)' % (event_id, ))
 
-        scrub_ip_address = (org_options.get('sentry:require_scrub_ip_address', False) or
-                            project.get_option('sentry:scrub_ip_address', False))
-        scrub_data = (org_options.get('sentry:require_scrub_data', False) or
-                      project.get_option('sentry:scrub_data', True))
-
-        if scrub_data:
-            # We filter data immediately before it ever gets into the queue
-            sensitive_fields_key = 'sentry:sensitive_fields'
-            sensitive_fields = (
-                org_options.get(sensitive_fields_key, []) +
-                project.get_option(sensitive_fields_key, [])
-            )
-
-            exclude_fields_key = 'sentry:safe_fields'
-            exclude_fields = (
-                org_options.get(exclude_fields_key, []) +
-                project.get_option(exclude_fields_key, [])
-            )
-
-            scrub_defaults = (org_options.get('sentry:require_scrub_defaults', False) or
-                              project.get_option('sentry:scrub_defaults', True))
-
-            SensitiveDataFilter(
-                fields=sensitive_fields,
-                include_defaults=scrub_defaults,
-                exclude_fields=exclude_fields,
-            ).apply(data)
-
-        if scrub_ip_address:
-            # We filter data immediately before it ever gets into the queue
-            helper.ensure_does_not_have_ip(data)
+        self._scrub_data(data, project, helper, org_options)
 
         # mutates data (strips a lot of context if not queued)
         helper.insert_data_to_database(data, start_time=start_time, attachments=attachments)
@@ -545,6 +549,227 @@ class StoreView(APIView):
         return event_id
 
 
+class StoreBatchView(StoreView):
+    """
+    Accepts several events for the same project in a single request.
+
+    The body is a JSON object of the form ``{"events": [...]}`` and may use
+    the same content encodings as the store endpoint. Every event is
+    normalized and filtered individually, while the quota check, the
+    duplicate check and the hand-off to the processing queue run once for
+    the whole batch. The response lists the outcome for each event in
+    submission order::
+
+        {"events": [{"id": "..."}, {"id": "...", "error": "...", "error_name": "..."}]}
+    """
+    http_method_names = ['post', 'options']
+
+    def post(self, request, project, key, auth, helper, **kwargs):
+        try:
+            data = request.body
+        except Exception as e:
+            logger.exception(e)
+            data = None
+
+        if not data:
+            raise APIError('No JSON data was found')
+
+        payload = decode_payload(
+            data,
+            content_encoding=request.META.get('HTTP_CONTENT_ENCODING', ''),
+        )
+        del data
+
+        events = payload.get('events')
+        if not isinstance(events, list) or not events:
+            raise APIError('No events were found in the batch')
+
+        max_events = options.get('store.batch-max-events')
+        if len(events) > max_events:
+            raise APIError('Batch exceeds the maximum of %d events' % (max_events, ))
+
+        metrics.timing('events.batch.size', len(events))
+
+        results = self.process_batch(
+            request, project=project, key=key, auth=auth, helper=helper, events=events,
+        )
+        return HttpResponse(
+            json.dumps({
+                'events': results,
+            }), content_type='application/json'
+        )
+
+    def _get_batch_error(self, event_id, error):
+        result = {
+            'id': event_id,
+            'error': force_bytes(error.msg, errors='replace'),
+        }
+        if error.name:
+            result['error_name'] = error.name
+        if isinstance(error, APIRateLimited) and error.retry_after is not None:
+            result['retry_after'] = int(math.ceil(error.retry_after))
+        return result
+
+    def process_batch(self, request, project, key, auth, helper, events):
+        remote_addr = request.META['REMOTE_ADDR']
+        start_time = time()
+        tsdb_start_time = to_datetime(start_time)
+
+        results = [None] * len(events)
+        increments = defaultdict(int)
+        pending = []
+
+        for index, event in enumerate(events):
+            metrics.incr('events.total')
+
+            if not isinstance(event, dict):
+                results[index] = self._get_batch_error(
+                    None, APIError('Invalid event payload'))
+                continue
+
+            try:
+                event_mgr = EventManager(
+                    event,
+                    project=project,
+                    key=key,
+                    auth=auth,
+                    client_ip=remote_addr,
+                    user_agent=helper.context.agent,
+                    version=auth.version,
+                )
+                self.pre_normalize(event_mgr, helper)
+                event_mgr.normalize()
+            except APIError as e:
+                results[index] = self._get_batch_error(event.get('event_id'), e)
+                continue
+
+            event_received.send_robust(ip=remote_addr, project=project, sender=type(self))
+
+            should_filter, filter_reason = event_mgr.should_filter()
+            data = event_mgr.get_data()
+            del event_mgr
+
+            if should_filter:
+                for item in self._get_filtered_increments(project, key, filter_reason):
+                    increments[item] += 1
+                metrics.incr('events.blacklisted', tags={
+                             'reason': filter_reason})
+                event_filtered.send_robust(
+                    ip=remote_addr,
+                    project=project,
+                    sender=type(self),
+                )
+                results[index] = self._get_batch_error(
+                    data['event_id'],
+                    APIForbidden('Event dropped due to filter: %s' % (filter_reason,)),
+                )
+                continue
+
+            pending.append((index, data))
+
+        # A single pipelined quota check covers every event that made it
+        # through the filters.
+        rate_limits = safe_execute(
+            quotas.is_rate_limited_batch,
+            project=project,
+            key=key,
+            count=len(pending),
+            _with_transaction=False,
+        ) if pending else []
+
+        # XXX(dcramer): when the rate limiter fails we drop events to ensure
+        # it cannot cascade
+        if rate_limits is None:
+            api_logger.debug('Dropped event batch due to error with rate limiter')
+            rate_limits = [None] * len(pending)
+
+        accepted = []
+        for (index, data), rate_limit in zip(pending, rate_limits):
+            if isinstance(rate_limit, bool):
+                rate_limit = RateLimit(is_limited=rate_limit, retry_after=None)
+
+            if rate_limit is None or rate_limit.is_limited:
+                for item in self._get_rejected_increments(project, key):
+                    increments[item] += 1
+                metrics.incr(
+                    'events.dropped',
+                    tags={
+                        'reason': rate_limit.reason_code if rate_limit else 'unknown',
+                    }
+                )
+                event_dropped.send_robust(
+                    ip=remote_addr,
+                    project=project,
+                    sender=type(self),
+                    reason_code=rate_limit.reason_code if rate_limit else None,
+                )
+                if rate_limit is None:
+                    error = APIError('Event dropped due to error with rate limiter')
+                else:
+                    error = APIRateLimited(rate_limit.retry_after)
+                results[index] = self._get_batch_error(data['event_id'], error)
+                continue
+
+            for item in self._get_received_increments(project, key):
+                increments[item] += 1
+            accepted.append((index, data))
+
+        # ``incr_multi`` applies a single count to all of its items, so
+        # counters are grouped by the amount they need to be bumped by.
+        increments_by_count = defaultdict(list)
+        for item, count in six.iteritems(increments):
+            increments_by_count[count].append(item)
+        for count, items in six.iteritems(increments_by_count):
+            tsdb.incr_multi(items, timestamp=tsdb_start_time, count=count)
+
+        if not accepted:
+            return results
+
+        # TODO(dcramer): ideally we'd only validate this if the event_id was
+        # supplied by the user
+        cache_keys = {
+            index: 'ev:%s:%s' % (project.id, data['event_id'], )
+            for index, data in accepted
+        }
+        duplicates = cache.get_many(cache_keys.values())
+
+        org_options = OrganizationOption.objects.get_all_values(
+            project.organization_id)
+
+        to_insert = []
+        seen_keys = set()
+        for index, data in accepted:
+            cache_key = cache_keys[index]
+            if cache_key in duplicates or cache_key in seen_keys:
+                results[index] = self._get_batch_error(
+                    data['event_id'],
+                    APIForbidden(
+                        'An event with the same ID already exists (%s)' % (data['event_id'], )),
+                )
+                continue
+            seen_keys.add(cache_key)
+
+            self._scrub_data(data, project, helper, org_options)
+            to_insert.append(data)
+            results[index] = {'id': data['event_id']}
+
+        # mutates data (strips a lot of context if not queued)
+        helper.insert_data_to_database_batch(to_insert, start_time=start_time)
+
+        cache.set_many({k: '' for k in seen_keys}, 60 * 5)
+
+        for data in to_insert:
+            api_logger.debug('New event received (%s)', data['event_id'])
+            event_accepted.send_robust(
+                ip=remote_addr,
+                data=data,
+                project=project,
+                sender=type(self),
+            )
+
+        return results
+
+
 class MinidumpView(StoreView):
     helper_cls = MinidumpApiHelper
     content_types = ('multipart/form-data', )
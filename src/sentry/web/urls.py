@@ -103,6 +103,11 @@ urlpatterns += patterns(
         api.StoreView.as_view(),
         name='sentry-api-store'
     ),
+    url(
+        r'^api/(?P<project_id>[\w_-]+)/store/batch/$',
+        api.StoreBatchView.as_view(),
+        name='sentry-api-store-batch'
+    ),
     url(
         r'^api/(?P<project_id>[\w_-]+)/minidump/?$',
         api.MinidumpView.as_view(),
@@ -2,11 +2,16 @@ from __future__ import absolute_import
 
 import pytest
 from datetime import timedelta
+from django.db import connections
 from django.utils import timezone
 from unittest import TestCase as SimpleTestCase
 
 from sentry.api.paginator import (
+    CachedHitCounter,
+    EstimatedHitCounter,
+    ExactHitCounter,
     Paginator,
+    get_hits_cache_key,
     DateTimePaginator,
     OffsetPaginator,
     SequencePaginator,
@@ -76,6 +81,75 @@ class PaginatorTest(TestCase):
         assert len(result3) == 0, (result3, list(result3))
 
 
+class HitCounterTest(TestCase):
+    def test_exact(self):
+        self.create_user('foo@example.com')
+        self.create_user('bar@example.com')
+
+        counter = ExactHitCounter()
+        assert counter(User.objects.all(), 1000) == (2, 'exact')
+        assert counter(User.objects.all(), 1) == (1, 'exact')
+        assert counter(User.objects.none(), 1000) == (0, 'exact')
+
+    def test_estimate(self):
+        self.create_user('foo@example.com')
+
+        queryset = User.objects.all()
+        if connections[queryset.db].vendor == 'postgresql':
+            # The planner never estimates fewer than one row.
+            assert EstimatedHitCounter()(queryset, 1) == (1, 'estimate')
+            hits, strategy = EstimatedHitCounter()(queryset, 1000)
+            assert strategy == 'estimate'
+            assert 1 <= hits <= 1000
+            assert EstimatedHitCounter()(User.objects.none(), 1000) == (0, 'estimate')
+        else:
+            # Other databases fall back to an exact count.
+            assert EstimatedHitCounter()(queryset, 1000) == (1, 'exact')
+            assert EstimatedHitCounter()(User.objects.none(), 1000) == (0, 'exact')
+
+    def test_cached(self):
+        self.create_user('foo@example.com')
+
+        # Uses a query of its own, since the cache outlives the test.
+        queryset = User.objects.filter(is_superuser=False)
+        counter = CachedHitCounter(60)
+        assert counter(queryset, 1000) == (1, 'exact')
+
+        # The cached number is returned until it expires.
+        self.create_user('bar@example.com')
+        assert counter(queryset, 1000) == (1, 'cached')
+
+        # Different queries are cached separately.
+        assert counter(User.objects.filter(email='bar@example.com'), 1000) == (1, 'exact')
+
+    def test_hits_cache_key(self):
+        key = get_hits_cache_key('default', u'SELECT id FROM t WHERE a = %s LIMIT 10', [1])
+        assert key == get_hits_cache_key(
+            'default', u'SELECT id\n  FROM t  WHERE a = %s LIMIT 10', [b'1'])
+        assert key != get_hits_cache_key('default', u'SELECT id FROM t WHERE a = %s LIMIT 10', [2])
+        assert key != get_hits_cache_key('other', u'SELECT id FROM t WHERE a = %s LIMIT 10', [1])
+
+    def test_get_result_strategy(self):
+        self.create_user('foo@example.com')
+
+        result = Paginator(User.objects.all(), 'id').get_result(limit=1, count_hits=True)
+        assert result.hits == 1
+        assert result.hits_strategy == 'exact'
+
+        with self.options({'api.paginator.hits-strategy': 'cached'}):
+            paginator = Paginator(User.objects.filter(is_staff=False), 'id')
+            assert paginator.get_result(limit=1, count_hits=True).hits_strategy == 'exact'
+            assert paginator.get_result(limit=1, count_hits=True).hits_strategy == 'cached'
+
+        paginator = Paginator(User.objects.all(), 'id', hit_counter=EstimatedHitCounter())
+        assert paginator.get_result(limit=1, count_hits=True).hits_strategy == (
+            'estimate' if connections[User.objects.db].vendor == 'postgresql' else 'exact')
+
+        result = Paginator(User.objects.all(), 'id').get_result(limit=1)
+        assert result.hits is None
+        assert result.hits_strategy is None
+
+
 class OffsetPaginatorTest(TestCase):
     # offset paginator does not support dynamic limits on is_prev
     def test_simple(self):
@@ -5,9 +5,10 @@ from __future__ import absolute_import
 import pytest
 import mock
 
+from binascii import crc32
 from datetime import datetime
 from django.utils import timezone
-from sentry.buffer.redis import RedisBuffer
+from sentry.buffer.redis import RedisBuffer, _flush_local_buffers
 from sentry.models import Group, Project
 from sentry.testutils import TestCase
 
@@ -37,6 +38,15 @@ class RedisBufferTest(TestCase):
         client = self.buf.cluster.get_routing_client()
         assert client.zrange('b:p', 0, -1) == []
 
+    @mock.patch('sentry.buffer.redis.process_incr')
+    @mock.patch('sentry.buffer.redis.metrics')
+    def test_process_pending_records_unpartitioned_backlog(self, metrics, process_incr):
+        with self.buf.cluster.map() as client:
+            client.zadd('b:p', 1, 'foo')
+            client.zadd('b:p', 2, 'bar')
+        self.buf.process_pending()
+        metrics.timing.assert_any_call('buffer.pending.backlog', 2, tags={'partition': 'none'})
+
     @mock.patch('sentry.buffer.redis.RedisBuffer._make_key', mock.Mock(return_value='foo'))
     @mock.patch('sentry.buffer.redis.process_incr')
     def test_process_pending_multiple_batches(self, process_incr):
@@ -127,6 +137,67 @@ class RedisBufferTest(TestCase):
         pending = client.zrange('b:p', 0, -1)
         assert pending == ['foo']
 
+    @mock.patch('sentry.buffer.redis.RedisBuffer._make_key', mock.Mock(return_value='foo'))
+    @mock.patch('sentry.buffer.base.Buffer.process')
+    def test_incr_local_aggregation(self, process):
+        buf = RedisBuffer(local_flush_interval=60 * 1000)
+        client = buf.cluster.get_routing_client()
+        columns = {'times_seen': 1}
+        filters = {'pk': 1}
+        buf.incr(Group, columns, filters, extra={'foo': 'bar', 'baz': 'qux'})
+        buf.incr(Group, columns, filters, extra={'foo': 'baz'})
+
+        # nothing is written until the local buffer is flushed
+        assert client.zrange('b:p', 0, -1) == []
+
+        buf.flush()
+        assert client.zrange('b:p', 0, -1) == ['foo']
+        assert client.hget('foo', 'i+times_seen') == '2'
+
+        buf.process('foo')
+        process.assert_called_once_with(
+            Group, {'times_seen': 2}, filters, {'foo': 'baz', 'baz': 'qux'})
+
+    @mock.patch('sentry.buffer.redis.RedisBuffer._make_key', mock.Mock(return_value='foo'))
+    def test_incr_local_aggregation_flush_on_exit(self):
+        buf = RedisBuffer(local_flush_interval=60 * 1000)
+        client = buf.cluster.get_routing_client()
+        buf.incr(Group, {'times_seen': 1}, {'pk': 1})
+
+        _flush_local_buffers()
+        assert client.hget('foo', 'i+times_seen') == '1'
+
+    @mock.patch('sentry.buffer.redis.RedisBuffer._make_key')
+    def test_incr_local_aggregation_max_keys(self, make_key):
+        make_key.side_effect = lambda model, filters: 'foo:%s' % filters['pk']
+        buf = RedisBuffer(local_flush_interval=60 * 1000, local_max_keys=2)
+        client = buf.cluster.get_routing_client()
+        buf.incr(Group, {'times_seen': 1}, {'pk': 1})
+        buf.incr(Group, {'times_seen': 1}, {'pk': 1})
+        assert client.zrange('b:p', 0, -1) == []
+
+        buf.incr(Group, {'times_seen': 1}, {'pk': 2})
+        assert sorted(client.zrange('b:p', 0, -1)) == ['foo:1', 'foo:2']
+        assert client.hget('foo:1', 'i+times_seen') == '2'
+        assert client.hget('foo:2', 'i+times_seen') == '1'
+
+    @mock.patch('sentry.buffer.redis.RedisBuffer._make_key')
+    def test_incr_local_aggregation_flush_errors(self, make_key):
+        make_key.side_effect = lambda model, filters: 'foo:%s' % filters['pk']
+        buf = RedisBuffer(local_flush_interval=60 * 1000, local_max_keys=2)
+        client = buf.cluster.get_routing_client()
+        buf.incr(Group, {'times_seen': 1}, {'pk': 1})
+
+        with mock.patch.object(buf.cluster, 'get_local_client', side_effect=Exception()):
+            # Incrementing doesn't fail, and the increments are kept.
+            buf.incr(Group, {'times_seen': 1}, {'pk': 2})
+        assert client.zrange('b:p', 0, -1) == []
+
+        buf.incr(Group, {'times_seen': 1}, {'pk': 1})
+        assert sorted(client.zrange('b:p', 0, -1)) == ['foo:1', 'foo:2']
+        assert client.hget('foo:1', 'i+times_seen') == '2'
+        assert client.hget('foo:2', 'i+times_seen') == '1'
+
     @mock.patch('sentry.buffer.redis.RedisBuffer._make_key', mock.Mock(return_value='foo'))
     @mock.patch('sentry.buffer.redis.process_incr')
     @mock.patch('sentry.buffer.redis.process_pending')
@@ -178,3 +249,46 @@ class RedisBufferTest(TestCase):
 
         # Make sure we didn't queue up more
         assert len(process_pending.apply_async.mock_calls) == 2
+
+    @mock.patch('sentry.buffer.redis.process_incr')
+    @mock.patch('sentry.buffer.redis.process_pending')
+    def test_process_pending_skips_leased_partitions(self, process_pending, process_incr):
+        self.buf.pending_partitions = 3
+        with self.buf.cluster.map() as client:
+            client.zadd('b:p:0', 1, 'foo')
+            client.zadd('b:p:1', 1, 'bar')
+            client.set('l:b:p:1', 'lease')
+
+        backlog = self.buf.get_pending_backlog()
+        assert backlog[0] == (1, 1.0, False)
+        assert backlog[1] == (1, 1.0, True)
+        assert backlog[2] == (0, None, False)
+
+        self.buf.process_pending()
+        assert process_pending.apply_async.mock_calls == [
+            mock.call(kwargs={'partition': 0}),
+        ]
+
+    @mock.patch('sentry.buffer.redis.process_incr')
+    @mock.patch('sentry.buffer.redis.process_pending')
+    def test_process_pending_autoscales_partitions(self, process_pending, process_incr):
+        buf = RedisBuffer(pending_partitions=2, max_pending_partitions=8, partition_backlog=2)
+        assert buf.get_active_partitions() == 2
+
+        with buf.cluster.map() as client:
+            for i in range(5):
+                client.zadd('b:p:0', i, 'foo:%s' % i)
+
+        buf.process_pending()
+        assert buf.get_active_partitions() == 4
+        assert buf.cluster.get_routing_client().get('b:p:n') == '4'
+
+        # keys are routed into the new partitions
+        assert buf._make_pending_key_from_key('foo:5') == \
+            'b:p:%d' % (crc32('foo:5') % 4)
+
+        with buf.cluster.map() as client:
+            client.delete('b:p:0')
+
+        buf.process_pending()
+        assert buf.get_active_partitions() == 2
@@ -2,7 +2,7 @@
 
 from __future__ import absolute_import
 
-from sentry.cache.redis import RedisCache, ValueTooLarge
+from sentry.cache.redis import RedisCache, ValueTooLarge, ENCODED_MARKER
 from sentry.testutils import TestCase
 
 
@@ -23,3 +23,32 @@ class RedisCacheTest(TestCase):
 
         with self.assertRaises(ValueTooLarge):
             self.backend.set('foo', 'x' * (RedisCache.max_size + 1), 0)
+
+    def test_set_many(self):
+        self.backend.set_many([
+            ('foo', {'foo': 'bar'}),
+            ('bar', {'bar': 'baz'}),
+        ], 50)
+
+        assert self.backend.get('foo') == {'foo': 'bar'}
+        assert self.backend.get('bar') == {'bar': 'baz'}
+
+    def test_compression(self):
+        backend = RedisCache(compress_threshold=100)
+        value = {'message': 'x' * 1000}
+
+        backend.set('foo', value, 50)
+        raw = backend.get('foo', raw=True)
+        assert raw.startswith(ENCODED_MARKER)
+        assert len(raw) < 1000
+        assert backend.get('foo') == value
+
+        # Small values stay plain JSON
+        backend.set('bar', {'foo': 'bar'}, 50)
+        assert not backend.get('bar', raw=True).startswith(ENCODED_MARKER)
+        assert backend.get('bar') == {'foo': 'bar'}
+
+        # Values written without compression remain readable
+        self.backend.set('baz', value, 50)
+        assert backend.get('baz') == value
+        assert self.backend.get('foo') == value
@@ -4,13 +4,19 @@ from __future__ import absolute_import
 
 import six
 import pytest
+import zlib
 
 from sentry.coreapi import (
     APIError,
     APIUnauthorized,
     Auth,
     ClientApiHelper,
+    EventTooLarge,
     decode_data,
+    decode_payload,
+    decompress_deflate,
+    decompress_gzip,
+    inflate,
     safely_load_json_string
 )
 from sentry.interfaces.base import get_interface
@@ -80,6 +86,44 @@ def test_invalid_data():
         decode_data('\x99')
 
 
+def test_inflate():
+    data = b'{"foo": "%s"}' % (b'x' * 1024)
+    assert inflate(zlib.compress(data), max_size=2048) == data
+
+
+def test_inflate_aborts_when_too_large():
+    with pytest.raises(EventTooLarge):
+        inflate(zlib.compress(b'\x00' * 1024 * 1024), max_size=1024)
+
+
+def test_decompress_deflate_invalid_data():
+    with pytest.raises(APIError):
+        decompress_deflate(b'not compressed')
+
+
+def test_decompress_gzip():
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    data = compressor.compress(b'{"foo": "bar"}') + compressor.flush()
+    assert decompress_gzip(data) == u'{"foo": "bar"}'
+
+
+class DecodePayloadTest(TestCase):
+    def test_deflate(self):
+        data = zlib.compress(b'{"foo": "bar"}')
+        assert decode_payload(data, content_encoding='deflate') == {'foo': 'bar'}
+
+    def test_identity(self):
+        assert decode_payload(b'{"foo": "bar"}') == {'foo': 'bar'}
+
+    def test_too_large(self):
+        data = zlib.compress(b'{"foo": "%s"}' % (b'x' * 1024))
+        with self.options({'store.max-event-size': 512}):
+            with pytest.raises(EventTooLarge):
+                decode_payload(data, content_encoding='deflate')
+            with pytest.raises(EventTooLarge):
+                decode_payload(b'{"foo": "%s"}' % (b'x' * 1024))
+
+
 def test_get_interface_does_not_let_through_disallowed_name():
     with pytest.raises(ValueError):
         get_interface('subprocess')
@@ -154,3 +154,61 @@ class RedisBackendTestCase(TestCase):
 
         with backend.digest('timeline', 0) as records:
             assert len(set(records)) == n
+
+    def test_digest_many(self):
+        backend = RedisBackend()
+
+        record_1 = Record('record:1', 'value', time.time())
+        backend.add('timeline:1', record_1)
+        record_2 = Record('record:2', 'value', time.time())
+        backend.add('timeline:2', record_2)
+        backend.add('timeline:3', Record('record:3', 'value', time.time()))
+        backend.delete('timeline:3')
+
+        # Timelines that are not in the ready state are left out.
+        with backend.digest_many(['timeline:1', 'timeline:2', 'timeline:3'], 0) as digests:
+            assert digests == {
+                'timeline:1': [record_1],
+                'timeline:2': [record_2],
+            }
+
+        # Both timelines were closed and rescheduled.
+        assert set(entry.key for entry in backend.schedule(time.time())) == \
+            set(['timeline:1', 'timeline:2'])
+
+        # The locks were released, so the timelines can be digested again.
+        with backend.digest_many(['timeline:1', 'timeline:2'], 0) as digests:
+            assert digests == {'timeline:1': [], 'timeline:2': []}
+
+    def test_digest_many_preserves_removed_digests(self):
+        backend = RedisBackend()
+
+        record_1 = Record('record:1', 'value', time.time())
+        backend.add('timeline:1', record_1)
+        record_2 = Record('record:2', 'value', time.time())
+        backend.add('timeline:2', record_2)
+
+        with backend.digest_many(['timeline:1', 'timeline:2'], 0) as digests:
+            del digests['timeline:2']
+
+        # Only the first timeline was closed, the second one remains ready.
+        with backend.digest('timeline:1', 0) as records:
+            assert set(records) == set()
+
+        with backend.digest('timeline:2', 0) as records:
+            assert set(records) == set([record_2])
+
+    def test_digest_many_failure(self):
+        backend = RedisBackend()
+
+        record_1 = Record('record:1', 'value', time.time())
+        backend.add('timeline:1', record_1)
+
+        try:
+            with backend.digest_many(['timeline:1'], 0):
+                raise Exception('This causes the digests to not be closed.')
+        except Exception:
+            pass
+
+        with backend.digest('timeline:1', 0) as records:
+            assert set(records) == set([record_1])
@@ -11,6 +11,8 @@ from sentry.digests import Record
 from sentry.digests.notifications import (
     Notification,
     event_to_record,
+    fetch_state,
+    fetch_states,
     rewrite_record,
     group_records,
     sort_group_contents,
@@ -141,3 +143,24 @@ class SortRecordsTestCase(TestCase):
                 (rules[0], OrderedDict(((groups[0], []), ))),
             )
         )
+
+
+class FetchStatesTestCase(TestCase):
+    def test_success(self):
+        digests = {}
+        for i in range(2):
+            project = self.create_project()
+            rule = project.rule_set.all()[0]
+            events = [
+                self.create_event(group=self.create_group(project=project)) for _ in range(2)
+            ]
+            # Records are returned in reverse chronological order.
+            digests[i] = (
+                project,
+                [event_to_record(event, (rule, )) for event in reversed(events)],
+            )
+
+        states = fetch_states(digests)
+        assert set(states.keys()) == set(digests.keys())
+        for key, (project, records) in digests.items():
+            assert states[key] == fetch_state(project, records)
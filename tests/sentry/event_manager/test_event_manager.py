@@ -22,6 +22,7 @@ from sentry.models import (
     GroupTombstone, EventMapping, Integration, Release,
     ReleaseProjectEnvironment, OrganizationIntegration, UserReport
 )
+from sentry.models.grouphash import hash_cache
 from sentry.signals import event_discarded, event_saved
 from sentry.testutils import assert_mock_called_once_with_partial, TransactionTestCase
 from sentry.utils.data_filters import FilterStatKeys
@@ -130,6 +131,24 @@ class EventManagerTest(TransactionTestCase):
 
         assert Event.objects.count() == 1
 
+    def test_dupe_message_id_with_event_id_filter(self):
+        event_id = 'b' * 32
+
+        with self.options({'store.event-id-filter.size': 1024 * 1024}):
+            manager = EventManager(make_event(event_id=event_id))
+            manager.normalize()
+            with mock.patch('sentry.event_manager.Event.objects.get') as get:
+                first = manager.save(1)
+            # The event ID was never seen, so no lookup is necessary.
+            assert not get.called
+
+            manager = EventManager(make_event(event_id=event_id))
+            manager.normalize()
+            second = manager.save(1)
+
+        assert second.id == first.id
+        assert Event.objects.filter(event_id=event_id).count() == 1
+
     def test_updates_group(self):
         timestamp = time() - 300
         manager = EventManager(
@@ -1223,6 +1242,30 @@ class EventManagerTest(TransactionTestCase):
             signal=event_discarded,
         )
 
+    def test_hash_cache(self):
+        self.addCleanup(hash_cache.clear_local)
+
+        with self.options({'grouphash.cache-ttl': 60}):
+            manager = EventManager(make_event(event_id='a' * 32, fingerprint=['a' * 32]))
+            event = manager.save(1)
+
+            with mock.patch.object(GroupHash.objects, 'get_or_create') as get_or_create:
+                manager = EventManager(make_event(event_id='b' * 32, fingerprint=['a' * 32]))
+                event2 = manager.save(1)
+
+            assert not get_or_create.called
+            assert event2.group_id == event.group_id
+
+            # A cached group that was deleted is corrected from the database.
+            Group.objects.filter(id=event.group_id).delete()
+            manager = EventManager(make_event(event_id='c' * 32, fingerprint=['a' * 32]))
+            event3 = manager.save(1)
+            assert event3.group_id != event.group_id
+            assert GroupHash.objects.get(
+                project_id=event3.project_id,
+                hash=md5_from_hash(['a' * 32]),
+            ).group_id == event3.group_id
+
     def test_event_saved_signal(self):
         mock_event_saved = mock.Mock()
         event_saved.connect(mock_event_saved)
@@ -1,7 +1,7 @@
 from __future__ import absolute_import
 
 from sentry.testutils import TestCase
-from sentry.lang.javascript.cache import SourceCache
+from sentry.lang.javascript.cache import SourceCache, SourceMapViewCache
 
 
 class BasicCacheTest(TestCase):
@@ -38,3 +38,34 @@ class BasicCacheTest(TestCase):
         # fall back to utf-8
         cache.add(url, 'foobar'.encode('utf-32'), encoding='utf-32')
         assert cache.get(url)[0] == u'foobar'
+
+
+class SourceMapViewCacheTest(TestCase):
+    sourcemap = b'{"version":3,"file":"foo.min.js","sources":["foo.js"],"names":[],"mappings":"AAAA"}'
+
+    def test_from_json_bytes(self):
+        cache = SourceMapViewCache(max_size=1024)
+
+        view = cache.from_json_bytes(self.sourcemap)
+        assert len(cache) == 1
+        assert cache.size == len(self.sourcemap)
+        assert cache.from_json_bytes(self.sourcemap) is view
+
+    def test_eviction(self):
+        cache = SourceMapViewCache(max_size=10)
+
+        cache.add('a', 'view-a', 4)
+        cache.add('b', 'view-b', 4)
+        assert cache.get('a') == 'view-a'
+
+        # b is the least recently used entry now
+        cache.add('c', 'view-c', 4)
+        assert cache.get('b') is None
+        assert cache.get('a') == 'view-a'
+        assert cache.get('c') == 'view-c'
+        assert cache.size == 8
+
+        # entries larger than the cache are never stored
+        cache.add('d', 'view-d', 11)
+        assert cache.get('d') is None
+        assert len(cache) == 2
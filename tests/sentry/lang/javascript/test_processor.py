@@ -7,7 +7,7 @@ import six
 from symbolic import SourceMapTokenMatch
 
 from copy import deepcopy
-from mock import patch
+from mock import Mock, patch
 from requests.exceptions import RequestException
 
 from sentry import http
@@ -19,6 +19,8 @@ from sentry.lang.javascript.processor import (
     generate_module,
     trim_line,
     fetch_release_file,
+    fetch_release_files,
+    get_release_file_index,
     UnparseableSourcemap,
     get_max_age,
     CACHE_CONTROL_MAX,
@@ -27,6 +29,7 @@ from sentry.lang.javascript.processor import (
 from sentry.lang.javascript.errormapping import (rewrite_exception, REACT_MAPPING_URL)
 from sentry.models import File, Release, ReleaseFile, EventError
 from sentry.testutils import TestCase
+from sentry.utils.cache import cache
 from sentry.utils.strings import truncatechars
 
 base64_sourcemap = 'data:application/json;base64,eyJ2ZXJzaW9uIjozLCJmaWxlIjoiZ2VuZXJhdGVkLmpzIiwic291cmNlcyI6WyIvdGVzdC5qcyJdLCJuYW1lcyI6W10sIm1hcHBpbmdzIjoiO0FBQUEiLCJzb3VyY2VzQ29udGVudCI6WyJjb25zb2xlLmxvZyhcImhlbGxvLCBXb3JsZCFcIikiXX0='
@@ -189,6 +192,125 @@ class FetchReleaseFileTest(TestCase):
         )
 
 
+class FetchReleaseFilesTest(TestCase):
+    def create_release_file(self, release, name, body, dist=None):
+        file = File.objects.create(
+            name=name,
+            type='release.file',
+            headers={'Content-Type': 'application/json; charset=utf-8'},
+        )
+        file.putfile(six.BytesIO(body))
+        return ReleaseFile.objects.create(
+            name=name,
+            release=release,
+            dist=dist,
+            organization_id=release.organization_id,
+            file=file,
+        )
+
+    def test_multiple(self):
+        project = self.project
+        release = Release.objects.create(
+            organization_id=project.organization_id,
+            version='abc',
+        )
+        release.add_project(project)
+
+        self.create_release_file(release, '~/foo.min.js', b'foo')
+        self.create_release_file(release, 'http://example.com/bar.min.js', b'bar')
+
+        filenames = [
+            'http://example.com/foo.min.js',
+            'http://example.com/bar.min.js',
+            'http://example.com/baz.min.js',
+        ]
+        results = fetch_release_files(filenames, release)
+
+        assert results == {
+            'http://example.com/foo.min.js': http.UrlResult(
+                'http://example.com/foo.min.js',
+                {'content-type': 'application/json; charset=utf-8'},
+                b'foo',
+                200,
+                'utf-8',
+            ),
+            'http://example.com/bar.min.js': http.UrlResult(
+                'http://example.com/bar.min.js',
+                {'content-type': 'application/json; charset=utf-8'},
+                b'bar',
+                200,
+                'utf-8',
+            ),
+            'http://example.com/baz.min.js': None,
+        }
+
+        # test with cache hit, which should be compressed
+        with self.assertNumQueries(0):
+            assert fetch_release_files(filenames, release) == results
+
+    def test_index_invalidation(self):
+        project = self.project
+        release = Release.objects.create(
+            organization_id=project.organization_id,
+            version='abc',
+        )
+        release.add_project(project)
+
+        foo = self.create_release_file(release, '~/foo.min.js', b'foo')
+        assert get_release_file_index(release) == {foo.ident: foo.id}
+
+        bar = self.create_release_file(release, '~/bar.min.js', b'bar')
+        assert get_release_file_index(release) == {
+            foo.ident: foo.id,
+            bar.ident: bar.id,
+        }
+
+        foo.delete()
+        assert get_release_file_index(release) == {bar.ident: bar.id}
+
+    def test_index_invalidated_while_building(self):
+        project = self.project
+        release = Release.objects.create(
+            organization_id=project.organization_id,
+            version='abc',
+        )
+        release.add_project(project)
+
+        foo = self.create_release_file(release, '~/foo.min.js', b'foo')
+        bar = []
+
+        def set_after_upload(key, value, timeout):
+            # An artifact is uploaded after the index was queried, but
+            # before it is cached.
+            bar.append(self.create_release_file(release, '~/bar.min.js', b'bar'))
+            cache.set(key, value, timeout)
+
+        with patch('sentry.lang.javascript.processor.cache',
+                   Mock(get=cache.get, add=cache.add, set=set_after_upload)):
+            assert get_release_file_index(release) == {foo.ident: foo.id}
+
+        assert get_release_file_index(release) == {
+            foo.ident: foo.id,
+            bar[0].ident: bar[0].id,
+        }
+
+    @patch('sentry.lang.javascript.processor.MAX_INDEXED_RELEASE_FILES', 1)
+    def test_index_too_large(self):
+        project = self.project
+        release = Release.objects.create(
+            organization_id=project.organization_id,
+            version='abc',
+        )
+        release.add_project(project)
+
+        self.create_release_file(release, '~/foo.min.js', b'foo')
+        self.create_release_file(release, '~/bar.min.js', b'bar')
+        assert get_release_file_index(release) is None
+
+        results = fetch_release_files(['http://example.com/bar.min.js'], release)
+        assert results['http://example.com/bar.min.js'].body == b'bar'
+
+
 class FetchFileTest(TestCase):
     @responses.activate
     def test_simple(self):
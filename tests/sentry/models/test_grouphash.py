@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 from sentry.models import GroupHash
+from sentry.models.grouphash import hash_cache
 from sentry.testutils import TestCase
 
 
@@ -22,3 +23,60 @@ class GroupTest(TestCase):
         assert GroupHash.fetch_last_processed_event_id(
             [grouphash.id, -1],
         ) == ['event', None]
+
+
+class GroupHashCacheTest(TestCase):
+    def setUp(self):
+        super(GroupHashCacheTest, self).setUp()
+        hash_cache.clear_local()
+        self.addCleanup(hash_cache.clear_local)
+
+    def test_disabled(self):
+        grouphash = GroupHash.objects.create(
+            project=self.project,
+            group=self.group,
+            hash='xyz',
+        )
+        GroupHash.cache_many([grouphash])
+        assert GroupHash.get_cached_many(self.project.id, ['xyz']) == {}
+
+    def test_cache_and_invalidate(self):
+        grouphash = GroupHash.objects.create(
+            project=self.project,
+            group=self.group,
+            hash='xyz',
+        )
+        unassigned = GroupHash.objects.create(project=self.project, hash='abc')
+
+        with self.options({'grouphash.cache-ttl': 60}):
+            GroupHash.cache_many([grouphash, unassigned])
+
+            cached = GroupHash.get_cached_many(self.project.id, ['xyz', 'abc'])
+            assert list(cached.keys()) == ['xyz']
+            assert cached['xyz'].id == grouphash.id
+            assert cached['xyz'].group_id == self.group.id
+            assert cached['xyz'].group_tombstone_id is None
+
+            # Entries are also found in Redis once they left the local cache.
+            hash_cache.clear_local()
+            assert GroupHash.get_cached_many(self.project.id, ['xyz'])['xyz'].id == grouphash.id
+
+            GroupHash.invalidate_cache(group_id__in=[self.group.id])
+            assert GroupHash.get_cached_many(self.project.id, ['xyz']) == {}
+
+    def test_tombstone(self):
+        grouphash = GroupHash.objects.create(
+            project=self.project,
+            hash='xyz',
+            group_tombstone_id=1,
+        )
+
+        with self.options({'grouphash.cache-ttl': 60}):
+            GroupHash.cache_many([grouphash])
+            hash_cache.clear_local()
+            cached = GroupHash.get_cached_many(self.project.id, ['xyz'])
+            assert cached['xyz'].group_id is None
+            assert cached['xyz'].group_tombstone_id == 1
+
+            GroupHash.uncache_many(self.project.id, ['xyz'])
+            assert GroupHash.get_cached_many(self.project.id, ['xyz']) == {}
@@ -2,8 +2,13 @@
 
 from __future__ import absolute_import
 
+import mock
+
+from django.db import transaction
+
 from sentry.models import Counter
-from sentry.testutils import TestCase
+from sentry.models.counter import block_allocator
+from sentry.testutils import TestCase, TransactionTestCase
 
 
 class ProjectCounterTest(TestCase):
@@ -15,3 +20,43 @@ class ProjectCounterTest(TestCase):
 
         assert Counter.increment(project, 42) == 42
         assert Counter.increment(project, 1) == 43
+
+
+class CounterBlockTest(TransactionTestCase):
+    def setUp(self):
+        super(CounterBlockTest, self).setUp()
+        block_allocator.clear()
+
+    def test_next_value(self):
+        project = self.create_project()
+        other = self.create_project()
+
+        with self.options({'counter.block-size': 10}):
+            assert Counter.next_value(project) == 1
+            assert Counter.next_value(project) == 2
+            assert Counter.next_value(other) == 1
+
+            # The block is reserved up front, so other processes continue
+            # after it.
+            assert Counter.increment(project) == 11
+
+            for value in range(3, 11):
+                assert Counter.next_value(project) == value
+            assert Counter.next_value(project) == 21
+
+    def test_next_value_in_transaction(self):
+        project = self.create_project()
+
+        with self.options({'counter.block-size': 10}), transaction.atomic():
+            assert Counter.next_value(project) == 1
+            assert Counter.next_value(project) == 2
+
+        assert Counter.increment(project) == 3
+
+    def test_next_value_after_fork(self):
+        project = self.create_project()
+
+        with self.options({'counter.block-size': 10}):
+            assert Counter.next_value(project) == 1
+            with mock.patch('os.getpid', return_value=-1):
+                assert Counter.next_value(project) == 11
@@ -81,9 +81,9 @@ class ProjectOwnershipTestCase(TestCase):
         ) == (ProjectOwnership.Everyone, None)
 
         # When fallthrough = False, we don't implicitly assign to Everyone
-        ProjectOwnership.objects.filter(
-            project_id=self.project.id,
-        ).update(fallthrough=False)
+        ownership = ProjectOwnership.objects.get(project_id=self.project.id)
+        ownership.fallthrough = False
+        ownership.save()
 
         assert ProjectOwnership.get_owners(
             self.project.id, {
@@ -95,6 +95,18 @@ class ProjectOwnershipTestCase(TestCase):
             }
         ) == ([], None)
 
+    def test_get_ownership_cached(self):
+        assert ProjectOwnership.get_ownership_cached(self.project.id) is None
+
+        ownership = ProjectOwnership.objects.create(
+            project_id=self.project.id,
+            schema=dump_schema([]),
+        )
+        assert ProjectOwnership.get_ownership_cached(self.project.id) == ownership
+
+        ownership.delete()
+        assert ProjectOwnership.get_ownership_cached(self.project.id) is None
+
 
 class ResolveActorsTestCase(TestCase):
     def test_no_actors(self):
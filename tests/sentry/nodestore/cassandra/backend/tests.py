@@ -39,3 +39,13 @@ class CassandraNodeStorageTest(TestCase):
         assert result[node_id2] == {
             'foo': 'bar',
         }
+
+    def test_multi(self):
+        self.ns.multi_chunk_size = 2
+        values = {'multi%d' % i: {'foo': i} for i in range(5)}
+        self.ns.set_multi(values)
+
+        assert self.ns.get_multi(list(values)) == values
+
+        self.ns.delete_multi(list(values))
+        assert not any(self.ns.get_multi(list(values)).values())
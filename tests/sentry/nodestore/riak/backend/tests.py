@@ -2,6 +2,13 @@
 
 from __future__ import absolute_import
 
+import mock
+import pytest
+import time
+
+from threading import Event
+from urllib3.exceptions import TimeoutError
+
 from sentry.nodestore.riak.backend import RiakNodeStorage
 from sentry.testutils import TestCase, requires_riak
 
@@ -46,3 +53,62 @@ class RiakNodeStorageTest(TestCase):
 
         self.ns.delete_multi([node_id2])
         assert not self.ns.get(node_id2)
+
+    def test_multi(self):
+        self.ns.set_multi({
+            'multi1': {'foo': 'bar'},
+            'multi2': {'foo': 'baz'},
+        })
+
+        assert self.ns.get_multi(['multi1', 'multi2', 'multi3']) == {
+            'multi1': {'foo': 'bar'},
+            'multi2': {'foo': 'baz'},
+            'multi3': None,
+        }
+
+        self.ns.delete_multi(['multi1', 'multi2'])
+        assert self.ns.get_multi(['multi1', 'multi2']) == {
+            'multi1': None,
+            'multi2': None,
+        }
+
+
+class RiakNodeStorageTimeoutTest(TestCase):
+    def test_get_multi_timeout(self):
+        ns = RiakNodeStorage(nodes=[{
+            'host': '127.0.0.1',
+            'http_port': 8098,
+        }], multi_timeout=0.1)
+
+        released = Event()
+
+        def urlopen(method, path, **kwargs):
+            released.wait(5)
+
+        with mock.patch.object(ns.conn.manager, 'urlopen', side_effect=urlopen):
+            start = time.time()
+            with pytest.raises(TimeoutError):
+                ns.get_multi(['foo', 'bar'])
+            assert time.time() - start < 1
+            released.set()
+
+    def test_multi_late_response(self):
+        ns = RiakNodeStorage(nodes=[{
+            'host': '127.0.0.1',
+            'http_port': 8098,
+        }], multi_timeout=0.1)
+
+        released = Event()
+
+        def urlopen(method, path, **kwargs):
+            released.wait(5)
+            return mock.Mock(status=200)
+
+        with mock.patch.object(ns.conn.manager, 'urlopen', side_effect=urlopen):
+            rv = ns.conn._multi([('foo', 'GET', '/foo', {})], timeout=0.1)
+            released.set()
+            time.sleep(0.1)
+
+        # Responses arriving after the deadline don't change the result.
+        assert list(rv) == ['foo']
+        assert isinstance(rv['foo'], TimeoutError)
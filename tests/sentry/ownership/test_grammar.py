@@ -2,7 +2,7 @@ from __future__ import absolute_import
 
 from sentry.ownership.grammar import (
     Rule, Matcher, Owner,
-    parse_rules, dump_schema, load_schema,
+    parse_rules, dump_schema, load_schema, load_compiled_schema,
 )
 
 fixture_data = """
@@ -117,3 +117,33 @@ def test_matcher_test_stacktrace():
     assert not Matcher('path', '*.jsx').test(data)
     assert not Matcher('url', '*.py').test(data)
     assert not Matcher('path', '*.py').test({})
+
+
+def test_compiled_schema_matches_rules():
+    rules = parse_rules(fixture_data)
+    compiled = load_compiled_schema(dump_schema(rules))
+
+    data = {
+        'request': {
+            'url': 'http://google.com/search',
+        },
+        'exception': {
+            'values': [{
+                'stacktrace': {
+                    'frames': [
+                        {'filename': 'src/sentry/app.py'},
+                        {'abs_path': 'static/app.js'},
+                        {'filename': 'src/sentry/app.py'},
+                    ],
+                },
+            }],
+        },
+    }
+    assert compiled.match(data) == [rule for rule in rules if rule.test(data)] == rules
+    assert compiled.match({}) == []
+    assert compiled.match({'stacktrace': {'frames': [{'filename': 'foo.py'}]}}) == []
+
+
+def test_load_compiled_schema_is_cached():
+    schema = dump_schema(parse_rules(fixture_data))
+    assert load_compiled_schema(schema) is load_compiled_schema(dict(schema))
@@ -155,6 +155,28 @@ class RedisQuotaTest(TestCase):
 
         assert self.quota.is_rate_limited(self.project).is_limited
 
+    def test_is_rate_limited_batch(self):
+        timestamp = time.time()
+
+        self.get_project_quota.return_value = (3, 60)
+        self.get_organization_quota.return_value = (300, 60)
+
+        results = self.quota.is_rate_limited_batch(self.project, count=5, timestamp=timestamp)
+        assert [r.is_limited for r in results] == [False, False, False, True, True]
+        assert results[3].reason_code == 'project_quota'
+
+        quotas = self.quota.get_quotas(self.project)
+        assert self.quota.get_usage(
+            self.project.organization_id, quotas, timestamp=timestamp,
+        ) == [3, 3]
+
+    @mock.patch('sentry.quotas.redis.is_rate_limited')
+    @mock.patch.object(RedisQuota, 'get_quotas', return_value=[])
+    def test_batch_bails_immediately_without_any_quota(self, get_quotas, is_rate_limited):
+        results = self.quota.is_rate_limited_batch(self.project, count=2)
+        assert not is_rate_limited.called
+        assert [r.is_limited for r in results] == [False, False]
+
     def test_get_usage(self):
         timestamp = time.time()
 
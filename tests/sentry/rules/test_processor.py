@@ -2,9 +2,12 @@
 
 from __future__ import absolute_import
 
+import mock
+
 from datetime import timedelta
 from django.utils import timezone
 
+from sentry import tsdb
 from sentry.models import GroupRuleStatus, Rule
 from sentry.plugins import plugins
 from sentry.testutils import TestCase
@@ -59,6 +62,71 @@ class RuleProcessorTest(TestCase):
         results = list(rp.apply())
         assert len(results) == 1
 
+    def create_frequency_rules(self, project, count, conditions=()):
+        Rule.objects.filter(project=project).delete()
+        return [
+            Rule.objects.create(
+                project=project,
+                data={
+                    'conditions': list(conditions) + [{
+                        'id': 'sentry.rules.conditions.event_frequency.EventFrequencyCondition',
+                        'interval': '1h',
+                        'value': i,
+                    }],
+                    'actions': [{
+                        'id': 'sentry.rules.actions.notify_event.NotifyEventAction',
+                    }],
+                }
+            ) for i in range(count)
+        ]
+
+    @mock.patch.object(tsdb, 'get_sums')
+    def test_batched_rule_statuses_and_rates(self, get_sums):
+        event = self.create_event()
+        get_sums.return_value = {event.group_id: 2}
+        rules = self.create_frequency_rules(event.project, 3)
+
+        rp = RuleProcessor(
+            event,
+            is_new=True,
+            is_regression=True,
+            is_new_group_environment=True,
+            has_reappeared=True)
+        results = list(rp.apply())
+
+        # the rate is only queried once for all three rules
+        assert get_sums.call_count == 1
+        assert len(results) == 1
+        _, futures = results[0]
+        assert set(f.rule for f in futures) == set(rules[:2])
+        assert GroupRuleStatus.objects.filter(group=event.group).count() == 3
+
+        # existing statuses are fetched with one query
+        rp = RuleProcessor(
+            event,
+            is_new=True,
+            is_regression=True,
+            is_new_group_environment=True,
+            has_reappeared=True)
+        with self.assertNumQueries(1):
+            rp.get_rule_statuses(rules)
+
+    @mock.patch.object(tsdb, 'get_sums')
+    def test_state_conditions_short_circuit(self, get_sums):
+        event = self.create_event()
+        self.create_frequency_rules(event.project, 2, conditions=[{
+            'id': 'sentry.rules.conditions.first_seen_event.FirstSeenEventCondition',
+        }])
+
+        rp = RuleProcessor(
+            event,
+            is_new=False,
+            is_regression=False,
+            is_new_group_environment=False,
+            has_reappeared=False)
+        assert list(rp.apply()) == []
+        assert get_sums.call_count == 0
+
 
 class EventCompatibilityProxyTest(TestCase):
     def test_simple(self):
@@ -1,16 +1,24 @@
 from __future__ import absolute_import
 
+import mock
+
 from collections import Counter
 from unittest import TestCase
 
-from sentry.similarity.signatures import MinHashSignatureBuilder
+from sentry.similarity.signatures import (
+    MinHashSignatureBuilder,
+    UniversalHashSignatureBuilder,
+)
 
 
 class MinHashSignatureBuilderTestCase(TestCase):
+    builder = MinHashSignatureBuilder
+    columns = 32
+
     def test_signatures(self):
-        n = 32
+        n = self.columns
         r = 0xFFFF
-        get_signature = MinHashSignatureBuilder(n, r)
+        get_signature = self.builder(n, r)
         get_signature(set(['foo', 'bar', 'baz'])) == get_signature(set(['foo', 'bar', 'baz']))
 
         assert len(get_signature('hello world')) == n
@@ -38,3 +46,16 @@ class MinHashSignatureBuilderTestCase(TestCase):
             estimation,
             delta=0.1,  # totally made up constant, seems reasonable
         )
+
+
+class UniversalHashSignatureBuilderTestCase(MinHashSignatureBuilderTestCase):
+    builder = UniversalHashSignatureBuilder
+    columns = 256
+
+    def test_without_numpy(self):
+        get_signature = UniversalHashSignatureBuilder(16, 0xFFFF)
+        features = set('the quick brown fox jumps over the lazy dog'.split())
+        expected = get_signature(features)
+
+        with mock.patch('sentry.similarity.signatures.numpy', None):
+            assert get_signature(features) == expected
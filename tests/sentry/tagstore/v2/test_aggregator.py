@@ -0,0 +1,133 @@
+from __future__ import absolute_import
+
+import mock
+
+from datetime import timedelta
+from django.db import DatabaseError
+from django.utils import timezone
+
+from sentry.db.models import BoundedPositiveIntegerField
+from sentry.testutils import TestCase
+from sentry.tagstore.v2 import models
+from sentry.tagstore.v2.aggregator import TagCountAggregator
+from sentry.tagstore.v2.backend import V2TagStorage
+
+
+class TagCountAggregatorTest(TestCase):
+    def setUp(self):
+        super(TagCountAggregatorTest, self).setUp()
+        self.ts = V2TagStorage(aggregate_flush_interval=60 * 1000, aggregate_max_keys=100)
+        self.environment = self.create_environment(project=self.project)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def tearDown(self):
+        self.ts.aggregator.flush()
+        super(TagCountAggregatorTest, self).tearDown()
+
+    def add(self, tags, date, group=None):
+        self.ts.incr_event_tag_values_times_seen(
+            self.project.id, (group or self.group).id, self.environment.id, tags, date)
+
+    def test_flush(self):
+        earlier = self.now - timedelta(minutes=5)
+        with self.tasks():
+            self.add([('foo', 'bar'), ('foo', 'baz')], self.now)
+            self.add([('foo', 'bar')], earlier)
+            self.ts.aggregator.flush()
+
+        for environment_id in (self.environment.id, None):
+            tv = self.ts.get_tag_value(self.project.id, environment_id, 'foo', 'bar')
+            assert tv.times_seen == 2
+            assert tv.first_seen == earlier
+            assert tv.last_seen == self.now
+
+            gtv = self.ts.get_group_tag_value(
+                self.project.id, self.group.id, environment_id, 'foo', 'bar')
+            assert gtv.times_seen == 2
+            assert gtv.last_seen == self.now
+
+            assert self.ts.get_tag_key(
+                self.project.id, environment_id, 'foo').values_seen == 2
+            assert self.ts.get_group_tag_key(
+                self.project.id, self.group.id, environment_id, 'foo').values_seen == 2
+
+    def test_flush_existing(self):
+        later = self.now + timedelta(minutes=5)
+        with self.tasks():
+            self.add([('foo', 'bar')], later)
+            self.ts.aggregator.flush()
+
+            # Flushing older events doesn't move ``last_seen`` back.
+            self.add([('foo', 'bar')], self.now)
+            self.ts.aggregator.flush()
+
+        tv = self.ts.get_tag_value(self.project.id, self.environment.id, 'foo', 'bar')
+        assert tv.times_seen == 2
+        assert tv.last_seen == later
+
+        # Existing values don't count towards the values seen again.
+        assert self.ts.get_tag_key(
+            self.project.id, self.environment.id, 'foo').values_seen == 1
+
+    def test_max_keys(self):
+        with mock.patch.object(self.ts.aggregator, 'flush') as flush:
+            # Every tag takes up a tag value and a group tag value.
+            for i in range(49):
+                self.add([('foo', 'value%s' % i)], self.now)
+            assert not flush.called
+
+            self.add([('foo', 'value49')], self.now)
+            assert flush.call_count == 1
+
+    def test_max_keys_flush_errors(self):
+        self.ts.aggregator.max_keys = 2
+        with mock.patch.object(self.ts.aggregator, '_get_tag_keys',
+                               side_effect=DatabaseError()):
+            # Saving the event doesn't fail, and the counts are kept.
+            self.add([('foo', 'bar')], self.now)
+
+        with self.tasks():
+            self.ts.aggregator.flush()
+
+        tv = self.ts.get_tag_value(self.project.id, self.environment.id, 'foo', 'bar')
+        assert tv.times_seen == 1
+
+    def test_times_seen_overflow(self):
+        with self.tasks():
+            self.add([('foo', 'bar')], self.now)
+            self.ts.aggregator.flush()
+
+        models.TagValue.objects.filter(project_id=self.project.id).update(
+            times_seen=BoundedPositiveIntegerField.MAX_VALUE)
+
+        with self.tasks():
+            self.add([('foo', 'bar')], self.now)
+            self.ts.aggregator.flush()
+
+        tv = self.ts.get_tag_value(self.project.id, self.environment.id, 'foo', 'bar')
+        assert tv.times_seen == BoundedPositiveIntegerField.MAX_VALUE
+
+        # The group tag values were written regardless.
+        gtv = self.ts.get_group_tag_value(
+            self.project.id, self.group.id, self.environment.id, 'foo', 'bar')
+        assert gtv.times_seen == 2
+
+    def test_failed_batch(self):
+        execute_upsert = TagCountAggregator._execute_upsert
+
+        def fail_tag_values(aggregator, using, model, columns, conflict, returning, rows):
+            if model is models.TagValue:
+                return [], rows
+            return execute_upsert(aggregator, using, model, columns, conflict, returning, rows)
+
+        with self.tasks(), mock.patch.object(TagCountAggregator, '_execute_upsert',
+                                             fail_tag_values):
+            self.add([('foo', 'bar')], self.now)
+            self.ts.aggregator.flush()
+
+        # The failed tag values are written through the buffer instead.
+        tv = self.ts.get_tag_value(self.project.id, self.environment.id, 'foo', 'bar')
+        assert tv.times_seen == 1
+        gtv = self.ts.get_group_tag_value(
+            self.project.id, self.group.id, self.environment.id, 'foo', 'bar')
+        assert gtv.times_seen == 1
@@ -2,15 +2,20 @@
 
 from __future__ import absolute_import
 
+import pickle
+
 from datetime import timedelta
 from django.utils import timezone
 from mock import Mock, patch
 
 from sentry import tagstore
-from sentry.models import Group, GroupSnooze, GroupStatus, ServiceHook
+from sentry.models import Event, Group, GroupSnooze, GroupStatus, ServiceHook
 from sentry.testutils import TestCase
 from sentry.tasks.merge import merge_groups
-from sentry.tasks.post_process import index_event_tags, post_process_group
+from sentry.tasks.post_process import (
+    get_event_from_ref, get_event_ref, index_event_tags, post_process_group,
+    post_process_group_batch,
+)
 
 
 class PostProcessGroupTest(TestCase):
@@ -225,6 +230,117 @@ class PostProcessGroupTest(TestCase):
 
         assert not mock_process_service_hook.delay.mock_calls
 
+    @patch('sentry.rules.processor.RuleProcessor')
+    def test_event_ref(self, mock_processor):
+        group = self.create_group(project=self.project)
+        event = self.create_event(group=group, data={'logentry': {'message': 'hello'}})
+
+        mock_processor.return_value.apply.return_value = []
+
+        post_process_group(
+            event=None,
+            event_ref=get_event_ref(event),
+            is_new=True,
+            is_regression=False,
+            is_sample=False,
+            is_new_group_environment=True,
+        )
+
+        bound_event = mock_processor.call_args[0][0]
+        assert bound_event.id == event.id
+        assert bound_event.event_id == event.event_id
+        assert bound_event.datetime == event.datetime
+        assert bound_event.group == group
+        assert bound_event.project == self.project
+
+        # The body is only loaded from nodestore when it is accessed
+        assert bound_event.data._node_data is None
+        assert bound_event.data['logentry'] == event.data['logentry']
+
+    @patch('sentry.tasks.post_process.metrics')
+    @patch('sentry.rules.processor.RuleProcessor')
+    def test_event_ref_capture_stats(self, mock_processor, mock_metrics):
+        group = self.create_group(project=self.project, platform='python')
+        event = self.create_event(group=group, data={'logentry': {'message': 'hello'}})
+
+        mock_processor.return_value.apply.return_value = []
+
+        post_process_group(
+            event=None,
+            event_ref=get_event_ref(event),
+            is_new=True,
+            is_regression=False,
+            is_sample=False,
+            is_new_group_environment=True,
+        )
+
+        # The size is taken from the reference instead of loading the body
+        bound_event = mock_processor.call_args[0][0]
+        assert bound_event.data._node_data is None
+        mock_metrics.timing.assert_called_once_with(
+            'events.size.data', event.size, tags={'platform': 'python'})
+
+    def test_event_ref_pickle(self):
+        group = self.create_group(project=self.project)
+        event = self.create_event(group=group, data={'logentry': {'message': 'hello'}})
+
+        unpickled = pickle.loads(pickle.dumps(get_event_from_ref(get_event_ref(event))))
+        assert unpickled.data._node_data is None
+        assert unpickled.data['logentry'] == event.data['logentry']
+
+    def test_event_ref_unsaved_event(self):
+        event = Event(project_id=self.project.id, event_id='a' * 32, data={})
+        assert get_event_ref(event) is None
+
+
+class PostProcessGroupBatchTest(TestCase):
+    @patch('sentry.rules.processor.RuleProcessor')
+    def test_binds_once_per_batch(self, mock_processor):
+        group1 = self.create_group(project=self.project)
+        group2 = self.create_group(project=self.project)
+        events = [
+            self.create_event(event_id='a' * 32, group=group1),
+            self.create_event(event_id='b' * 32, group=group1),
+            self.create_event(event_id='c' * 32, group=group2),
+        ]
+
+        mock_callback = Mock()
+        mock_processor.return_value.apply.return_value = [(mock_callback, [])]
+
+        with patch('sentry.models.Rule.get_for_project', return_value=[]) as mock_get_rules:
+            post_process_group_batch(events=[{
+                'event': event,
+                'is_new': False,
+                'is_regression': False,
+                'is_sample': False,
+                'is_new_group_environment': False,
+            } for event in events])
+
+        mock_get_rules.assert_called_once_with(self.project.id)
+        assert mock_processor.call_count == 3
+        for call in mock_processor.call_args_list:
+            assert call[1] == {'rules': []}
+        assert [call[0][0] for call in mock_callback.call_args_list] == events
+        assert [event.group for event in events] == [group1, group1, group2]
+
+    @patch('sentry.rules.processor.RuleProcessor')
+    def test_failure_does_not_stop_batch(self, mock_processor):
+        group = self.create_group(project=self.project)
+        event = self.create_event(group=group)
+        missing = self.create_event(group=self.create_group(project=self.project))
+        missing.group_id = 0
+
+        with patch('sentry.models.Rule.get_for_project', return_value=[]):
+            post_process_group_batch(events=[{
+                'event': event,
+                'is_new': False,
+                'is_regression': False,
+                'is_sample': False,
+                'is_new_group_environment': False,
+            } for event in (missing, event)])
+
+        mock_processor.assert_called_once_with(event, False, False, False, False, rules=[])
+
 
 class IndexEventTagsTest(TestCase):
     def test_simple(self):
@@ -6,7 +6,10 @@ from mock import patch
 from sentry import tagstore
 from sentry.tagstore.models import GroupTagValue
 from sentry.tasks.merge import merge_groups
-from sentry.models import Event, Group, GroupEnvironment, GroupMeta, GroupRedirect, UserReport
+from sentry.models import (
+    Event, Group, GroupEnvironment, GroupHash, GroupMeta, GroupRedirect, UserReport
+)
+from sentry.models.grouphash import hash_cache
 from sentry.similarity import _make_index_backend
 from sentry.testutils import TestCase
 from sentry.utils import redis
@@ -29,6 +32,23 @@ class MergeGroupTest(TestCase):
 
         mock_eventstream.end_merge.assert_called_once_with(eventstream_state)
 
+    def test_merge_uncaches_hashes(self):
+        self.addCleanup(hash_cache.clear_local)
+        group1 = self.create_group(self.project)
+        group2 = self.create_group(self.project)
+        hash1 = GroupHash.objects.create(project=self.project, group=group1, hash='a' * 32)
+        hash2 = GroupHash.objects.create(project=self.project, group=group2, hash='b' * 32)
+
+        with self.options({'grouphash.cache-ttl': 60}):
+            GroupHash.cache_many([hash1, hash2])
+
+            with self.tasks():
+                merge_groups([group1.id], group2.id)
+
+            # Only the hashes of the merged group are removed.
+            assert list(GroupHash.get_cached_many(
+                self.project.id, ['a' * 32, 'b' * 32]).keys()) == ['b' * 32]
+
     def test_merge_group_environments(self):
         group1 = self.create_group(self.project)
 
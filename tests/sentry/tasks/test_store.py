@@ -6,6 +6,7 @@ from time import time
 
 from sentry import quotas, tsdb
 from sentry.event_manager import EventManager, HashDiscarded
+from sentry.models import Event
 from sentry.plugins import Plugin2
 from sentry.tasks.store import preprocess_event, process_event, save_event
 from sentry.testutils import PluginTestCase
@@ -78,6 +79,52 @@ class StoreTasksTest(PluginTestCase):
         assert mock_process_event.delay.call_count == 0
         assert mock_save_event.delay.call_count == 1
 
+    @mock.patch('sentry.tasks.store.save_event')
+    @mock.patch('sentry.tasks.store.process_event')
+    def test_fused_save_event(self, mock_process_event, mock_save_event):
+        project = self.create_project()
+
+        data = {
+            'project': project.id,
+            'platform': 'NOTMATTLANG',
+            'message': 'test',
+            'event_id': uuid.uuid4().hex,
+            'extra': {
+                'foo': 'bar'
+            },
+        }
+
+        manager = EventManager(data)
+        manager.normalize()
+        data = dict(manager.get_data(), project=project.id)
+
+        with self.options({'store.fused-save-event': True}):
+            preprocess_event(data=data)
+
+        assert mock_process_event.delay.call_count == 0
+        assert mock_save_event.delay.call_count == 0
+        assert Event.objects.filter(project_id=project.id, event_id=data['event_id']).exists()
+
+    @mock.patch('sentry.tasks.store.save_event')
+    @mock.patch('sentry.tasks.store.process_event')
+    def test_fused_save_event_needs_processing(self, mock_process_event, mock_save_event):
+        project = self.create_project()
+
+        data = {
+            'project': project.id,
+            'platform': 'mattlang',
+            'message': 'test',
+            'extra': {
+                'foo': 'bar'
+            },
+        }
+
+        with self.options({'store.fused-save-event': True}):
+            preprocess_event(data=data)
+
+        assert mock_process_event.delay.call_count == 1
+        assert mock_save_event.delay.call_count == 0
+
     @mock.patch('sentry.tasks.store.save_event')
     @mock.patch('sentry.tasks.store.default_cache')
     def test_process_event_mutate_and_save(self, mock_default_cache, mock_save_event):
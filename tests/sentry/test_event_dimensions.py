@@ -0,0 +1,112 @@
+from __future__ import absolute_import
+
+import mock
+
+from datetime import timedelta
+from django.utils import timezone
+
+from sentry.event_dimensions import MISSING, get_cache_keys, resolve_event_dimensions
+from sentry.models import (
+    EnvironmentProject, GroupEnvironment, GroupRelease, ReleaseEnvironment,
+    ReleaseProjectEnvironment
+)
+from sentry.testutils import TestCase
+from sentry.utils.cache import cache
+
+
+class ResolveEventDimensionsTest(TestCase):
+    def setUp(self):
+        super(ResolveEventDimensionsTest, self).setUp()
+        self.release = self.create_release(project=self.project, version='1.0')
+        self.datetime = timezone.now()
+
+    def resolve(self, **kwargs):
+        return resolve_event_dimensions(
+            project=self.project,
+            group=self.group,
+            environment=kwargs.pop('environment', 'production'),
+            release=kwargs.pop('release', self.release),
+            datetime=kwargs.pop('datetime', self.datetime),
+        )
+
+    def test_creates_rows(self):
+        dimensions = self.resolve()
+
+        assert dimensions.environment.name == 'production'
+        assert EnvironmentProject.objects.filter(
+            project=self.project,
+            environment=dimensions.environment,
+        ).exists()
+        assert dimensions.is_new_group_environment
+        assert dimensions.group_environment == GroupEnvironment.objects.get(
+            group_id=self.group.id,
+            environment_id=dimensions.environment.id,
+        )
+        assert dimensions.group_environment.first_release_id == self.release.id
+        assert dimensions.release_environment == ReleaseEnvironment.objects.get(
+            release_id=self.release.id,
+            environment_id=dimensions.environment.id,
+        )
+        assert dimensions.release_project_environment == ReleaseProjectEnvironment.objects.get(
+            release=self.release,
+            project=self.project,
+            environment=dimensions.environment,
+        )
+        assert dimensions.group_release == GroupRelease.objects.get(
+            group_id=self.group.id,
+            release_id=self.release.id,
+            environment='production',
+        )
+
+    def test_without_release(self):
+        dimensions = self.resolve(release=None)
+        assert dimensions.group_environment.first_release_id is None
+        assert dimensions.release_environment is None
+        assert dimensions.release_project_environment is None
+        assert dimensions.group_release is None
+
+    def test_existing_rows(self):
+        # Rows that exist but aren't cached are read back from the database.
+        first = self.resolve()
+        keys = get_cache_keys(self.project, self.group, 'production', self.release)
+        cache.delete_many(keys.values())
+
+        second = self.resolve()
+        assert not second.is_new_group_environment
+        assert second.group_environment.id == first.group_environment.id
+        assert second.release_environment.id == first.release_environment.id
+        assert second.release_project_environment.id == first.release_project_environment.id
+        assert second.group_release.id == first.group_release.id
+
+    def test_cached(self):
+        first = self.resolve()
+
+        with mock.patch('sentry.event_dimensions.resolve_rows') as resolve_rows, \
+                self.assertNumQueries(0):
+            second = self.resolve()
+
+        assert not resolve_rows.called
+        assert not second.is_new_group_environment
+        assert second.group_release.id == first.group_release.id
+
+    def test_last_seen(self):
+        first = self.resolve()
+        datetime = self.datetime + timedelta(minutes=5)
+
+        self.resolve(datetime=datetime)
+        assert GroupRelease.objects.get(id=first.group_release.id).last_seen == datetime
+        assert ReleaseEnvironment.objects.get(
+            id=first.release_environment.id).last_seen == datetime
+
+        # The cached rows were updated as well, so there is nothing to update
+        # within the next minute.
+        with self.assertNumQueries(0):
+            self.resolve(datetime=datetime + timedelta(seconds=30))
+
+    def test_negative_cache(self):
+        keys = get_cache_keys(self.project, self.group, 'production', self.release)
+        cache.set(keys['group_release'], MISSING, 60)
+
+        dimensions = self.resolve()
+        assert dimensions.group_release is None
+        assert not GroupRelease.objects.filter(group_id=self.group.id).exists()
@@ -747,6 +747,58 @@ class RedisTSDBTest(TestCase):
             'organization:2': [],
         }
 
+    def test_write_batch(self):
+        now = datetime.utcnow().replace(tzinfo=pytz.UTC)
+        frequency_model = TSDBModel.frequent_environments_by_group
+
+        with self.db.write_batch() as batch:
+            batch.incr_multi(
+                [(TSDBModel.project, 1), (TSDBModel.group, 2)],
+                now,
+                environment_id=1,
+            )
+            batch.incr_multi([(TSDBModel.project, 1)], now, count=2)
+            batch.record_multi(
+                [(TSDBModel.users_affected_by_project, 1, ('foo', 'bar'))],
+                now,
+                environment_id=1,
+            )
+            batch.record_multi(
+                [(TSDBModel.users_affected_by_project, 1, ('bar', 'baz'))],
+                now,
+            )
+            batch.record_frequency_multi([(frequency_model, {
+                'group:2': {'environment:1': 1},
+            })], now)
+            batch.record_frequency_multi([(frequency_model, {
+                'group:2': {'environment:1': 1, 'environment:3': 1},
+            })], now)
+
+            # nothing is written until the batch is committed
+            assert self.db.get_sums(TSDBModel.project, [1], now, now, rollup=10) == {1: 0}
+
+        assert len(batch) == 0
+
+        assert self.db.get_sums(TSDBModel.project, [1, 2], now, now, rollup=10) == {
+            1: 3,
+            2: 0,
+        }
+        assert self.db.get_sums(
+            TSDBModel.project, [1], now, now, rollup=10, environment_id=1,
+        ) == {1: 1}
+        assert self.db.get_sums(TSDBModel.group, [2], now, now, rollup=10) == {2: 1}
+
+        assert self.db.get_distinct_counts_totals(
+            TSDBModel.users_affected_by_project, [1], now, now, rollup=3600,
+        ) == {1: 3}
+        assert self.db.get_distinct_counts_totals(
+            TSDBModel.users_affected_by_project, [1], now, now, rollup=3600, environment_id=1,
+        ) == {1: 2}
+
+        assert self.db.get_most_frequent(frequency_model, ['group:2'], now, rollup=3600) == {
+            'group:2': [('environment:1', 2.0), ('environment:3', 1.0)],
+        }
+
     def test_frequency_table_import_export_no_estimators(self):
         client = self.db.cluster.get_local_client_for_key('key')
 
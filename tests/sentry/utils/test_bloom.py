@@ -0,0 +1,35 @@
+from __future__ import absolute_import
+
+from sentry.testutils import TestCase
+from sentry.utils.bloom import WindowedBloomFilter
+from sentry.utils.redis import clusters
+
+
+class WindowedBloomFilterTest(TestCase):
+    def setUp(self):
+        super(WindowedBloomFilterTest, self).setUp()
+        self.filter = WindowedBloomFilter(
+            clusters.get('default'), 'test', 64 * 1024, windows=3, window=60,
+        )
+
+    def test_check_and_add(self):
+        assert not self.filter.check_and_add('foo', timestamp=0)
+        assert self.filter.check_and_add('foo', timestamp=0)
+        assert not self.filter.check_and_add('bar', timestamp=0)
+
+    def test_windows(self):
+        assert not self.filter.check_and_add('foo', timestamp=0)
+
+        # Items are retained for all windows...
+        assert self.filter.check_and_add('foo', timestamp=60 * 2)
+
+        # ...and adding them again only retains them from that window on.
+        assert self.filter.check_and_add('foo', timestamp=60 * 4)
+        assert not self.filter.check_and_add('foo', timestamp=60 * 7)
+
+    def test_keys_expire(self):
+        self.filter.check_and_add('foo', timestamp=0)
+        shard, _ = self.filter._get_offsets('foo')
+        key = self.filter._get_keys(shard, 0)[0]
+        client = self.filter.cluster.get_local_client_for_key(u'test:{}'.format(shard))
+        assert 0 < client.ttl(key) <= 3 * 60
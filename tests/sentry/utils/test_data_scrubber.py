@@ -4,7 +4,7 @@ from __future__ import absolute_import
 
 from sentry.constants import FILTER_MASK
 from sentry.testutils import TestCase
-from sentry.utils.data_scrubber import SensitiveDataFilter
+from sentry.utils.data_scrubber import SensitiveDataFilter, get_fields_re, varmap
 
 VARS = {
     'foo': 'bar',
@@ -442,3 +442,54 @@ class SensitiveDataFilterTest(TestCase):
         assert 'csp' in data
         csp = data['csp']
         assert csp['blocked_uri'] == 'https://example.com/?foo=[Filtered]&bar=baz'
+
+    def test_fields_re_is_shared(self):
+        proc1 = SensitiveDataFilter(fields=['foo', 'Bar'])
+        proc2 = SensitiveDataFilter(fields=['bar', 'foo'])
+        assert proc1.fields_re is proc2.fields_re
+        assert proc1.sanitize('xbarx', 'value') == FILTER_MASK
+        assert proc1.sanitize('baz', 'xfoo') == FILTER_MASK
+
+    def test_no_fields(self):
+        assert get_fields_re(set()) is None
+        proc = SensitiveDataFilter(include_defaults=False)
+        assert proc.sanitize('password', 'hello') == 'hello'
+
+
+class VarmapTest(TestCase):
+    def test_reuses_unchanged_containers(self):
+        data = {'foo': [1, {'bar': 'baz'}], 'pairs': (('a', 'b'), )}
+        assert varmap(lambda k, v: v, data) is data
+
+    def test_copies_changed_containers(self):
+        data = {'foo': [1, {'bar': 'baz'}], 'other': {'a': 1}}
+        result = varmap(lambda k, v: 'x' if k == 'bar' else v, data)
+        assert result == {'foo': [1, {'bar': 'x'}], 'other': {'a': 1}}
+        assert result is not data
+        assert result['other'] is data['other']
+        assert data['foo'][1]['bar'] == 'baz'
+
+    def test_mapping_like_lists(self):
+        data = [('password', 'hello'), ('foo', 'bar')]
+        result = varmap(lambda k, v: 'x' if k == 'password' else v, data)
+        assert result == [['password', 'x'], ['foo', 'bar']]
+
+    def test_recursion(self):
+        data = {'foo': 'bar'}
+        data['self'] = data
+        result = varmap(lambda k, v: v, data)
+        assert result['foo'] == 'bar'
+        assert result['self'] == '<...>'
+
+    def test_deeply_nested(self):
+        data = leaf = []
+        for _ in range(5000):
+            node = []
+            leaf.append(node)
+            leaf = node
+        leaf.append('secret')
+
+        result = varmap(lambda k, v: 'x', data)
+        for _ in range(5000):
+            result = result[0]
+        assert result == ['x']
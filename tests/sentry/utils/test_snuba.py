@@ -1,11 +1,14 @@
 from __future__ import absolute_import
 
 from datetime import datetime
+import mock
 import pytz
 
 from sentry.models import GroupRelease, Release
 from sentry.testutils import TestCase
-from sentry.utils.snuba import get_snuba_translators
+from sentry.utils.snuba import (
+    _execute_query, _get_result_cache_key, get_query_retention, get_snuba_translators,
+)
 
 
 class SnubaUtilsTest(TestCase):
@@ -165,3 +168,42 @@ class SnubaUtilsTest(TestCase):
                 'count': 3
             },
         ]
+
+    def test_get_query_retention(self):
+        with self.options({
+            'system.event-retention-days': 30,
+            'snuba.retention-cache-ttl': 60,
+        }):
+            assert get_query_retention(self.proj1.id) == 30
+
+            with self.options({'system.event-retention-days': 7}), \
+                    self.assertNumQueries(0):
+                assert get_query_retention(self.proj1.id) == 30
+
+    def test_result_cache_key(self):
+        request = {
+            'from_date': '2018-01-01T10:00:05',
+            'to_date': '2018-01-02T10:00:05',
+            'granularity': 3600,
+            'project': [self.proj1.id],
+        }
+
+        key = _get_result_cache_key(request)
+        assert key == _get_result_cache_key(dict(
+            request,
+            from_date='2018-01-01T10:59:59',
+            to_date='2018-01-02T10:00:00',
+        ))
+        assert key != _get_result_cache_key(dict(request, from_date='2018-01-01T11:00:00'))
+        assert key != _get_result_cache_key(dict(request, project=[self.proj1.id + 1]))
+
+    @mock.patch('sentry.utils.snuba._parse_response', return_value={'data': []})
+    @mock.patch('sentry.utils.snuba._send_query')
+    @mock.patch('sentry.utils.snuba.default_cache')
+    def test_execute_query_cache_set_fails(self, default_cache, send_query, parse_response):
+        default_cache.get.return_value = None
+        default_cache.set.side_effect = ValueError('value too large')
+
+        request = {'project': [self.proj1.id]}
+        assert _execute_query(request, cache_ttl=60) == {'data': []}
+        assert default_cache.set.called
@@ -10,8 +10,10 @@ from mock import Mock
 
 from sentry.coreapi import APIRateLimited
 from sentry.models import ProjectKey
+from sentry.quotas.base import RateLimit
 from sentry.signals import event_accepted, event_dropped, event_filtered
 from sentry.testutils import (assert_mock_called_once_with_partial, TestCase)
+from sentry.testutils.helpers import get_auth_header
 from sentry.utils import json
 from sentry.utils.data_filters import FilterTypes
 
@@ -678,6 +680,90 @@ class StoreViewTest(TestCase):
         )
 
 
+class StoreBatchViewTest(TestCase):
+    @fixture
+    def path(self):
+        return reverse('sentry-api-store-batch', kwargs={'project_id': self.project.id})
+
+    def _postBatch(self, events):
+        return self.client.post(
+            self.path,
+            json.dumps({'events': events}),
+            content_type='application/json',
+            HTTP_X_SENTRY_AUTH=get_auth_header(
+                '_postBatch/0.0.0',
+                self.projectkey.public_key,
+                self.projectkey.secret_key,
+            ),
+        )
+
+    @mock.patch('sentry.coreapi.ClientApiHelper.insert_data_to_database_batch')
+    def test_accepts_all_events(self, mock_insert):
+        resp = self._postBatch([
+            {'event_id': 'a' * 32, 'message': 'foo'},
+            {'event_id': 'b' * 32, 'message': 'bar'},
+        ])
+        assert resp.status_code == 200, resp.content
+        assert json.loads(resp.content) == {
+            'events': [{'id': 'a' * 32}, {'id': 'b' * 32}],
+        }
+        inserted = mock_insert.call_args[0][0]
+        assert [d['event_id'] for d in inserted] == ['a' * 32, 'b' * 32]
+
+    @mock.patch('sentry.coreapi.ClientApiHelper.insert_data_to_database_batch', Mock())
+    def test_rejects_duplicates_within_batch(self):
+        resp = self._postBatch([
+            {'event_id': 'a' * 32, 'message': 'foo'},
+            {'event_id': 'a' * 32, 'message': 'foo'},
+        ])
+        assert resp.status_code == 200, resp.content
+        results = json.loads(resp.content)['events']
+        assert results[0] == {'id': 'a' * 32}
+        assert results[1]['id'] == 'a' * 32
+        assert 'already exists' in results[1]['error']
+
+    @mock.patch('sentry.coreapi.ClientApiHelper.insert_data_to_database_batch', Mock())
+    @mock.patch('sentry.app.quotas.is_rate_limited_batch')
+    def test_partial_rate_limit(self, mock_is_rate_limited_batch):
+        mock_is_rate_limited_batch.return_value = [
+            RateLimit(is_limited=False),
+            RateLimit(is_limited=True, retry_after=10, reason_code='project_quota'),
+        ]
+        resp = self._postBatch([
+            {'event_id': 'a' * 32, 'message': 'foo'},
+            {'event_id': 'b' * 32, 'message': 'bar'},
+        ])
+        assert resp.status_code == 200, resp.content
+        results = json.loads(resp.content)['events']
+        assert results[0] == {'id': 'a' * 32}
+        assert results[1]['id'] == 'b' * 32
+        assert results[1]['retry_after'] == 10
+        mock_is_rate_limited_batch.assert_called_once_with(
+            project=self.project, key=self.projectkey, count=2)
+
+    @mock.patch('sentry.coreapi.ClientApiHelper.insert_data_to_database_batch', Mock())
+    @mock.patch('sentry.event_manager.is_valid_release', mock.Mock(return_value=False))
+    def test_filtered_event(self):
+        resp = self._postBatch([
+            {'event_id': 'a' * 32, 'message': 'foo', 'release': 'abcdefg'},
+        ])
+        assert resp.status_code == 200, resp.content
+        results = json.loads(resp.content)['events']
+        assert 'filter' in results[0]['error']
+
+    def test_rejects_oversized_batch(self):
+        with self.options({'store.batch-max-events': 1}):
+            resp = self._postBatch([
+                {'message': 'foo'},
+                {'message': 'bar'},
+            ])
+        assert resp.status_code == 400, resp.content
+
+    def test_rejects_empty_batch(self):
+        resp = self._postBatch([])
+        assert resp.status_code == 400, resp.content
+
+
 class CrossDomainXmlTest(TestCase):
     @fixture
     def path(self):
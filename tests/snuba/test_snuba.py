@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 from datetime import datetime, timedelta
+import mock
 import pytest
 import time
 import uuid
@@ -126,3 +127,48 @@ class SnubaTest(SnubaTestCase):
                 'issue': group.id,
                 'timestamp': base_time.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
             }]
+
+    def test_bulk_raw_query(self):
+        base_time = datetime.utcnow()
+        self._insert_event_for_time(base_time - timedelta(minutes=1))
+        self._insert_event_for_time(base_time - timedelta(days=2))
+
+        def get_params(days):
+            return {
+                'start': base_time - timedelta(days=days),
+                'end': base_time + timedelta(days=1),
+                'aggregations': [['count()', '', 'count']],
+                'filter_keys': {'project_id': [self.project.id]},
+            }
+
+        with mock.patch('sentry.utils.snuba._send_query',
+                        wraps=snuba._send_query) as send_query:
+            results = snuba.bulk_raw_query(
+                [get_params(1), get_params(3), get_params(1)],
+                referrer='test',
+            )
+
+        assert [result['data'] for result in results] == [
+            [{'count': 1}], [{'count': 2}], [{'count': 1}],
+        ]
+        assert send_query.call_count == 2
+
+    def test_result_cache(self):
+        base_time = datetime.utcnow()
+        self._insert_event_for_time(base_time - timedelta(minutes=1))
+
+        def get_event_count():
+            return snuba.query(
+                start=base_time - timedelta(days=1),
+                end=base_time + timedelta(days=1),
+                groupby=['project_id'],
+                filter_keys={'project_id': [self.project.id]},
+            )
+
+        with self.options({'snuba.result-cache-ttl': 60}), \
+                mock.patch('sentry.utils.snuba._send_query',
+                           wraps=snuba._send_query) as send_query:
+            assert get_event_count() == {self.project.id: 1}
+            assert get_event_count() == {self.project.id: 1}
+
+        assert send_query.call_count == 1